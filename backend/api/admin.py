@@ -2,7 +2,7 @@
 Admin configuration for Benefit Predictor API.
 """
 from django.contrib import admin
-from .models import Prediction, EmployeeProfile
+from .models import Prediction, PredictionStats, FeatureHistogram, EmployeeProfile
 
 
 @admin.register(Prediction)
@@ -15,6 +15,21 @@ class PredictionAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
 
+@admin.register(PredictionStats)
+class PredictionStatsAdmin(admin.ModelAdmin):
+    """Interface admin (somente leitura) para o rollup de estatísticas."""
+    list_display = ['shard', 'total', 'score_sum', 'low', 'medium', 'high', 'updated_at']
+    readonly_fields = ['shard', 'total', 'score_sum', 'low', 'medium', 'high', 'updated_at']
+
+
+@admin.register(FeatureHistogram)
+class FeatureHistogramAdmin(admin.ModelAdmin):
+    """Interface admin (somente leitura) para as contagens do monitor de drift."""
+    list_display = ['model_version', 'reference_id', 'period', 'feature', 'bin', 'count', 'updated_at']
+    list_filter = ['model_version', 'feature']
+    readonly_fields = ['reference_id', 'model_version', 'period', 'feature', 'bin', 'count', 'updated_at']
+
+
 @admin.register(EmployeeProfile)
 class EmployeeProfileAdmin(admin.ModelAdmin):
     """Interface admin para Employee Profiles."""
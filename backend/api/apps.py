@@ -1,6 +1,52 @@
+import threading
+
 from django.apps import AppConfig
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Threads em background só nos processos que servem requisições (WSGI/ASGI),
+        # iniciadas na primeira requisição: migrate, shell, comandos e testes não as criam
+        from django.core.handlers.asgi import ASGIHandler
+        from django.core.handlers.wsgi import WSGIHandler
+        from django.core.signals import request_started
+        for handler in (WSGIHandler, ASGIHandler):
+            request_started.connect(
+                start_background_workers, sender=handler, dispatch_uid=f'api-background-{handler.__name__}'
+            )
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_background_workers(**kwargs):
+    """
+    Inicia (uma vez por processo) as threads em background da API.
+    """
+    global _started
+    if _started:
+        return
+
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        # Troca de versão do modelo sem reiniciar (ver api/ml/registry.py)
+        from .ml.predict import start_model_watcher
+        start_model_watcher()
+
+        # Flusher do write-behind (grava pendências também no shutdown)
+        from django.conf import settings
+        if settings.PREDICTION_WRITE_BEHIND:
+            from .persistence import get_write_buffer
+            get_write_buffer().start()
+
+        # Flusher dos histogramas do monitor de drift
+        if settings.PREDICTION_DRIFT_MONITOR:
+            from .monitoring import get_drift_monitor
+            get_drift_monitor().start()
@@ -0,0 +1,87 @@
+"""
+Lista e resume os profiles gravados pelo ProfilingMiddleware.
+
+Uso:
+    python manage.py profiles                          # lista (mais recentes primeiro)
+    python manage.py profiles --endpoint api.predict   # só um endpoint
+    python manage.py profiles latest --limit 30        # funções mais caras do último profile
+    python manage.py profiles <arquivo.prof> --sort tottime
+"""
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import list_profiles
+
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = 'Lista os profiles de requisições ou resume um deles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', nargs='?', help="Arquivo .prof (nome ou caminho) ou 'latest'")
+        parser.add_argument('--dir', default=settings.API_PROFILING_DIR, help='Diretório dos profiles')
+        parser.add_argument('--endpoint', help='Filtra a listagem por endpoint')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative', help='Ordenação do resumo')
+        parser.add_argument('--limit', type=int, default=20, help='Funções exibidas no resumo')
+
+    def handle(self, *args, **options):
+        profiles = list_profiles(options['dir'])
+        if options['endpoint']:
+            profiles = [p for p in profiles if p['endpoint'] == options['endpoint']]
+
+        if not options['profile']:
+            self._list(profiles)
+            return
+
+        if options['profile'] == 'latest':
+            if not profiles:
+                raise CommandError(f"Nenhum profile em {options['dir']}")
+            path = profiles[0]['path']
+        else:
+            path = options['profile']
+            if not os.path.exists(path):
+                path = os.path.join(options['dir'], path)
+            if not os.path.exists(path):
+                raise CommandError(f"Profile não encontrado: {options['profile']}")
+
+        self._summarize(path, options['sort'], options['limit'])
+
+    def _list(self, profiles):
+        if not profiles:
+            self.stdout.write('Nenhum profile encontrado.')
+            return
+
+        self.stdout.write(f"{'instante (UTC)':26s} {'método':6s} {'status':>6} {'ms':>9}  {'endpoint':30s} arquivo")
+        for p in profiles:
+            self.stdout.write(
+                f"{p['timestamp']:%Y-%m-%d %H:%M:%S.%f} {p['method']:6s} {p['status']:>6} "
+                f"{p['duration_ms']:>9.1f}  {p['endpoint']:30s} {p['name']}"
+            )
+
+        # Resumo por endpoint: onde o tempo foi gasto entre os profiles capturados
+        by_endpoint = {}
+        for p in profiles:
+            by_endpoint.setdefault((p['method'], p['endpoint']), []).append(p['duration_ms'])
+        self.stdout.write(f"\n{'método':6s} {'endpoint':30s} {'n':>5} {'média ms':>10} {'máx ms':>10}")
+        for (method, endpoint), durations in sorted(by_endpoint.items()):
+            self.stdout.write(
+                f"{method:6s} {endpoint:30s} {len(durations):>5} "
+                f"{sum(durations) / len(durations):>10.1f} {max(durations):>10.1f}"
+            )
+
+    def _summarize(self, path, sort, limit):
+        output = io.StringIO()
+        try:
+            stats = pstats.Stats(path, stream=output)
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            raise CommandError(f"Profile inválido: {path} ({e})")
+
+        self.stdout.write(f"📄 {os.path.basename(path)}")
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(output.getvalue())
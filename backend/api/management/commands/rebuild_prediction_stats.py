@@ -0,0 +1,78 @@
+"""
+Reconstrói o rollup PredictionStats a partir da tabela Prediction.
+
+Uso:
+    python manage.py rebuild_prediction_stats          # reconstrói
+    python manage.py rebuild_prediction_stats --check  # só verifica
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from api.models import Prediction, PredictionStats
+
+
+def raw_totals():
+    """Agrega a tabela Prediction inteira numa única passada."""
+    totals = Prediction.objects.order_by().aggregate(
+        total=Count('id'),
+        score_sum=Sum('satisfaction_score'),
+        low=Count('id', filter=Q(satisfaction_score__lt=PredictionStats.LOW_THRESHOLD)),
+        medium=Count('id', filter=Q(
+            satisfaction_score__gte=PredictionStats.LOW_THRESHOLD,
+            satisfaction_score__lt=PredictionStats.HIGH_THRESHOLD
+        )),
+        high=Count('id', filter=Q(satisfaction_score__gte=PredictionStats.HIGH_THRESHOLD)),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def compare(rollup, raw):
+    """Retorna os campos divergentes entre rollup e tabela."""
+    mismatches = {}
+    for key, expected in raw.items():
+        actual = rollup[key]
+        # score_sum é float: tolera erro de arredondamento acumulado
+        if key == 'score_sum':
+            ok = abs(actual - expected) <= 1e-6 * max(1.0, abs(expected))
+        else:
+            ok = actual == expected
+        if not ok:
+            mismatches[key] = (actual, expected)
+    return mismatches
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói (ou verifica) o rollup de estatísticas de predições'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Apenas compara o rollup com a tabela Prediction (erro se divergir)'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = compare(PredictionStats.snapshot(), raw_totals())
+            if mismatches:
+                for key, (actual, expected) in mismatches.items():
+                    self.stderr.write(f"  {key}: rollup={actual} tabela={expected}")
+                raise CommandError('Rollup inconsistente. Execute rebuild_prediction_stats.')
+            self.stdout.write(self.style.SUCCESS('✅ Rollup consistente com a tabela Prediction'))
+            return
+
+        with transaction.atomic():
+            # Bloqueia os shards para que inserts concorrentes esperem a reconstrução
+            list(PredictionStats.objects.select_for_update())
+            totals = raw_totals()
+            PredictionStats.objects.all().delete()
+            PredictionStats.objects.create(shard=0, **totals)
+
+        mismatches = compare(PredictionStats.snapshot(), raw_totals())
+        if mismatches:
+            raise CommandError(f'Rollup divergiu após reconstrução (escritas concorrentes?): {mismatches}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rollup reconstruído: {totals['total']} predições"
+        ))
@@ -0,0 +1,219 @@
+"""
+Scoring offline de arquivos grandes de funcionários (CSV ou Parquet).
+
+O arquivo é lido em chunks e cada chunk é avaliado por um pool de processos.
+Os workers mapeiam o mesmo model.bin em memória (páginas compartilhadas pelo
+SO), em vez de cada um desserializar model.pkl. No máximo 2 chunks por
+worker ficam em memória ao mesmo tempo, independente do tamanho do arquivo.
+
+Uso:
+    python manage.py score_employees funcionarios.csv --output scores.csv
+    python manage.py score_employees funcionarios.parquet --output scores.parquet \\
+        --workers 8 --chunk-size 100000 --id-column employee_id --save
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ml import predict
+from api.ml.predict import FEATURES
+from api.models import Prediction
+from api.serializers import valid_feature_rows
+
+
+OUTPUT_COLUMNS = FEATURES + ['satisfaction_score', 'confidence', 'recommendation']
+
+# Snapshot do modelo em cada processo worker
+_worker_model = None
+
+
+def _init_worker(version):
+    global _worker_model
+    _worker_model = predict.load_model(version)
+
+
+def _score_chunk(X, loaded=None):
+    """
+    Avalia um chunk e devolve as colunas de resultado (pickle barato entre processos).
+    """
+    results = predict.predict_batch(X, loaded=loaded or _worker_model)
+    return {
+        'satisfaction_score': np.array([r['score'] for r in results]),
+        'confidence': [r['confidence'] for r in results],
+        'recommendation': [r['recommendation'] for r in results],
+    }
+
+
+def _read_chunks(path, columns, chunk_size):
+    """
+    Lê o arquivo em DataFrames de até chunk_size linhas.
+
+    Returns:
+        tuple: (iterador de chunks, total de linhas ou None se desconhecido)
+    """
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise CommandError('Leitura de Parquet requer pyarrow: pip install pyarrow')
+        parquet = pq.ParquetFile(path)
+        batches = parquet.iter_batches(batch_size=chunk_size, columns=columns)
+        return (batch.to_pandas() for batch in batches), parquet.metadata.num_rows
+
+    return pd.read_csv(path, usecols=columns, chunksize=chunk_size), None
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(self.path, index=False)
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise CommandError('Escrita de Parquet requer pyarrow: pip install pyarrow')
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        table = self.pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Calcula scores de satisfação para um arquivo CSV/Parquet de funcionários'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Arquivo de entrada (.csv ou .parquet)')
+        parser.add_argument('--output', required=True, help='Arquivo de saída (.csv ou .parquet)')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Linhas por chunk')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processos de scoring (1 = no próprio processo)'
+        )
+        parser.add_argument('--id-column', help='Coluna identificadora copiada para a saída')
+        parser.add_argument('--save', action='store_true', help='Também grava as predições em Prediction')
+        parser.add_argument('--save-batch-size', type=int, default=2000, help='Linhas por INSERT com --save')
+
+    def handle(self, *args, **options):
+        loaded = predict.get_active_model()
+        if loaded is None:
+            raise CommandError('Modelo não carregado. Execute train_model.py primeiro!')
+
+        columns = FEATURES + ([options['id_column']] if options['id_column'] else [])
+        try:
+            chunks, total = _read_chunks(options['input'], columns, options['chunk_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Não foi possível ler {options["input"]}: {e}')
+
+        if options['output'].endswith('.parquet'):
+            writer = _ParquetWriter(options['output'])
+        else:
+            writer = _CsvWriter(options['output'])
+
+        workers = max(1, options['workers'])
+        self.stdout.write(
+            f"📂 {options['input']} → {options['output']} "
+            f"(modelo {loaded.version}, {workers} worker(s), chunks de {options['chunk_size']:,})"
+        )
+
+        self.started = time.perf_counter()
+        self.scored = 0
+        self.skipped = 0
+        self.total = total
+
+        if workers == 1:
+            for df, X in self._prepare(chunks):
+                self._write(df, _score_chunk(X, loaded=loaded), writer, options)
+        else:
+            # Todos os workers fixam a mesma versão, mesmo que ACTIVE mude durante o job
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(loaded.version,)) as pool:
+                pending = deque()
+                for df, X in self._prepare(chunks):
+                    pending.append((df, pool.submit(_score_chunk, X)))
+                    # Limita chunks em memória; a saída mantém a ordem da entrada
+                    if len(pending) >= 2 * workers:
+                        df, future = pending.popleft()
+                        self._write(df, future.result(), writer, options)
+                while pending:
+                    df, future = pending.popleft()
+                    self._write(df, future.result(), writer, options)
+
+        writer.close()
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {self.scored:,} linhas em {elapsed:.1f}s "
+            f"({self.scored / elapsed if elapsed else 0:,.0f} linhas/s)"
+        ))
+        if self.skipped:
+            self.stdout.write(self.style.WARNING(f"⚠️ {self.skipped:,} linhas ignoradas (features ausentes ou inválidas)"))
+
+    def _prepare(self, chunks):
+        """
+        Converte cada chunk para a matriz de features, descartando linhas inválidas.
+
+        Inválidas: features ausentes, não numéricas ou fora dos limites que a
+        API aplica (PredictionInputSerializer), como salário negativo ou nível 7.
+        """
+        for df in chunks:
+            X = df[FEATURES].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+            valid = valid_feature_rows(X, FEATURES)
+            if not valid.all():
+                self.skipped += int((~valid).sum())
+                df, X = df[valid], X[valid]
+            if len(X):
+                yield df.reset_index(drop=True), X
+
+    def _write(self, df, result, writer, options):
+        output = pd.DataFrame({
+            **({options['id_column']: df[options['id_column']]} if options['id_column'] else {}),
+            **{name: df[name] for name in FEATURES},
+            **result,
+        })
+        writer.write(output)
+
+        if options['save']:
+            Prediction.objects.bulk_create(
+                [
+                    Prediction(
+                        age=int(row.age), salary=round(row.salary, 2), commute_time=int(row.commute_time),
+                        gym_usage=int(row.gym_usage), meal_voucher=round(row.meal_voucher, 2),
+                        health_plan_tier=int(row.health_plan_tier), satisfaction_score=row.satisfaction_score
+                    )
+                    for row in output.itertuples(index=False)
+                ],
+                batch_size=options['save_batch_size']
+            )
+
+        self.scored += len(output)
+        elapsed = time.perf_counter() - self.started
+        progress = f" ({self.scored / self.total:.0%})" if self.total else ''
+        self.stdout.write(
+            f"  {self.scored:,} linhas{progress} | {self.scored / elapsed if elapsed else 0:,.0f} linhas/s"
+        )
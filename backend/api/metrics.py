@@ -0,0 +1,225 @@
+"""
+Métricas em memória do caminho de predição, expostas em /api/metrics/.
+
+Histogramas de latência por etapa e contadores de requisições/erros,
+agregados no processo e renderizados no formato texto do Prometheus.
+
+Cada série tem seu próprio lock, mantido só durante o incremento (sem
+alocações nem chamadas ao NumPy), então registrar uma medida custa poucos
+microssegundos mesmo com várias threads atendendo requisições.
+
+Com vários workers (gunicorn), cada processo tem suas próprias métricas:
+o Prometheus deve coletar cada worker, ou a soma fica por conta da query.
+
+Módulo só com a biblioteca padrão: api/ml/predict.py o usa sem depender do Django.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+
+# Limites (s) dos buckets de latência: de 50µs a 2.5s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+# Prefixo dos nomes exportados
+NAMESPACE = 'benefit'
+
+
+class Counter:
+    """Contador monotônico."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self, name, labels):
+        return [(name, labels, self._value)]
+
+
+class Histogram:
+    """
+    Histograma com buckets fixos (contagens por bucket, soma e total).
+
+    Args:
+        buckets (tuple): Limites superiores, em ordem crescente
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # bisect_left: um valor igual ao limite entra no bucket (le = "<=")
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Context manager que observa o tempo do bloco (em segundos)."""
+        return _Timer(self)
+
+    def snapshot(self):
+        """
+        Returns:
+            tuple: (contagens por bucket, não acumuladas; soma)
+        """
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def samples(self, name, labels):
+        counts, total = self.snapshot()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append((f'{name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+        samples.append((f'{name}_sum', labels, total))
+        samples.append((f'{name}_count', labels, cumulative))
+        return samples
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Family:
+    """
+    Métrica com labels: uma série (Counter ou Histogram) por combinação de valores.
+
+    As séries são criadas na primeira vez que aparecem; depois, labels()
+    é só uma consulta ao dict, sem lock.
+    """
+
+    def __init__(self, name, documentation, kind, factory, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = factory()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def inc(self, amount=1):
+        """Atalho para métricas sem labels."""
+        self.labels().inc(amount)
+
+    def observe(self, value):
+        """Atalho para métricas sem labels."""
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.copy().items()):
+            for name, labels, value in child.samples(self.name, dict(zip(self.labelnames, values))):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas renderizadas juntas em /api/metrics/."""
+
+    def __init__(self, namespace=NAMESPACE):
+        self.namespace = namespace
+        self._families = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(name, documentation, 'counter', Counter, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(name, documentation, 'histogram', lambda: Histogram(buckets), labelnames)
+
+    def _register(self, name, documentation, kind, factory, labelnames):
+        name = f'{self.namespace}_{name}'
+        if name in self._families:
+            raise ValueError(f"Métrica já registrada: {name}")
+        family = Family(name, documentation, kind, factory, labelnames)
+        self._families[name] = family
+        return family
+
+    def render(self):
+        """Todas as métricas no formato texto do Prometheus (0.0.4)."""
+        lines = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for key, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+# Etapas de /api/predict/. model e recommendation são medidas dentro de
+# predict_satisfaction (parte de predict) e só aparecem em cache miss.
+PREDICT_STAGES = ('validate', 'predict', 'model', 'recommendation', 'persist', 'serialize', 'total')
+
+PREDICT_STAGE_SECONDS = REGISTRY.histogram(
+    'predict_stage_seconds', 'Latência de cada etapa da predição, em segundos.', ('stage',)
+)
+# Séries criadas de antemão: aparecem zeradas antes da primeira requisição
+for _stage in PREDICT_STAGES:
+    PREDICT_STAGE_SECONDS.labels(_stage)
+
+PREDICT_REQUESTS = REGISTRY.counter(
+    'predict_requests_total', 'Requisições a /api/predict/ por status HTTP.', ('status',)
+)
+
+PREDICT_ERRORS = REGISTRY.counter(
+    'predict_errors_total', 'Requisições a /api/predict/ com erro, por motivo.', ('reason',)
+)
+
+MODEL_NOT_LOADED = REGISTRY.counter(
+    'model_not_loaded_total', 'Predições recusadas porque nenhum modelo estava carregado.'
+)
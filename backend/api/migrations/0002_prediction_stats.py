@@ -0,0 +1,48 @@
+# Generated by Django 5.0.2 on 2026-10-17 18:39
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_rollup(apps, schema_editor):
+    """Popula o rollup com as predições já existentes."""
+    Prediction = apps.get_model('api', 'Prediction')
+    PredictionStats = apps.get_model('api', 'PredictionStats')
+    db = schema_editor.connection.alias
+
+    totals = Prediction.objects.using(db).aggregate(
+        total=Count('id'),
+        score_sum=Sum('satisfaction_score'),
+        low=Count('id', filter=Q(satisfaction_score__lt=50)),
+        medium=Count('id', filter=Q(satisfaction_score__gte=50, satisfaction_score__lt=75)),
+        high=Count('id', filter=Q(satisfaction_score__gte=75)),
+    )
+    PredictionStats.objects.using(db).create(shard=0, **{k: v or 0 for k, v in totals.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(unique=True)),
+                ('total', models.BigIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('low', models.BigIntegerField(default=0)),
+                ('medium', models.BigIntegerField(default=0)),
+                ('high', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estatística de Previsões',
+                'verbose_name_plural': 'Estatísticas de Previsões',
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
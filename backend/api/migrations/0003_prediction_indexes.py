@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-17 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_prediction_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['-created_at', '-id'], name='prediction_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['health_plan_tier', '-created_at', '-id'], name='prediction_tier_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['satisfaction_score'], name='prediction_score_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_prediction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference_id', models.CharField(help_text='Id dos histogramas de referência do treino', max_length=16)),
+                ('model_version', models.CharField(max_length=32)),
+                ('period', models.DateField(help_text='Dia (UTC) das entradas')),
+                ('feature', models.CharField(max_length=32)),
+                ('bin', models.PositiveSmallIntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Histograma de Feature',
+                'verbose_name_plural': 'Histogramas de Features',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='featurehistogram',
+            constraint=models.UniqueConstraint(fields=('reference_id', 'period', 'feature', 'bin'), name='feature_histogram_bin_unique'),
+        ),
+    ]
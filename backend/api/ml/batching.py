@@ -0,0 +1,160 @@
+"""
+Micro-batching de predições concorrentes.
+
+Requisições de uma linha que chegam quase ao mesmo tempo são agrupadas numa
+única avaliação vetorizada da floresta. O custo fixo de cada avaliação é
+pago uma vez por lote em vez de uma vez por requisição.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+# Limites (ms) dos buckets do histograma de atraso de fila
+DELAY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25)
+
+# Limites dos buckets do histograma de tamanho de lote
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Agrupa linhas submetidas por várias threads em lotes.
+
+    Uma thread de despacho pega a primeira linha da fila e espera até
+    max_wait_ms por outras, ou até juntar max_batch_size linhas. A espera é
+    adaptativa: se os lotes recentes tiveram uma linha só (tráfego sem
+    concorrência), o lote é despachado imediatamente, sem somar latência.
+
+    Args:
+        max_batch_size (int): Máximo de linhas por lote
+        max_wait_ms (float): Espera máxima da primeira linha do lote
+    """
+
+    def __init__(self, max_batch_size=64, max_wait_ms=2.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._recent_batch_size = 1.0
+
+        self.batches = 0
+        self.rows = 0
+        self.size_histogram = [0] * (len(SIZE_BUCKETS) + 1)
+        self.delay_histogram = [0] * (len(DELAY_BUCKETS_MS) + 1)
+        self.delay_sum_ms = 0.0
+        self.delay_max_ms = 0.0
+
+    def submit(self, loaded, row):
+        """
+        Enfileira uma linha e bloqueia até o score ficar pronto.
+
+        Args:
+            loaded: Snapshot do modelo (LoadedModel) a usar na predição
+            row (array-like): Linha com as 6 features
+
+        Returns:
+            tuple: (score bruto do modelo, desvio entre as árvores ou None)
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((loaded, row, time.perf_counter(), future))
+        return future.result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+
+            # Sem concorrência recente: não vale a pena esperar
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self._recent_batch_size < 1.5:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched_at = time.perf_counter()
+
+            # Cada linha é avaliada com o snapshot com que foi submetida
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+
+            for items in groups.values():
+                try:
+                    scores, std = items[0][0].predict_with_std(np.array([item[1] for item in items], dtype=np.float64))
+                except Exception as e:
+                    for item in items:
+                        item[3].set_exception(e)
+                    continue
+                for index, item in enumerate(items):
+                    item[3].set_result((scores[index], None if std is None else std[index]))
+
+            self._record(batch, dispatched_at)
+
+    def _record(self, batch, dispatched_at):
+        delays_ms = [(dispatched_at - item[2]) * 1000 for item in batch]
+
+        with self._stats_lock:
+            self._recent_batch_size = 0.8 * self._recent_batch_size + 0.2 * len(batch)
+            self.batches += 1
+            self.rows += len(batch)
+            self.size_histogram[np.searchsorted(SIZE_BUCKETS, len(batch))] += 1
+            for delay in delays_ms:
+                self.delay_histogram[np.searchsorted(DELAY_BUCKETS_MS, delay)] += 1
+            self.delay_sum_ms += sum(delays_ms)
+            self.delay_max_ms = max(self.delay_max_ms, max(delays_ms))
+
+    def stats(self):
+        """
+        Distribuição de tamanhos de lote e atraso de fila adicionado.
+        """
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0,
+                'batch_size_histogram': _histogram(SIZE_BUCKETS, self.size_histogram),
+                'queue_delay_ms': {
+                    'mean': self.delay_sum_ms / self.rows if self.rows else 0,
+                    'max': self.delay_max_ms,
+                    'histogram': _histogram(DELAY_BUCKETS_MS, self.delay_histogram),
+                },
+            }
+
+
+def _histogram(bounds, counts):
+    """
+    Formata contagens por bucket como {'<=limite': n, ..., '+Inf': n}.
+    """
+    labels = [f'<={bound}' for bound in bounds] + ['+Inf']
+    return dict(zip(labels, counts))
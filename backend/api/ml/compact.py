@@ -0,0 +1,269 @@
+"""
+Compactação do modelo: menos árvores, nós em dtypes menores, artefato menor.
+
+Etapas:
+1. Seleciona o menor subconjunto de árvores cujo R² no conjunto de
+   validação fica a no máximo `tolerance` do R² da floresta completa
+   (seleção gulosa: a cada passo entra a árvore que mais melhora o R² da
+   média; metade das linhas seleciona e a outra metade confirma)
+2. Converte thresholds/valores para float32 e índices para int16/int32
+   (ver FlatForest.compacted: as folhas alcançadas não mudam)
+3. Recalibra a confiança na validação, grava model.compact.bin e um
+   relatório antes/depois (bytes, tempo de carga, latência de uma linha e
+   acurácia no conjunto de teste, que não participa da seleção nem da
+   calibração)
+
+Quando model.compact.bin existe ao lado de model.bin (ou na versão do
+registro), o servidor o usa no lugar de model.bin (PREDICTION_COMPACT=0 desativa).
+
+Uso:
+    python api/ml/compact.py                         # api/ml/model.bin
+    python api/ml/compact.py --version v0003         # versão do registro
+    python api/ml/compact.py --tolerance 0.002 --report compact.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+try:
+    from . import datagen, registry
+    from .forest import FlatForest
+    from .train_model import calibrate_confidence, load_dataset, split_dataset
+except ImportError:  # executado como script
+    import datagen
+    import registry
+    from forest import FlatForest
+    from train_model import calibrate_confidence, load_dataset, split_dataset
+
+
+# Perda máxima de R² aceita em relação à floresta completa
+DEFAULT_TOLERANCE = 0.005
+
+COMPACT_FILE = registry.COMPACT_FILE
+
+# Repetições para medir latência e tempo de carga
+LATENCY_REPEATS = 200
+LOAD_REPEATS = 20
+
+
+def _r2_of_means(sums, count, y):
+    means = sums / count
+    return 1 - ((means - y) ** 2).sum(axis=-1) / ((y - y.mean()) ** 2).sum()
+
+
+def select_trees(per_tree, y, tolerance=DEFAULT_TOLERANCE, check=None):
+    """
+    Seleção gulosa do menor subconjunto de árvores dentro da tolerância de R².
+
+    A cada passo entra a árvore que mais melhora o R² da média em (per_tree, y).
+    Com `check` = (per_tree, y) de outras linhas, a seleção só para quando o
+    subconjunto também está dentro da tolerância nelas; sem isso, poucas
+    árvores "acertam" o conjunto de seleção por acaso.
+
+    Args:
+        per_tree (np.ndarray): Predições de cada árvore, shape (n_trees, n)
+        y (array-like): Valores reais
+        tolerance (float): Perda máxima de R² em relação a todas as árvores
+        check (tuple): Conjunto de verificação (per_tree, y), opcional
+
+    Returns:
+        list[int]: Índices das árvores escolhidas, na ordem de seleção
+    """
+    y = np.asarray(y, dtype=np.float64)
+    sets = [(per_tree, y)]
+    if check is not None:
+        sets.append((check[0], np.asarray(check[1], dtype=np.float64)))
+    targets = [_r2_of_means(p.sum(axis=0), len(p), t) - tolerance for p, t in sets]
+
+    selected = []
+    remaining = np.arange(len(per_tree))
+    total = np.zeros(per_tree.shape[1])
+
+    while len(remaining):
+        # R² da média se cada árvore restante entrasse no conjunto
+        scores = _r2_of_means(total + per_tree[remaining], len(selected) + 1, y)
+        best = int(np.argmax(scores))
+
+        selected.append(int(remaining[best]))
+        total += per_tree[remaining[best]]
+        remaining = np.delete(remaining, best)
+
+        reached = [
+            _r2_of_means(p[selected].sum(axis=0), len(selected), t) >= target
+            for (p, t), target in zip(sets, targets)
+        ]
+        if all(reached):
+            break
+
+    return selected
+
+
+def compact_forest(forest, X, y, tolerance=DEFAULT_TOLERANCE):
+    """
+    Poda e compacta uma floresta.
+
+    As linhas pares de X escolhem as árvores e as ímpares verificam se o
+    subconjunto generaliza (ver select_trees).
+
+    Returns:
+        FlatForest: Floresta compactada
+    """
+    per_tree = forest.predict_trees(X)
+    y = np.asarray(y, dtype=np.float64)
+    selected = select_trees(per_tree[:, ::2], y[::2], tolerance, check=(per_tree[:, 1::2], y[1::2]))
+
+    compact = forest.select_trees(sorted(selected)).compacted()
+    compact.metadata.update({
+        'compacted_from_trees': forest.n_trees,
+        'r2_tolerance': tolerance,
+    })
+    return compact
+
+
+def measure(path, X, y):
+    """
+    Bytes, tempo de carga, latência de uma linha e acurácia de um model.bin.
+    """
+    load_times = []
+    for _ in range(LOAD_REPEATS):
+        started = time.perf_counter()
+        forest = FlatForest.load(path, mmap=True)
+        forest.predict(X[:1])
+        load_times.append(time.perf_counter() - started)
+
+    row = X[:1]
+    timings = []
+    for _ in range(LATENCY_REPEATS):
+        started = time.perf_counter()
+        forest.predict(row)
+        timings.append(time.perf_counter() - started)
+
+    y_pred = forest.predict(X)
+    return {
+        'trees': forest.n_trees,
+        'nodes': forest.node_count,
+        'file_bytes': os.path.getsize(path),
+        'load_ms': float(np.median(load_times) * 1000),
+        'latency_ms': float(np.median(timings) * 1000),
+        'r2': float(r2_score(y, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y, y_pred))),
+        'mae': float(mean_absolute_error(y, y_pred)),
+    }
+
+
+def measure_pickle(path, X, y):
+    """
+    As mesmas medidas para o model.pkl do sklearn (referência).
+    """
+    import joblib
+    import pandas as pd
+
+    columns = [name for name in datagen.COLUMNS if name != 'satisfaction_score']
+
+    load_times = []
+    for _ in range(3):
+        started = time.perf_counter()
+        model = joblib.load(path)
+        load_times.append(time.perf_counter() - started)
+
+    row = pd.DataFrame(X[:1], columns=columns)
+    timings = []
+    for _ in range(20):
+        started = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - started)
+
+    y_pred = model.predict(pd.DataFrame(X, columns=columns))
+    return {
+        'trees': len(model.estimators_),
+        'nodes': int(sum(e.tree_.node_count for e in model.estimators_)),
+        'file_bytes': os.path.getsize(path),
+        'load_ms': float(np.median(load_times) * 1000),
+        'latency_ms': float(np.median(timings) * 1000),
+        'r2': float(r2_score(y, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y, y_pred))),
+        'mae': float(mean_absolute_error(y, y_pred)),
+    }
+
+
+def holdout_data(n_samples=2000, data_path=None):
+    """
+    Conjuntos de validação e teste de train_model (ver train_model.split_dataset).
+
+    Returns:
+        tuple: (X_val, y_val, X_test, y_test) como arrays float64
+    """
+    df, _ = load_dataset(n_samples=n_samples, data_path=data_path)
+    X = df.drop('satisfaction_score', axis=1)
+    y = df['satisfaction_score']
+    _, X_val, X_test, _, y_val, y_test = split_dataset(X, y)
+    return tuple(np.asarray(data, dtype=np.float64) for data in (X_val, y_val, X_test, y_test))
+
+
+def print_report(report):
+    print(f"\n  {'artefato':22s} {'árvores':>7} {'nós':>7} {'bytes':>10} {'carga(ms)':>9} "
+          f"{'lat(ms)':>8} {'R²':>7} {'RMSE':>6}")
+    for name, m in report['artifacts'].items():
+        print(f"  {name:22s} {m['trees']:7d} {m['nodes']:7d} {m['file_bytes']:10,d} {m['load_ms']:9.2f} "
+              f"{m['latency_ms']:8.3f} {m['r2']:7.4f} {m['rmse']:6.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compacta o modelo (poda de árvores + dtypes menores)')
+    parser.add_argument('--version', help='Versão do registro (padrão: arquivos de api/ml/)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Perda máxima de R²')
+    parser.add_argument('--samples', type=int, default=2000, help='Exemplos sintéticos (como no treino)')
+    parser.add_argument('--data', help='CSV ou dataset colunar usado no treino')
+    parser.add_argument('--report', help='Arquivo JSON do relatório')
+    args = parser.parse_args(argv)
+
+    if args.version:
+        forest_path = registry.version_path(args.version, registry.FOREST_FILE)
+        model_path = registry.version_path(args.version, registry.SKLEARN_FILE)
+        output_path = registry.version_path(args.version, COMPACT_FILE)
+    else:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        forest_path = os.path.join(directory, registry.FOREST_FILE)
+        model_path = os.path.join(directory, registry.SKLEARN_FILE)
+        output_path = os.path.join(directory, COMPACT_FILE)
+
+    # Validação escolhe as árvores e calibra; o relatório só usa o teste
+    X_val, y_val, X_test, y_test = holdout_data(args.samples, args.data)
+
+    print(f"🔧 Compactando {forest_path} (tolerância de R²: {args.tolerance})...")
+    forest = FlatForest.load(forest_path, mmap=False)
+    compact = compact_forest(forest, X_val, y_val, args.tolerance)
+    # Menos árvores, outra dispersão: a calibração copiada da floresta completa não vale (como em train_model)
+    compact.metadata['confidence'] = calibrate_confidence(compact, X_val, y_val)
+    compact.save(output_path)
+    print(f"💾 Modelo compactado salvo em: {output_path}")
+
+    artifacts = {}
+    if os.path.exists(model_path):
+        artifacts['model.pkl (sklearn)'] = measure_pickle(model_path, X_test, y_test)
+    artifacts[registry.FOREST_FILE] = measure(forest_path, X_test, y_test)
+    artifacts[COMPACT_FILE] = measure(output_path, X_test, y_test)
+
+    report = {
+        'tolerance': args.tolerance, 'validation_rows': len(X_val), 'test_rows': len(X_test),
+        'artifacts': artifacts,
+    }
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Relatório salvo em: {args.report}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Nível de confiança das predições a partir da dispersão entre as árvores.
+
+Duas fontes de incerteza, ambas obtidas na mesma travessia que calcula o
+score:
+
+- Dispersão das árvores: desvio padrão das predições individuais
+  (FlatForest.predict_with_std). Árvores que discordam indicam uma região
+  pouco determinada pelos dados de treino.
+- Distância ao suporte do treino: quanto cada feature fica fora do
+  intervalo [mínimo, máximo] visto no treino (dos histogramas de
+  referência, ver drift.py), em frações da amplitude. Fora do suporte as
+  árvores extrapolam com folhas de borda e podem concordar mesmo erradas.
+
+Os limites de desvio que separam high/medium/low e a escala do intervalo
+de predição são calibrados no treino (calibrate), sobre o conjunto de
+teste, e gravados nos metadados do model.bin.
+"""
+
+import numpy as np
+
+
+# Quantis do desvio no conjunto de teste: até o 1º é 'high', até o 2º 'medium'
+CONFIDENCE_QUANTILES = (0.5, 0.9)
+
+# Cobertura do intervalo de predição (score ± escala * desvio)
+INTERVAL_COVERAGE = 0.9
+
+# Distância ao suporte (fração da amplitude da feature) a partir da qual a confiança é 'low'
+SUPPORT_FAR = 0.25
+
+LEVEL_NAMES = ('high', 'medium', 'low')
+LEVELS = np.array(LEVEL_NAMES)
+
+
+def calibrate(predictions, std, y):
+    """
+    Limites de desvio por nível e escala do intervalo, medidos num conjunto rotulado.
+
+    Args:
+        predictions (array-like): Predições do modelo (n,)
+        std (array-like): Desvios das árvores (n,)
+        y (array-like): Valores reais (n,)
+
+    Returns:
+        dict: {
+            'std_high': float, 'std_medium': float,
+            'interval_scale': float, 'interval_coverage': float,
+            'mae': {nível: erro absoluto médio no conjunto de calibração}
+        }
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    std = np.asarray(std, dtype=np.float64)
+    errors = np.abs(np.asarray(y, dtype=np.float64) - predictions)
+
+    std_high, std_medium = (float(value) for value in np.quantile(std, CONFIDENCE_QUANTILES))
+    # Menor escala que cobre INTERVAL_COVERAGE dos erros com score ± escala * desvio
+    scale = float(np.quantile(errors / np.maximum(std, 1e-9), INTERVAL_COVERAGE))
+
+    calibration = {
+        'std_high': std_high,
+        'std_medium': std_medium,
+        'interval_scale': scale,
+        'interval_coverage': INTERVAL_COVERAGE,
+    }
+    levels = confidence_levels(std, np.zeros(len(std)), calibration)
+    calibration['mae'] = {
+        level: round(float(errors[levels == level].mean()), 4) if (levels == level).any() else None
+        for level in LEVEL_NAMES
+    }
+    return calibration
+
+
+def support_bounds(reference):
+    """
+    Limites (mínimo, máximo) de cada feature no treino, a partir dos histogramas de referência.
+
+    edges[0] é o mínimo e edges[-1] fica logo acima do máximo (ver drift.bin_edges).
+
+    Returns:
+        tuple: (mínimos (n_features,), máximos (n_features,))
+    """
+    features = reference['features'].values()
+    return (
+        np.array([ref['edges'][0] for ref in features]),
+        np.array([ref['edges'][-1] for ref in features]),
+    )
+
+
+def support_distance(X, bounds):
+    """
+    Maior distância (n,) de cada linha ao intervalo do treino, em frações da amplitude da feature.
+
+    0 dentro do suporte.
+    """
+    lower, upper = bounds
+    outside = np.maximum(lower - X, 0) + np.maximum(X - upper, 0)
+    return (outside / np.maximum(upper - lower, 1e-9)).max(axis=1)
+
+
+def confidence_levels(std, distance, calibration):
+    """
+    Nível de cada linha: pelo desvio, rebaixado um nível fora do suporte e 'low' longe dele.
+
+    Returns:
+        np.ndarray: 'high', 'medium' ou 'low' por linha
+    """
+    std = np.asarray(std, dtype=np.float64)
+    distance = np.asarray(distance, dtype=np.float64)
+    level = (std > calibration['std_high']).astype(int) + (std > calibration['std_medium'])
+    level = np.minimum(level + (distance > 0), 2)
+    level[distance >= SUPPORT_FAR] = 2
+    return LEVELS[level]
+
+
+def uncertainty(predictions, std, distance, calibration):
+    """
+    Detalhes da incerteza por linha (desvio, intervalo calibrado e distância ao suporte).
+
+    Returns:
+        list[dict]: {'std', 'interval': [inferior, superior], 'support_distance'}
+    """
+    return [
+        _uncertainty(score, s, d, calibration)
+        for score, s, d in zip(np.asarray(predictions).tolist(), np.asarray(std).tolist(), np.asarray(distance).tolist())
+    ]
+
+
+def row_confidence(score, std, row, bounds, calibration):
+    """
+    Versão de uma linha de confidence_levels + uncertainty, sem overhead do NumPy.
+
+    Returns:
+        tuple: (nível, detalhes da incerteza)
+    """
+    score, std = float(score), float(std)
+    distance = 0.0
+    for value, lower, upper in zip(row, bounds[0].tolist(), bounds[1].tolist()):
+        outside = lower - value if value < lower else value - upper if value > upper else 0.0
+        if outside > 0:
+            distance = max(distance, outside / max(upper - lower, 1e-9))
+
+    level = (std > calibration['std_high']) + (std > calibration['std_medium'])
+    if distance > 0:
+        level = min(level + 1, 2)
+    if distance >= SUPPORT_FAR:
+        level = 2
+    return LEVEL_NAMES[level], _uncertainty(score, std, distance, calibration)
+
+
+def _uncertainty(score, std, distance, calibration):
+    half_width = calibration['interval_scale'] * std
+    return {
+        'std': round(std, 2),
+        'interval': [round(max(score - half_width, 0.0), 2), round(min(score + half_width, 100.0), 2)],
+        'support_distance': round(distance, 3),
+    }
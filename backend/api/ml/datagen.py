@@ -0,0 +1,285 @@
+"""
+Gerador de dados sintéticos em chunks, para datasets de 10M-100M linhas.
+
+Cada chunk usa seu próprio numpy.random.Generator, derivado de
+SeedSequence(seed).spawn(n_chunks). O chunk i é sempre o mesmo,
+independente de quantos processos geram o dataset ou da ordem em que os
+chunks terminam.
+
+Formato em disco (diretório colunar):
+
+    dataset/
+        meta.json                 # linhas, seed, chunk_size, colunas e dtypes
+        age.npy                   # uma coluna por arquivo .npy
+        salary.npy
+        ...
+        satisfaction_score.npy
+
+As colunas são lidas com np.load(mmap_mode='r'): só as páginas usadas são
+carregadas, e treino/validação podem percorrer o dataset em chunks.
+
+Uso:
+    python api/ml/datagen.py /data/funcionarios-10m --rows 10000000 --workers 8
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# Linhas por chunk (cada chunk ocupa ~35MB em memória)
+CHUNK_ROWS = 1_000_000
+
+META_FILE = 'meta.json'
+
+# Colunas geradas e dtypes em disco
+COLUMNS = {
+    'age': np.int16,
+    'salary': np.float64,
+    'commute_time': np.int16,
+    'gym_usage': np.int16,
+    'meal_voucher': np.float64,
+    'health_plan_tier': np.int8,
+    'satisfaction_score': np.float64,
+}
+
+
+def generate_chunk(rng, n_samples):
+    """
+    Gera um chunk de funcionários e o score de satisfação.
+
+    Args:
+        rng (np.random.Generator): Stream de números aleatórios do chunk
+        n_samples (int): Linhas do chunk
+
+    Returns:
+        dict: Coluna -> np.ndarray, com os dtypes de COLUMNS
+    """
+    # Gera features aleatórias dentro de ranges realistas
+    data = {
+        'age': rng.integers(18, 55, n_samples),
+        'salary': rng.uniform(1500, 15000, n_samples),
+        'commute_time': rng.integers(0, 181, n_samples),
+        'gym_usage': rng.integers(0, 31, n_samples),
+        'meal_voucher': rng.uniform(0, 1501, n_samples),
+        'health_plan_tier': rng.integers(1, 4, n_samples),
+    }
+
+    # Satisfação aumenta com: salário alto, pouco commute, uso de benefícios
+    score = (
+        # Salário contribui 0-30 pontos
+        (data['salary'] / 1500) * 30 +
+        # Commute baixo contribui 0-20 pontos
+        (1 - data['commute_time'] / 180) * 20 +
+        # Uso de academia 0-15 pontos
+        (data['gym_usage'] / 30) * 15 +
+        # Vale-refeição 0-15 pontos
+        (data['meal_voucher'] / 1500) * 15 +
+        # Plano de saúde 0-20 pontos
+        (data['health_plan_tier'] / 3) * 20
+    )
+
+    # Adiciona ruído realista e garante range 0-100
+    score = score + rng.normal(0, 5, n_samples)
+    data['satisfaction_score'] = np.clip(score, 0, 100)
+
+    return {name: data[name].astype(dtype) for name, dtype in COLUMNS.items()}
+
+
+def chunk_seeds(n_samples, chunk_size=CHUNK_ROWS, seed=42):
+    """
+    Retorna (início, tamanho, SeedSequence) de cada chunk.
+    """
+    starts = range(0, n_samples, chunk_size)
+    children = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(start, min(chunk_size, n_samples - start), child) for start, child in zip(starts, children)]
+
+
+def iter_chunks(n_samples, chunk_size=CHUNK_ROWS, seed=42):
+    """
+    Gera o dataset chunk a chunk, sem materializá-lo inteiro.
+    """
+    for _, size, child in chunk_seeds(n_samples, chunk_size, seed):
+        yield generate_chunk(np.random.default_rng(child), size)
+
+
+def generate_frame(n_samples, chunk_size=CHUNK_ROWS, seed=42):
+    """
+    Dataset inteiro em memória (para datasets pequenos).
+    """
+    chunks = list(iter_chunks(n_samples, chunk_size, seed))
+    return pd.DataFrame({name: np.concatenate([c[name] for c in chunks]) for name in COLUMNS})
+
+
+def _write_chunk(path, start, size, seed_seq):
+    """
+    Gera um chunk e grava direto na sua fatia das colunas (executado nos workers).
+    """
+    chunk = generate_chunk(np.random.default_rng(seed_seq), size)
+    for name, values in chunk.items():
+        column = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r+')
+        column[start:start + size] = values
+        column.flush()
+        del column
+    return size
+
+
+def write_dataset(path, n_samples, chunk_size=CHUNK_ROWS, seed=42, workers=None, progress=None):
+    """
+    Gera um dataset sintético colunar em disco, em paralelo.
+
+    As colunas são pré-alocadas e cada worker grava sua fatia, então nenhum
+    dado passa pelo processo principal. O diretório final só aparece quando
+    o dataset está completo (escrita em diretório temporário + rename).
+
+    Args:
+        path (str): Diretório de destino (não pode existir)
+        n_samples (int): Total de linhas
+        chunk_size (int): Linhas por chunk
+        seed (int): Seed raiz; define o conteúdo do dataset junto com chunk_size
+        workers (int): Processos (padrão: todos os núcleos)
+        progress (callable): Chamado com o total de linhas gravadas após cada chunk
+    """
+    tmp_path = _create_columns(path, n_samples, {
+        'n_rows': n_samples,
+        'seed': seed,
+        'chunk_size': chunk_size,
+    })
+
+    try:
+        chunks = chunk_seeds(n_samples, chunk_size, seed)
+        workers = min(workers or os.cpu_count() or 1, max(1, len(chunks)))
+        written = 0
+        if workers == 1:
+            for start, size, seed_seq in chunks:
+                written += _write_chunk(tmp_path, start, size, seed_seq)
+                if progress:
+                    progress(written)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [pool.submit(_write_chunk, tmp_path, *chunk) for chunk in chunks]
+                for future in futures:
+                    written += future.result()
+                    if progress:
+                        progress(written)
+        os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    return path
+
+
+def write_frame(path, df):
+    """
+    Grava um DataFrame existente (ex: CSV carregado) no formato colunar.
+    """
+    tmp_path = _create_columns(path, len(df), {'n_rows': len(df)}, dtypes={
+        name: df[name].dtype for name in df.columns
+    })
+    try:
+        for name in df.columns:
+            column = np.load(os.path.join(tmp_path, f'{name}.npy'), mmap_mode='r+')
+            column[:] = df[name].to_numpy()
+            column.flush()
+            del column
+        os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return path
+
+
+def _create_columns(path, n_rows, meta, dtypes=None):
+    dtypes = dtypes or COLUMNS
+    tmp_path = f"{path.rstrip(os.sep)}.tmp{os.getpid()}"
+    os.makedirs(tmp_path)
+
+    for name, dtype in dtypes.items():
+        np.lib.format.open_memmap(
+            os.path.join(tmp_path, f'{name}.npy'), mode='w+', dtype=dtype, shape=(n_rows,)
+        ).flush()
+
+    meta = {**meta, 'columns': {name: np.dtype(dtype).str for name, dtype in dtypes.items()}}
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return tmp_path
+
+
+def is_dataset(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def open_dataset(path, columns=None):
+    """
+    Abre as colunas do dataset como memmaps read-only (nada é lido do disco ainda).
+
+    Returns:
+        dict: Coluna -> np.memmap
+    """
+    columns = columns or list(read_meta(path)['columns'])
+    return {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in columns}
+
+
+def load_frame(path, columns=None, rows=None):
+    """
+    Materializa o dataset (ou uma fatia/seleção de linhas) como DataFrame.
+
+    Args:
+        rows: slice ou array de índices; None = todas as linhas
+    """
+    data = open_dataset(path, columns)
+    if rows is None:
+        rows = slice(None)
+    return pd.DataFrame({name: np.asarray(column[rows]) for name, column in data.items()})
+
+
+def iter_frames(path, chunk_size=CHUNK_ROWS, columns=None):
+    """
+    Percorre o dataset em DataFrames de até chunk_size linhas.
+    """
+    data = open_dataset(path, columns)
+    n_rows = len(next(iter(data.values())))
+    for start in range(0, n_rows, chunk_size):
+        yield pd.DataFrame({name: np.asarray(column[start:start + chunk_size]) for name, column in data.items()})
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Gera um dataset sintético colunar em disco')
+    parser.add_argument('path', help='Diretório de destino')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Total de linhas')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS, help='Linhas por chunk')
+    parser.add_argument('--seed', type=int, default=42, help='Seed raiz')
+    parser.add_argument('--workers', type=int, help='Processos (padrão: todos os núcleos)')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.path):
+        print(f"❌ {args.path} já existe")
+        return 1
+
+    started = time.perf_counter()
+
+    def progress(written):
+        elapsed = time.perf_counter() - started
+        print(f"  {written:,}/{args.rows:,} linhas | {written / elapsed:,.0f} linhas/s")
+
+    print(f"🔄 Gerando {args.rows:,} linhas em {args.path}...")
+    write_dataset(args.path, args.rows, args.chunk_size, args.seed, args.workers, progress)
+    print(f"✅ Dataset gerado em {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,192 @@
+"""
+Histogramas de referência e estatísticas de drift das features de entrada.
+
+No treino (train_model.py), fit_reference calcula para cada feature os
+limites de bins fixos (quantis do conjunto de treino, mais um bin abaixo
+do mínimo e outro acima do máximo, vazios no treino) e as contagens do
+treino em cada bin. O resultado vai para os metadados da floresta
+(model.bin), junto do modelo que ele descreve.
+
+Em produção, StreamingHistograms conta as entradas nos mesmos bins (O(1)
+por predição) e compare mede a distância entre as duas distribuições:
+
+- PSI (Population Stability Index): soma de (p - q) * ln(p / q) nos bins
+- KS: maior diferença entre as distribuições acumuladas, nos limites dos bins
+
+Só depende de NumPy (roda no processo que serve predições).
+"""
+
+import hashlib
+import json
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+
+# Bins por quantis do treino (o total por feature pode ser menor: quantis repetidos viram um limite só)
+REFERENCE_BINS = 10
+
+# Faixas usuais do PSI: < 0.1 estável, 0.1-0.25 moderado, > 0.25 significativo
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Proporção mínima por bin no PSI (bins vazios em um dos lados)
+PSI_EPSILON = 1e-4
+
+
+def bin_edges(values, bins=REFERENCE_BINS):
+    """
+    Limites dos bins de uma feature: mínimo, quantis internos e logo acima do máximo.
+
+    Um valor x cai no bin bisect_right(edges, x): o bin 0 (x < mínimo) e o
+    último (x > máximo) ficam vazios no treino e recebem as entradas fora
+    do suporte.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    quantiles = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    upper = np.nextafter(values.max(), np.inf)
+    return np.unique(np.concatenate([[values.min()], quantiles, [upper]]))
+
+
+def fit_reference(X, features, bins=REFERENCE_BINS):
+    """
+    Histogramas de referência do conjunto de treino.
+
+    Args:
+        X (array-like): Matriz (n, len(features))
+        features (list): Nomes das colunas
+
+    Returns:
+        dict: {
+            'id': str (hash dos bins: contagens com o mesmo id são somáveis),
+            'n_samples': int,
+            'features': {feature: {'edges': [...], 'counts': [...]}}
+        }
+    """
+    X = np.asarray(X, dtype=np.float64)
+    histograms = {}
+    for j, name in enumerate(features):
+        edges = bin_edges(X[:, j], bins)
+        counts = np.bincount(np.searchsorted(edges, X[:, j], side='right'), minlength=len(edges) + 1)
+        histograms[name] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+    digest = hashlib.sha256(json.dumps(histograms, sort_keys=True).encode()).hexdigest()
+    return {'id': digest[:16], 'n_samples': len(X), 'features': histograms}
+
+
+def psi(reference_counts, current_counts):
+    """Population Stability Index entre dois histogramas nos mesmos bins."""
+    p = np.clip(_proportions(current_counts), PSI_EPSILON, None)
+    q = np.clip(_proportions(reference_counts), PSI_EPSILON, None)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def ks(reference_counts, current_counts):
+    """Estatística KS (maior distância entre as acumuladas) avaliada nos limites dos bins."""
+    return float(np.max(np.abs(
+        np.cumsum(_proportions(current_counts)) - np.cumsum(_proportions(reference_counts))
+    )))
+
+
+def drift_status(value):
+    """'stable', 'moderate' ou 'significant' para um PSI."""
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+def compare(reference, current):
+    """
+    Compara as contagens atuais com a referência do treino.
+
+    Args:
+        reference (dict): Saída de fit_reference
+        current (dict): Feature -> contagens nos bins da referência
+
+    Returns:
+        dict: Feature -> {'psi', 'ks', 'status', 'observations', 'out_of_range', 'bins'}
+    """
+    report = {}
+    for name, ref in reference['features'].items():
+        edges = ref['edges']
+        counts = np.asarray(current.get(name, np.zeros(len(edges) + 1)), dtype=np.int64)
+        observations = int(counts.sum())
+        value = psi(ref['counts'], counts) if observations else 0.0
+        report[name] = {
+            'psi': round(value, 4),
+            'ks': round(ks(ref['counts'], counts), 4) if observations else 0.0,
+            'status': drift_status(value),
+            'observations': observations,
+            # Entradas abaixo do mínimo ou acima do máximo vistos no treino
+            'out_of_range': int(counts[0] + counts[-1]),
+            'bins': [
+                {'lower': lower, 'upper': upper, 'reference': int(expected), 'current': int(observed)}
+                for lower, upper, expected, observed in zip(
+                    [None] + edges, edges + [None], ref['counts'], counts
+                )
+            ],
+        }
+    return report
+
+
+def _proportions(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    return counts / total if total else counts
+
+
+class StreamingHistograms:
+    """
+    Contagens das entradas nos bins de uma referência, em memória (thread-safe).
+    """
+
+    def __init__(self, reference):
+        self.features = list(reference['features'])
+        self._edges = [reference['features'][name]['edges'] for name in self.features]
+        self._edge_arrays = [np.asarray(edges) for edges in self._edges]
+        self._counts = self._empty()
+        self._lock = threading.Lock()
+
+    def add(self, X):
+        """
+        Conta as linhas de X (n, len(features)), na ordem de features.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+        if len(X) == 1:
+            # Uma linha: bisect em listas é mais barato que searchsorted + bincount
+            row = X[0].tolist()
+            with self._lock:
+                for counts, edges, value in zip(self._counts, self._edges, row):
+                    counts[bisect_right(edges, value)] += 1
+            return
+
+        binned = [
+            np.bincount(np.searchsorted(edges, X[:, j], side='right'), minlength=len(edges) + 1)
+            for j, edges in enumerate(self._edge_arrays)
+        ]
+        with self._lock:
+            for counts, added in zip(self._counts, binned):
+                for index in np.flatnonzero(added):
+                    counts[index] += int(added[index])
+
+    def drain(self):
+        """
+        Retorna as contagens acumuladas (feature -> lista) e zera o histograma.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, self._empty()
+        return dict(zip(self.features, counts))
+
+    def snapshot(self):
+        """
+        Retorna uma cópia das contagens acumuladas sem zerar o histograma.
+        """
+        with self._lock:
+            counts = [list(feature_counts) for feature_counts in self._counts]
+        return dict(zip(self.features, counts))
+
+    def _empty(self):
+        return [[0] * (len(edges) + 1) for edges in self._edges]
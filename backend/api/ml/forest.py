@@ -0,0 +1,538 @@
+"""
+Motor de inferência para Random Forest em arrays contíguos.
+
+Os nós de todas as árvores são concatenados em arrays planos (feature,
+threshold, filhos e valor) e a travessia é feita com NumPy para todas as
+árvores e todas as linhas ao mesmo tempo, sem passar pela validação e
+pelo dispatch do scikit-learn.
+"""
+
+import json
+import math
+import os
+import struct
+import zlib
+
+import numpy as np
+
+
+# Linhas processadas por vez (mantém os arrays intermediários no cache da CPU)
+CHUNK_SIZE = 1024
+
+# Formato binário (model.bin):
+#   MAGIC (8 bytes) | tamanho do header (uint64 LE) | header JSON | arrays
+# Cada array começa alinhado em ALIGNMENT bytes, então o arquivo pode ser
+# mapeado em memória (read-only) e as páginas compartilhadas entre processos.
+# Só contém números: carregar não executa código (ao contrário do pickle) nem
+# depende da versão do scikit-learn. O header guarda o CRC32 de cada array.
+MAGIC = b'BPFOREST'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+
+
+class FlatForest:
+    """
+    Floresta de regressão em formato plano.
+
+    children tem shape (n_nodes, 2) com os filhos esquerdo e direito de cada
+    nó. Folhas apontam para si mesmas e têm threshold +inf, então a
+    travessia pode rodar max_depth passos fixos.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features, metadata=None):
+        # Índices compactos (int8/int16/int32, ver compacted) ficam no dtype do
+        # arquivo: convertê-los para intp copiaria os arrays para a memória
+        # privada de cada processo e perderia as páginas compartilhadas do mmap.
+        # A travessia converte só os nós visitados em cada passo.
+        self.compact_indices = np.asarray(feature).dtype != np.intp
+        self.feature = np.asarray(feature)
+        self.threshold = threshold
+        self.children = np.asarray(children)
+        self.value = value
+        self.roots = np.asarray(roots)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.metadata = metadata or {}
+
+        # Visão 1-D dos filhos: filho de `node` na direção d (0/1) = node*2 + d
+        self._children_flat = self.children.reshape(-1)
+
+        # Thresholds distintos de cada feature (calculados no primeiro uso, ver regions)
+        self._split_points = None
+
+        # Contribuições acumuladas da raiz até cada nó (calculadas no primeiro uso, ver explain)
+        self._node_contributions = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    @classmethod
+    def from_sklearn(cls, model, metadata=None):
+        """
+        Converte um RandomForestRegressor treinado (saída única).
+        """
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(offset, offset + tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree.children_left + offset),
+                np.where(is_leaf, node_ids, tree.children_right + offset),
+            ]))
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            metadata={'model_type': type(model).__name__, **(metadata or {})},
+        )
+
+    def select_trees(self, indices):
+        """
+        Nova floresta só com as árvores em `indices` (nós renumerados).
+        """
+        starts = np.asarray(self.roots)
+        ends = np.append(starts[1:], self.node_count)
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for index in indices:
+            start, end = starts[index], ends[index]
+            features.append(self.feature[start:end])
+            thresholds.append(self.threshold[start:end])
+            children.append(self.children[start:end] - start + offset)
+            values.append(self.value[start:end])
+            roots.append(offset)
+            offset += end - start
+
+        return FlatForest(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.ascontiguousarray(np.concatenate(children)),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=self.roots.dtype),
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            metadata=dict(self.metadata),
+        )
+
+    def compacted(self):
+        """
+        Cópia com dtypes compactos: thresholds e valores em float32 e, no
+        arquivo gravado por save(), índices no menor inteiro que comporta o
+        número de nós (mantidos nesse dtype ao carregar, ver __init__).
+
+        Os inputs já são comparados em float32. Cada threshold é arredondado
+        para baixo (maior float32 <= threshold original): para qualquer x
+        float32, x > t32 equivale a x > t64, então as folhas alcançadas não
+        mudam. Só os valores das folhas perdem precisão (float32).
+        """
+        threshold = self.threshold.astype(np.float32)
+        rounded_up = threshold.astype(np.float64) > self.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+
+        forest = FlatForest(
+            feature=self.feature,
+            threshold=threshold,
+            children=self.children,
+            value=self.value.astype(np.float32),
+            roots=self.roots,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            metadata=dict(self.metadata),
+        )
+        forest.compact_indices = True
+        return forest
+
+    def save(self, path):
+        """
+        Grava a floresta no formato binário mapeável (escrita atômica).
+        """
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in _ARRAYS}
+        if self.compact_indices:
+            # node * 2 + 1 precisa caber no dtype dos índices
+            index_dtype = np.int16 if 2 * self.node_count + 1 <= np.iinfo(np.int16).max else np.int32
+            feature_dtype = np.int8 if self.n_features <= np.iinfo(np.int8).max else np.int16
+            arrays['feature'] = arrays['feature'].astype(feature_dtype)
+            arrays['children'] = arrays['children'].astype(index_dtype)
+            arrays['roots'] = arrays['roots'].astype(index_dtype)
+        header = {
+            'format_version': FORMAT_VERSION,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'metadata': self.metadata,
+            'arrays': {},
+        }
+
+        # Offsets dependem do tamanho do header, que depende dos offsets:
+        # reserva espaço suficiente e ajusta até estabilizar
+        header_size = 0
+        while True:
+            offset = _align(len(MAGIC) + 8 + header_size)
+            for name, array in arrays.items():
+                header['arrays'][name] = {
+                    'dtype': array.dtype.str,
+                    'shape': list(array.shape),
+                    'offset': offset,
+                    'crc32': zlib.crc32(array),
+                }
+                offset = _align(offset + array.nbytes)
+            encoded = json.dumps(header).encode('utf-8')
+            if len(encoded) <= header_size:
+                break
+            header_size = _align(len(encoded))
+
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', header_size))
+            f.write(encoded.ljust(header_size, b' '))
+            for name, array in arrays.items():
+                f.seek(header['arrays'][name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(offset)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True, verify=True):
+        """
+        Carrega uma floresta salva com save().
+
+        Com mmap=True os arrays são visões read-only sobre o arquivo mapeado:
+        todos os processos que carregam o mesmo arquivo compartilham as
+        mesmas páginas físicas (page cache do SO).
+
+        O header e a estrutura da floresta são sempre validados; com
+        verify=True os checksums dos arrays também são conferidos.
+        """
+        if mmap:
+            buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        else:
+            with open(path, 'rb') as f:
+                buffer = np.frombuffer(f.read(), dtype=np.uint8)
+
+        start = len(MAGIC) + 8
+        if len(buffer) < start or bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Arquivo não é um modelo flat: {path}")
+        header_size = struct.unpack('<Q', bytes(buffer[len(MAGIC):start]))[0]
+        if start + header_size > len(buffer):
+            raise ValueError(f"Header truncado: {path}")
+        try:
+            header = json.loads(bytes(buffer[start:start + header_size]).decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError(f"Header inválido: {path}")
+        if header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Versão de formato não suportada: {header.get('format_version')}")
+
+        arrays = {}
+        for name in _ARRAYS:
+            spec = header.get('arrays', {}).get(name)
+            if spec is None:
+                raise ValueError(f"Array ausente no header: {name}")
+            arrays[name] = _read_array(buffer, name, spec, verify)
+
+        forest = cls(
+            max_depth=header['max_depth'],
+            n_features=header['n_features'],
+            metadata=header['metadata'],
+            **arrays
+        )
+        forest._validate()
+        return forest
+
+    def _validate(self):
+        """
+        Confere shapes e índices, para que um arquivo corrompido falhe no
+        carregamento e não com IndexError no meio de uma predição.
+        """
+        n = self.node_count
+        if self.threshold.shape != (n,) or self.value.shape != (n,) or self.children.shape != (n, 2):
+            raise ValueError("Arrays da floresta com shapes inconsistentes")
+        if len(self.roots) == 0 or self.max_depth < 0:
+            raise ValueError("Floresta vazia ou max_depth inválido")
+        for name, array, limit in (('children', self.children, n), ('roots', self.roots, n),
+                                   ('feature', self.feature, self.n_features)):
+            if array.min() < 0 or array.max() >= limit:
+                raise ValueError(f"Índices fora do intervalo em {name}")
+
+    def apply(self, X):
+        """
+        Retorna o índice da folha alcançada em cada árvore.
+
+        Args:
+            X (array-like): Matriz (n, n_features)
+
+        Returns:
+            np.ndarray: Índices de nó com shape (n_trees, n)
+        """
+        # O scikit-learn compara inputs em float32 contra thresholds float64
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        if len(X) <= CHUNK_SIZE:
+            return self._apply_chunk(X)
+
+        return np.concatenate(
+            [self._apply_chunk(X[start:start + CHUNK_SIZE]) for start in range(0, len(X), CHUNK_SIZE)],
+            axis=1
+        )
+
+    def _apply_chunk(self, X):
+        X_flat = np.ascontiguousarray(X).reshape(-1)
+        row_offset = np.arange(len(X)) * self.n_features
+        node = np.repeat(self.roots.astype(np.intp)[:, np.newaxis], len(X), axis=1)
+
+        for _ in range(self.max_depth):
+            go_right = X_flat[row_offset + self.feature[node]] > self.threshold[node]
+            # intp: uma conversão por passo em vez de uma por fancy indexing (no-op sem índices compactos)
+            node = self._children_flat[node * 2 + go_right].astype(np.intp, copy=False)
+
+        return node
+
+    def predict_trees(self, X):
+        """
+        Predição de cada árvore, com shape (n_trees, n).
+        """
+        return self.value[self.apply(X)]
+
+    def predict(self, X):
+        """
+        Média das árvores, na mesma ordem de acumulação do scikit-learn.
+        """
+        return self.predict_trees(X).sum(axis=0, dtype=np.float64) / self.n_trees
+
+    def predict_with_std(self, X):
+        """
+        Média e desvio padrão das árvores, a partir das mesmas folhas.
+
+        A média é idêntica à de predict; o desvio (dispersão entre as
+        árvores) sai das folhas já lidas, sem outra travessia.
+
+        Returns:
+            tuple: (predições (n,), desvios (n,))
+        """
+        per_tree = self.predict_trees(X)
+        predictions = per_tree.sum(axis=0, dtype=np.float64) / self.n_trees
+        return predictions, _tree_std(per_tree, predictions, self.n_trees)
+
+    def explain(self, X, return_std=False):
+        """
+        Predição e contribuição de cada feature por linha (decomposição dos caminhos).
+
+        Em cada nó do caminho até a folha, a variação do valor médio do nó
+        (filho - pai) é atribuída à feature do split. Somando as árvores:
+
+            predição = bias + contribuições.sum(axis=1)
+
+        As contribuições acumuladas da raiz até cada nó são pré-calculadas
+        uma vez, então explicar custa a travessia de predict mais uma
+        leitura por árvore.
+
+        Returns:
+            tuple: (predições (n,), bias (float), contribuições (n, n_features)),
+                mais os desvios das árvores (n,) com return_std=True
+        """
+        if self._node_contributions is None:
+            self._node_contributions = self._accumulate_contributions()
+
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        predictions = np.empty(len(X))
+        std = np.empty(len(X))
+        contributions = np.empty((len(X), self.n_features))
+        for start in range(0, len(X), CHUNK_SIZE):
+            leaves = self._apply_chunk(X[start:start + CHUNK_SIZE])
+            rows = slice(start, start + leaves.shape[1])
+            per_tree = self.value[leaves]
+            predictions[rows] = per_tree.sum(axis=0, dtype=np.float64) / self.n_trees
+            contributions[rows] = self._node_contributions[leaves].sum(axis=0) / self.n_trees
+            if return_std:
+                std[rows] = _tree_std(per_tree, predictions[rows], self.n_trees)
+
+        bias = float(self.value[self.roots].astype(np.float64).mean())
+        if return_std:
+            return predictions, bias, contributions, std
+        return predictions, bias, contributions
+
+    def _accumulate_contributions(self):
+        """
+        Contribuições (n_nodes, n_features) acumuladas da raiz até cada nó, nível a nível.
+        """
+        value = np.asarray(self.value, dtype=np.float64)
+        internal = np.isfinite(self.threshold)
+        accumulated = np.zeros((self.node_count, self.n_features))
+
+        frontier = self.roots[internal[self.roots]]
+        while len(frontier):
+            feature = self.feature[frontier]
+            for side in (0, 1):
+                child = self.children[frontier, side]
+                accumulated[child] = accumulated[frontier]
+                accumulated[child, feature] += value[child] - value[frontier]
+            children = self.children[frontier].reshape(-1)
+            frontier = children[internal[children]]
+        return accumulated
+
+    def regions(self, X):
+        """
+        Região de decisão de cada valor: quantos thresholds da sua feature ele supera.
+
+        Duas linhas com os mesmos ids em todas as colunas vão para o mesmo
+        lado em todos os nós e alcançam as mesmas folhas em todas as árvores.
+
+        Returns:
+            np.ndarray: Ids inteiros com o shape de X
+        """
+        if self._split_points is None:
+            internal = np.isfinite(self.threshold)
+            self._split_points = [
+                np.unique(self.threshold[internal & (self.feature == j)]) for j in range(self.n_features)
+            ]
+
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        # side='left' conta os thresholds t < x, ou seja, os nós onde x vai para a direita
+        return np.column_stack([
+            np.searchsorted(points, X[:, j], side='left') for j, points in enumerate(self._split_points)
+        ])
+
+    def predict_unique(self, X):
+        """
+        Mesmo resultado de predict, avaliando só uma linha por região de decisão.
+
+        Útil para varreduras densas (ex: salary de 1500 a 15000 em passos de
+        R$ 1, ou age x commute_time em todos os inteiros das faixas), em que
+        muitas linhas caem entre os mesmos thresholds.
+        """
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        _, first, inverse = np.unique(self.regions(X), axis=0, return_index=True, return_inverse=True)
+        return self.predict(X[first])[inverse.reshape(-1)]
+
+    def predict_grid(self, X, candidates, columns):
+        """
+        Prediz cada linha de X combinada com cada candidato.
+
+        A linha i com as colunas `columns` substituídas pelo candidato j gera
+        o resultado [i, j], o mesmo de predict sobre essa linha montada.
+
+        Em vez de percorrer n * m linhas em todas as árvores, cada árvore é
+        percorrida uma vez por grupo de linhas que ela não distingue (mesmo
+        lado em todos os nós das colunas fixas) e candidato; o resultado é
+        espalhado para as linhas do grupo.
+
+        Args:
+            X (array-like): Linhas base, shape (n, n_features)
+            candidates (array-like): Valores das colunas variadas, shape (m, len(columns))
+            columns (list[int]): Colunas de X substituídas pelos candidatos
+
+        Returns:
+            np.ndarray: Predições com shape (n, m)
+        """
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        candidates = np.asarray(candidates, dtype=np.float32).reshape(-1, len(columns))
+        fixed = [j for j in range(self.n_features) if j not in columns]
+
+        starts = self.roots
+        ends = np.append(starts[1:], self.node_count)
+        total = np.zeros((len(X), len(candidates)), dtype=np.float64)
+
+        for start, end in zip(starts, ends):
+            threshold = self.threshold[start:end]
+            feature = np.where(np.isfinite(threshold), self.feature[start:end], -1)
+
+            # Grupos de linhas: mesmo lado em todos os nós desta árvore sobre colunas fixas
+            regions = []
+            for j in fixed:
+                points = np.unique(threshold[feature == j])
+                regions.append((np.searchsorted(points, X[:, j], side='left'), len(points) + 1))
+            _, first, inverse = _unique_rows(regions, len(X))
+
+            rows = np.repeat(X[first], len(candidates), axis=0)
+            rows[:, columns] = np.tile(candidates, (len(first), 1))
+            leaves = self._apply_tree(rows, start)
+            total += self.value[leaves].reshape(len(first), len(candidates))[inverse]
+
+        return total / self.n_trees
+
+    def _apply_tree(self, X, root):
+        X_flat = np.ascontiguousarray(X).reshape(-1)
+        row_offset = np.arange(len(X)) * self.n_features
+        node = np.full(len(X), root, dtype=np.intp)
+
+        for _ in range(self.max_depth):
+            go_right = X_flat[row_offset + self.feature[node]] > self.threshold[node]
+            node = self._children_flat[node * 2 + go_right].astype(np.intp, copy=False)
+
+        return node
+
+
+def _tree_std(per_tree, predictions, n_trees):
+    """
+    Desvio padrão (n,) das predições das árvores (n_trees, n) em torno da média.
+    """
+    return np.sqrt(np.square(per_tree - predictions, dtype=np.float64).sum(axis=0) / n_trees)
+
+
+def _unique_rows(regions, n_rows):
+    """
+    np.unique das linhas formadas pelas colunas de ids de região.
+
+    Args:
+        regions (list): Pares (ids, número de regiões possíveis) de cada coluna
+
+    Returns:
+        tuple: (chaves únicas, índice da primeira linha de cada chave, inverso)
+    """
+    if math.prod(size for _, size in regions) < 2 ** 62:
+        # Uma chave int64 por linha (base mista): bem mais rápido que unique(axis=0)
+        key = np.zeros(n_rows, dtype=np.int64)
+        for ids, size in regions:
+            key = key * size + ids
+        unique, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    else:
+        keys = np.column_stack([ids for ids, _ in regions])
+        unique, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return unique, first, inverse.reshape(-1)
+
+
+def _read_array(buffer, name, spec, verify):
+    dtype = np.dtype(spec['dtype'])
+    # Só tipos numéricos simples (nunca object, que exigiria pickle)
+    if dtype.kind not in 'iuf' or dtype.hasobject:
+        raise ValueError(f"dtype não suportado em {name}: {spec['dtype']}")
+
+    count = int(np.prod(spec['shape']))
+    offset = int(spec['offset'])
+    if offset < 0 or offset % ALIGNMENT or offset + count * dtype.itemsize > len(buffer):
+        raise ValueError(f"Offset/tamanho inválido em {name}")
+
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(spec['shape'])
+    if verify and 'crc32' in spec and zlib.crc32(array) != spec['crc32']:
+        raise ValueError(f"Checksum inválido em {name} (arquivo corrompido?)")
+    return array
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,249 @@
+"""
+Otimizador de pacotes de benefícios sob orçamento.
+
+Um pacote é uma combinação de vale-refeição, incentivo de academia (dias
+de uso no mês) e nível do plano de saúde. Para cada funcionário, todos os
+pacotes do espaço de busca que cabem no orçamento são avaliados pelo
+modelo e os dominados (mais caros sem score maior) são descartados: sobra
+a fronteira de Pareto custo x score.
+
+A avaliação usa FlatForest.predict_grid: cada árvore é percorrida uma vez
+por grupo de funcionários que ela não distingue e pacote, em vez de uma
+vez por par funcionário x pacote. Coortes grandes são divididas em chunks
+avaliados em processos separados (workers).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import predict
+from .packages import DEFAULT_COSTS, DEFAULT_OPTIONS, PACKAGE_FEATURES
+from .predict import FEATURES
+
+
+# Colunas de FEATURES variadas pelo otimizador (na ordem de PACKAGE_FEATURES)
+PACKAGE_COLUMNS = [FEATURES.index(name) for name in PACKAGE_FEATURES]
+
+# Funcionários por chunk (a matriz de scores de um chunk tem chunk x pacotes floats)
+CHUNK_ROWS = 2000
+
+# Snapshot do modelo em cada processo worker
+_worker_model = None
+
+
+def candidate_packages(options=None):
+    """
+    Produto cartesiano das opções de cada feature do pacote.
+
+    Args:
+        options (dict): Feature -> valores (padrão: DEFAULT_OPTIONS)
+
+    Returns:
+        np.ndarray: Pacotes com shape (m, 3), colunas em PACKAGE_FEATURES
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    mesh = np.meshgrid(*[np.asarray(options[name], dtype=np.float64) for name in PACKAGE_FEATURES], indexing='ij')
+    return np.column_stack([axis.ravel() for axis in mesh])
+
+
+def package_costs(packages, costs=None):
+    """
+    Custo mensal de cada pacote.
+
+    Raises:
+        ValueError: Nível de plano sem custo definido
+    """
+    costs = costs or {}
+    # Níveis omitidos em health_plan_tier mantêm o custo padrão
+    tier_costs = {
+        int(tier): float(cost)
+        for tier, cost in [*DEFAULT_COSTS['health_plan_tier'].items(), *costs.get('health_plan_tier', {}).items()]
+    }
+    costs = {**DEFAULT_COSTS, **costs}
+    missing = set(packages[:, 2].astype(int).tolist()) - set(tier_costs)
+    if missing:
+        raise ValueError(f"Sem custo para os níveis de plano: {sorted(missing)}")
+
+    # Em centavos: custos iguais não se separam por erro de arredondamento
+    return np.round(
+        packages[:, 0] * costs['meal_voucher'] +
+        packages[:, 1] * costs['gym_usage'] +
+        np.array([tier_costs[int(tier)] for tier in packages[:, 2]]),
+        2
+    )
+
+
+def score_packages(X, packages, loaded=None):
+    """
+    Score de cada funcionário com cada pacote.
+
+    Args:
+        X (array-like): Funcionários, matriz (n, 6) na ordem de FEATURES
+        packages (np.ndarray): Pacotes (m, 3), colunas em PACKAGE_FEATURES
+
+    Returns:
+        np.ndarray: Scores (n, m), no mesmo arredondamento de predict_batch
+    """
+    loaded = loaded or predict.get_active_model()
+    if loaded is None:
+        raise Exception("Modelo não carregado. Execute train_model.py primeiro!")
+
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+    if loaded.forest is not None:
+        scores = loaded.forest.predict_grid(X, packages, PACKAGE_COLUMNS)
+    else:
+        rows = np.repeat(X, len(packages), axis=0)
+        rows[:, PACKAGE_COLUMNS] = np.tile(packages, (len(X), 1))
+        scores = loaded.predict(rows).reshape(len(X), len(packages))
+    return np.round(np.clip(scores, 0, 100), 2)
+
+
+def pareto_mask(scores):
+    """
+    Pacotes não dominados de cada linha.
+
+    Args:
+        scores (np.ndarray): Scores (n, k), colunas em ordem estritamente crescente de custo
+
+    Returns:
+        np.ndarray: Máscara (n, k): True se o score supera o de todos os pacotes mais baratos
+    """
+    best_cheaper = np.maximum.accumulate(scores, axis=1)[:, :-1]
+    return np.concatenate([np.ones((len(scores), 1), dtype=bool), scores[:, 1:] > best_cheaper], axis=1)
+
+
+def _collapse_ties(scores, costs):
+    """
+    Para cada custo distinto, o pacote de maior score (por linha), em ordem crescente de custo.
+
+    Returns:
+        tuple: (custos distintos (k,), scores (n, k), índice do pacote escolhido (n, k))
+    """
+    unique_costs, inverse = np.unique(costs, return_inverse=True)
+    chosen = np.empty((len(scores), len(unique_costs)), dtype=np.intp)
+    for k in range(len(unique_costs)):
+        members = np.flatnonzero(inverse == k)
+        chosen[:, k] = members[np.argmax(scores[:, members], axis=1)]
+    return unique_costs, np.take_along_axis(scores, chosen, axis=1), chosen
+
+
+def _package(packages, costs, index, score):
+    meal_voucher, gym_usage, tier = packages[index]
+    return {
+        'meal_voucher': float(meal_voucher),
+        'gym_usage': int(gym_usage),
+        'health_plan_tier': int(tier),
+        'cost': round(float(costs[index]), 2),
+        'score': float(score),
+    }
+
+
+def _optimize_chunk(X, packages, costs, current_costs, loaded=None):
+    """
+    Fronteira de Pareto de cada funcionário de um chunk (executado nos workers).
+
+    Returns:
+        tuple: (resultados por funcionário, soma dos scores de cada pacote)
+    """
+    loaded = loaded or _worker_model
+    scores = score_packages(X, packages, loaded=loaded)
+    current = predict.predict_batch(X, loaded=loaded)
+
+    unique_costs, tied_scores, chosen = _collapse_ties(scores, costs)
+    keep = pareto_mask(tied_scores)
+
+    results = []
+    for i in range(len(X)):
+        frontier = [
+            _package(packages, costs, chosen[i, k], tied_scores[i, k])
+            for k in np.flatnonzero(keep[i])
+        ]
+        results.append({
+            'current': {
+                'meal_voucher': float(X[i, PACKAGE_COLUMNS[0]]),
+                'gym_usage': int(X[i, PACKAGE_COLUMNS[1]]),
+                'health_plan_tier': int(X[i, PACKAGE_COLUMNS[2]]),
+                'cost': round(float(current_costs[i]), 2),
+                'score': current[i]['score'],
+            },
+            'best': frontier[-1],
+            'frontier': frontier,
+        })
+    return results, scores.sum(axis=0)
+
+
+def _init_worker(version):
+    global _worker_model
+    _worker_model = predict.load_model(version)
+
+
+def optimize_packages(X, budget=None, options=None, costs=None, loaded=None, workers=1, chunk_rows=CHUNK_ROWS):
+    """
+    Pacotes ótimos (custo x score) para um funcionário ou uma coorte.
+
+    Args:
+        X (array-like): Funcionários, matriz (n, 6) na ordem de FEATURES
+        budget (float): Custo mensal máximo por funcionário (None = sem limite)
+        options (dict): Valores de cada feature do pacote (padrão: DEFAULT_OPTIONS)
+        costs (dict): Modelo de custos (padrão: DEFAULT_COSTS)
+        loaded (LoadedModel): Snapshot a usar (padrão: versão ativa)
+        workers (int): Processos para coortes maiores que chunk_rows
+        chunk_rows (int): Funcionários por chunk
+
+    Returns:
+        dict: {
+            'packages_evaluated': int,
+            'employees': [{'current', 'best', 'frontier'}, ...],
+            'cohort': {'frontier': [...]}  # um mesmo pacote para todos, score médio
+        }
+
+    Raises:
+        ValueError: Nenhum pacote cabe no orçamento
+    """
+    loaded = loaded or predict.get_active_model()
+    if loaded is None:
+        raise Exception("Modelo não carregado. Execute train_model.py primeiro!")
+
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+    packages = candidate_packages(options)
+    package_cost = package_costs(packages, costs)
+    if budget is not None:
+        affordable = package_cost <= budget + 1e-9
+        packages, package_cost = packages[affordable], package_cost[affordable]
+    if len(packages) == 0:
+        raise ValueError(f"Nenhum pacote cabe no orçamento de {budget}")
+
+    current_costs = package_costs(X[:, PACKAGE_COLUMNS], costs)
+    chunks = [slice(start, start + chunk_rows) for start in range(0, len(X), chunk_rows)]
+    workers = min(max(1, workers), len(chunks))
+
+    if workers == 1:
+        parts = [_optimize_chunk(X[rows], packages, package_cost, current_costs[rows], loaded) for rows in chunks]
+    else:
+        # Todos os workers fixam a mesma versão do modelo
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(loaded.version,)) as pool:
+            parts = list(pool.map(
+                _optimize_chunk,
+                [X[rows] for rows in chunks],
+                [packages] * len(chunks),
+                [package_cost] * len(chunks),
+                [current_costs[rows] for rows in chunks],
+            ))
+
+    employees = [result for results, _ in parts for result in results]
+
+    # Coorte: o mesmo pacote para todos, avaliado pelo score médio
+    mean_scores = np.round(sum(totals for _, totals in parts) / max(1, len(X)), 2)[np.newaxis, :]
+    unique_costs, tied_scores, chosen = _collapse_ties(mean_scores, package_cost)
+    keep = pareto_mask(tied_scores)[0]
+
+    return {
+        'packages_evaluated': len(packages),
+        'employees': employees,
+        'cohort': {
+            'frontier': [
+                _package(packages, package_cost, chosen[0, k], tied_scores[0, k]) for k in np.flatnonzero(keep)
+            ],
+        },
+    }
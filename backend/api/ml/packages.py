@@ -0,0 +1,27 @@
+"""
+Espaço de busca e custos padrão dos pacotes de benefícios.
+
+Só constantes (sem importar o modelo): usadas pelo otimizador
+(api/ml/optimizer.py) e pela validação da API, que não deve carregar o
+model.bin ao ser importada.
+"""
+
+import numpy as np
+
+
+# Features variadas pelo otimizador, na ordem das colunas dos pacotes
+PACKAGE_FEATURES = ['meal_voucher', 'gym_usage', 'health_plan_tier']
+
+# Espaço de busca padrão (16 x 7 x 3 = 336 pacotes)
+DEFAULT_OPTIONS = {
+    'meal_voucher': np.arange(0, 1501, 100, dtype=np.float64),
+    'gym_usage': np.arange(0, 31, 5, dtype=np.float64),
+    'health_plan_tier': np.array([1, 2, 3], dtype=np.float64),
+}
+
+# Custo mensal por funcionário (BRL)
+DEFAULT_COSTS = {
+    'meal_voucher': 1.0,                                  # por real de vale-refeição
+    'gym_usage': 12.0,                                    # subsídio por dia de academia no mês
+    'health_plan_tier': {1: 250.0, 2: 450.0, 3: 800.0},   # mensalidade por nível
+}
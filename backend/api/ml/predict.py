@@ -3,28 +3,397 @@ Módulo de predição para o modelo de satisfação.
 """
 
 import os
-import joblib
-import pandas as pd
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+
+import numpy as np
+
+from .. import metrics
+from . import confidence, registry
+from .batching import MicroBatcher
+from .forest import FlatForest
 
 
 # Caminho do modelo
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.pkl')
 
-# Carrega modelo ao importar o módulo
-try:
-    model = joblib.load(MODEL_PATH)
-    MODEL_LOADED = True
-    print(f"✅ Modelo ML carregado com sucesso!")
-except FileNotFoundError:
+# Ordem das features usada no treino (colunas da matriz de entrada)
+FEATURES = ['age', 'salary', 'commute_time', 'gym_usage', 'meal_voucher', 'health_plan_tier']
+
+# Motor de inferência: 'flat' (arrays NumPy, padrão) ou 'sklearn'
+PREDICTION_ENGINE = os.environ.get('PREDICTION_ENGINE', 'flat')
+
+# Tamanho máximo do cache de resultados (0 desativa)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '4096'))
+
+# Micro-batching de predições concorrentes (desativado por padrão)
+PREDICTION_MICROBATCH = os.environ.get('PREDICTION_MICROBATCH', '0') == '1'
+PREDICTION_MICROBATCH_MAX_SIZE = int(os.environ.get('PREDICTION_MICROBATCH_MAX_SIZE', '64'))
+PREDICTION_MICROBATCH_MAX_WAIT_MS = float(os.environ.get('PREDICTION_MICROBATCH_MAX_WAIT_MS', '2'))
+
+# Histogramas das etapas medidas aqui (ver api/metrics.py)
+_MODEL_SECONDS = metrics.PREDICT_STAGE_SECONDS.labels('model')
+_RECOMMENDATION_SECONDS = metrics.PREDICT_STAGE_SECONDS.labels('recommendation')
+
+# Precisão dos DecimalField de salary/meal_voucher
+_DECIMAL_PLACES = Decimal('0.01')
+
+# Floresta em arrays planos, mapeada em memória (compartilhada entre workers)
+FOREST_PATH = os.path.join(os.path.dirname(__file__), 'model.bin')
+
+# Versão compactada (compact.py), usada no lugar de model.bin quando existe
+COMPACT_PATH = os.path.join(os.path.dirname(__file__), 'model.compact.bin')
+PREDICTION_COMPACT = os.environ.get('PREDICTION_COMPACT', '1') == '1'
+
+# Intervalo (s) para verificar se a versão ativa do registro mudou (0 desativa)
+MODEL_REGISTRY_POLL_SECONDS = float(os.environ.get('MODEL_REGISTRY_POLL_SECONDS', '5'))
+
+
+class LoadedModel:
+    """
+    Snapshot do modelo servido: versão, motor de inferência e metadados.
+
+    Não é alterado depois de criado. A troca de versão substitui a referência
+    global inteira, então cada predição usa um único snapshot do início ao fim,
+    mesmo que uma troca aconteça no meio da requisição.
+    """
+
+    def __init__(self, version, forest=None, model=None, info=None):
+        self.version = version
+        self.forest = forest
+        self.model = model
+        self.info = info or {}
+        # Floresta plana usada só por explain no motor sklearn (criada no primeiro uso)
+        self._explainer = None
+        # Mínimo/máximo do treino por feature, para a confiança (ver confidence.py)
+        self.support = confidence.support_bounds(self.reference) if self.reference else None
+
+    @property
+    def engine(self):
+        return 'flat' if self.forest is not None else 'sklearn'
+
+    @property
+    def model_type(self):
+        if self.forest is not None:
+            return self.forest.metadata.get('model_type')
+        return type(self.model).__name__
+
+    @property
+    def reference(self):
+        """
+        Histogramas das features no treino (ver drift.py), gravados nos metadados do model.bin.
+        """
+        if self.forest is not None:
+            return self.forest.metadata.get('reference')
+        return None
+
+    @property
+    def calibration(self):
+        """
+        Limites de confiança calibrados no treino (ver confidence.py), gravados nos metadados do model.bin.
+        """
+        if self.forest is not None:
+            return self.forest.metadata.get('confidence')
+        return None
+
+    def predict(self, X):
+        """
+        Avalia o modelo sobre uma matriz (n, 6) e retorna os scores brutos.
+        """
+        if self.forest is not None:
+            return self.forest.predict(X)
+
+        # Fallback: sklearn (precisa dos nomes de colunas do treino)
+        import pandas as pd
+        return self.model.predict(pd.DataFrame(X, columns=FEATURES))
+
+    def predict_with_std(self, X):
+        """
+        Scores brutos e desvio padrão entre as árvores (None no motor sklearn), numa travessia.
+        """
+        if self.forest is not None:
+            return self.forest.predict_with_std(X)
+        return self.predict(X), None
+
+    def predict_unique(self, X):
+        """
+        Como predict, mas avalia uma linha por região de decisão (ver FlatForest.predict_unique).
+        """
+        if self.forest is not None:
+            return self.forest.predict_unique(X)
+        return self.predict(X)
+
+    def explain(self, X):
+        """
+        Scores brutos e contribuição de cada feature (ver FlatForest.explain).
+
+        Returns:
+            tuple: (scores (n,), bias (float), contribuições (n, 6), desvios das árvores (n,))
+        """
+        forest = self.forest
+        if forest is None:
+            if self._explainer is None:
+                self._explainer = FlatForest.from_sklearn(self.model)
+            forest = self._explainer
+        return forest.explain(X, return_std=True)
+
+    def warm_up(self):
+        """
+        Faz uma predição descartável para carregar as páginas do modelo.
+        """
+        self.predict(np.array([[30, 5000, 45, 12, 800, 2]], dtype=np.float64))
+
+
+def _load_files(version, forest_path, model_path, info=None, compact_path=None):
+    """
+    Carrega model.compact.bin ou model.bin (mmap) ou, no fallback, model.pkl.
+    """
+    forest = None
     model = None
-    MODEL_LOADED = False
-    print(f"⚠️ Modelo não encontrado em {MODEL_PATH}")
-    print("Execute: python api/ml/train_model.py")
 
+    if PREDICTION_ENGINE == 'flat' and PREDICTION_COMPACT and compact_path and os.path.exists(compact_path):
+        forest = FlatForest.load(compact_path, mmap=True)
+    elif PREDICTION_ENGINE == 'flat' and os.path.exists(forest_path):
+        forest = FlatForest.load(forest_path, mmap=True)
+    else:
+        # Só o fallback desserializa o pickle (e importa o scikit-learn);
+        # model.bin é lido direto como arrays NumPy
+        import joblib
+        model = joblib.load(model_path)
+        # Converte a floresta para arrays planos (fallback: predict do sklearn)
+        if PREDICTION_ENGINE == 'flat':
+            try:
+                forest = FlatForest.from_sklearn(model)
+            except Exception as e:
+                print(f"⚠️ Motor flat indisponível, usando sklearn: {e}")
+
+    return LoadedModel(version, forest=forest, model=model, info=info)
+
+
+def _load_version(version):
+    """
+    Carrega uma versão do registro de modelos.
+    """
+    return _load_files(
+        version,
+        registry.version_path(version, registry.FOREST_FILE),
+        registry.version_path(version, registry.SKLEARN_FILE),
+        info=registry.get_version_info(version),
+        compact_path=registry.version_path(version, registry.COMPACT_FILE)
+    )
+
+
+def _load_active_model():
+    """
+    Carrega a versão ativa do registro, ou os arquivos legados de api/ml/.
+    """
+    version = registry.get_active_version()
+    if version is not None:
+        try:
+            loaded = _load_version(version)
+            print(f"✅ Modelo ML carregado com sucesso (versão {version})!")
+            return loaded
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Falha ao carregar versão {version} do registro: {e}")
+
+    try:
+        loaded = _load_files('legacy', FOREST_PATH, MODEL_PATH, compact_path=COMPACT_PATH)
+        print(f"✅ Modelo ML carregado com sucesso!")
+        return loaded
+    except FileNotFoundError:
+        print(f"⚠️ Modelo não encontrado em {MODEL_PATH}")
+        print("Execute: python api/ml/train_model.py")
+        return None
+
+
+# Carrega modelo ao importar o módulo
+_active = _load_active_model()
+_swap_lock = threading.Lock()
+_watcher = None
+
+
+def load_model(version):
+    """
+    Carrega um snapshot de uma versão específica ('legacy' = arquivos de api/ml/).
+
+    Usado por processos que precisam fixar uma versão, como o scoring offline.
+    """
+    if version == 'legacy':
+        return _load_files('legacy', FOREST_PATH, MODEL_PATH, compact_path=COMPACT_PATH)
+    return _load_version(version)
+
+
+def get_active_model():
+    """
+    Retorna o snapshot do modelo ativo (ou None se nenhum modelo carregado).
+    """
+    return _active
+
+
+def reload_model():
+    """
+    Troca o modelo em memória se a versão ativa do registro mudou.
+
+    A nova versão é carregada e aquecida antes da troca; requisições em
+    andamento continuam usando o snapshot antigo até terminarem.
+
+    Returns:
+        bool: True se o modelo foi trocado
+    """
+    global _active
+
+    with _swap_lock:
+        version = registry.get_active_version()
+        if version is None or (_active is not None and _active.version == version):
+            return False
+
+        loaded = _load_version(version)
+        loaded.warm_up()
+        _active = loaded
+
+    print(f"🔄 Modelo trocado para a versão {version}")
+    return True
+
+
+class ModelWatcher(threading.Thread):
+    """
+    Thread em background que verifica periodicamente a versão ativa.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name='model-watcher', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                reload_model()
+            except Exception as e:
+                print(f"⚠️ Falha ao trocar modelo: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_model_watcher(interval=None):
+    """
+    Inicia (uma vez por processo) a verificação de novas versões.
+    """
+    global _watcher
+
+    interval = MODEL_REGISTRY_POLL_SECONDS if interval is None else interval
+    if interval <= 0 or _watcher is not None:
+        return _watcher
+
+    _watcher = ModelWatcher(interval)
+    _watcher.start()
+    return _watcher
+
+
+class PredictionCache:
+    """
+    Cache LRU thread-safe de resultados de predição.
+
+    Guarda a referência do modelo que gerou as entradas: quando o modelo
+    carregado muda, o cache é esvaziado no próximo acesso.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self, key, current_model):
+        with self._lock:
+            if current_model is not self._model:
+                self._data.clear()
+                self._model = current_model
+
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return _copy_result(result)
 
-def predict_satisfaction(age, salary, commute_time, gym_usage, meal_voucher, health_plan_tier):
+    def put(self, key, result, current_model):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            if current_model is not self._model:
+                return
+
+            self._data[key] = _copy_result(result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+def _copy_result(value):
+    """
+    Cópia profunda de um resultado (dicts e listas aninhados, ex: uncertainty e attributions).
+
+    Quem recebe um resultado pode alterá-lo sem corromper o cache. Mais barato
+    que copy.deepcopy para estes valores (só dict, list e escalares imutáveis).
+    """
+    if isinstance(value, dict):
+        return {key: _copy_result(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_result(item) for item in value]
+    return value
+
+
+cache = PredictionCache(PREDICTION_CACHE_SIZE)
+
+batcher = MicroBatcher(
+    max_batch_size=PREDICTION_MICROBATCH_MAX_SIZE,
+    max_wait_ms=PREDICTION_MICROBATCH_MAX_WAIT_MS
+) if PREDICTION_MICROBATCH else None
+
+
+def _normalize_input(age, salary, commute_time, gym_usage, meal_voucher, health_plan_tier):
+    """
+    Normaliza os inputs para a chave do cache (Decimal com 2 casas, como no serializer).
+    """
+    return (
+        int(age),
+        Decimal(str(salary)).quantize(_DECIMAL_PLACES),
+        int(commute_time),
+        int(gym_usage),
+        Decimal(str(meal_voucher)).quantize(_DECIMAL_PLACES),
+        int(health_plan_tier)
+    )
+
+
+def predict_satisfaction(age, salary, commute_time, gym_usage, meal_voucher, health_plan_tier, explain=False):
     """
     Prediz satisfação do funcionário baseado em benefícios e demográficos.
+
+    Resultados são memorizados num cache LRU (ver PREDICTION_CACHE_SIZE).
     
     Args:
         age (int): Idade (18-100)
@@ -33,78 +402,247 @@ def predict_satisfaction(age, salary, commute_time, gym_usage, meal_voucher, hea
         gym_usage (int): Dias/mês usando academia (0-30)
         meal_voucher (float): Valor mensal do vale-refeição em BRL
         health_plan_tier (int): Nível do plano (1=Básico, 2=Padrão, 3=Premium)
+        explain (bool): Inclui a contribuição de cada feature para o score
     
     Returns:
         dict: {
             'score': float (0-100),
             'confidence': str ('high', 'medium', 'low'),
-            'recommendation': str
+            'recommendation': str,
+            'uncertainty': dict (desvio das árvores, intervalo e distância ao suporte; ver _confidence),
+            'attributions': dict (só com explain=True, ver _attributions)
         }
     """
-    if not MODEL_LOADED:
+    loaded = _active
+    if loaded is None:
+        metrics.MODEL_NOT_LOADED.inc()
         raise Exception("Modelo não carregado. Execute train_model.py primeiro!")
+
+    key = _normalize_input(age, salary, commute_time, gym_usage, meal_voucher, health_plan_tier)
+    cache_key = key + (True,) if explain else key
+
+    result = cache.get(cache_key, loaded)
+    if result is None:
+        result = _predict_single(loaded, *key, explain=explain)
+        cache.put(cache_key, result, loaded)
+
+    return result
+
+
+def _predict_single(loaded, age, salary, commute_time, gym_usage, meal_voucher, health_plan_tier, explain=False):
+    """
+    Executa a predição de uma linha (sem cache).
+    """
+    salary = float(salary)
+    meal_voucher = float(meal_voucher)
+
+    # Prepara dados na mesma ordem de features do treino
+    input_data = [age, salary, commute_time, gym_usage, meal_voucher, health_plan_tier]
     
-    # Prepara dados como DataFrame (mesmos nomes e ordem do treino!)
-    input_data = pd.DataFrame({
-        'age': [age],
-        'salary': [salary],
-        'commute_time': [commute_time],
-        'gym_usage': [gym_usage],
-        'meal_voucher': [meal_voucher],
-        'health_plan_tier': [health_plan_tier]
-    })
+    # Faz predição (agrupada com requisições concorrentes, se habilitado)
+    X = np.array([input_data], dtype=np.float64)
+    attributions = None
+    with _MODEL_SECONDS.time():
+        if explain:
+            # Score e contribuições saem da mesma travessia (fora do micro-batch)
+            scores, bias, contributions, std = loaded.explain(X)
+            score, std = scores[0], std[0]
+            attributions = _attributions(bias, contributions[0])
+        elif batcher is not None:
+            score, std = batcher.submit(loaded, input_data)
+        else:
+            scores, std = loaded.predict_with_std(X)
+            score, std = scores[0], (None if std is None else std[0])
     
-    # Faz predição
-    score = model.predict(input_data)[0]
+    # Confiança pela dispersão das árvores (calculada junto com o score)
+    if loaded.calibration is not None and loaded.support is not None and std is not None:
+        level, uncertainty = confidence.row_confidence(score, std, input_data, loaded.support, loaded.calibration)
+    else:
+        level, uncertainty = _calculate_confidence_batch(X)[0], None
     
     # Garante range válido
     score = max(0, min(100, score))
     
-    # Calcula confidence baseado em valores típicos
-    confidence = _calculate_confidence(salary, commute_time, gym_usage, health_plan_tier)
-    
     # Gera recomendação
-    recommendation = _generate_recommendation(score, salary, commute_time, gym_usage, health_plan_tier)
+    with _RECOMMENDATION_SECONDS.time():
+        recommendation = _generate_recommendation(score, salary, commute_time, gym_usage, health_plan_tier)
     
-    return {
+    result = {
         'score': round(score, 2),
-        'confidence': confidence,
+        'confidence': level,
         'recommendation': recommendation
     }
+    if uncertainty is not None:
+        result['uncertainty'] = uncertainty
+    if attributions is not None:
+        result['attributions'] = attributions
+    return result
+
+
+def _confidence(loaded, X, scores, std):
+    """
+    Nível de confiança e detalhes da incerteza de cada linha (ver confidence.py).
 
+    Sem calibração no model.bin (modelos antigos, motor sklearn), usa a regra
+    de faixas típicas dos inputs e não há detalhes.
 
-def _calculate_confidence(salary, commute_time, gym_usage, health_plan_tier):
+    Returns:
+        tuple: (níveis (list[str]), list[dict] com a incerteza de cada linha ou None)
     """
-    Calcula nível de confiança baseado na razoabilidade dos inputs.
+    calibration = loaded.calibration
+    if calibration is None or loaded.support is None or std is None:
+        return _calculate_confidence_batch(X), None
+
+    distance = confidence.support_distance(X, loaded.support)
+    return (
+        confidence.confidence_levels(std, distance, calibration).tolist(),
+        confidence.uncertainty(np.asarray(scores, dtype=np.float64), std, distance, calibration)
+    )
+
+
+def _attributions(bias, contributions):
     """
-    # Ranges típicos
-    typical_ranges = {
-        'salary': (2000, 12000),
-        'commute': (10, 120),
-        'gym': (0, 20),
-        'health': (1, 3)
+    Formata a explicação de uma linha.
+
+    bias + soma das contribuições = score bruto do modelo (antes do corte em 0-100).
+    """
+    return {
+        'bias': round(float(bias), 4),
+        'contributions': {name: round(float(value), 4) for name, value in zip(FEATURES, contributions)},
     }
-    
-    in_range_count = 0
-    total_checks = 4
-    
-    if typical_ranges['salary'][0] <= salary <= typical_ranges['salary'][1]:
-        in_range_count += 1
-    if typical_ranges['commute'][0] <= commute_time <= typical_ranges['commute'][1]:
-        in_range_count += 1
-    if typical_ranges['gym'][0] <= gym_usage <= typical_ranges['gym'][1]:
-        in_range_count += 1
-    if typical_ranges['health'][0] <= health_plan_tier <= typical_ranges['health'][1]:
-        in_range_count += 1
-    
-    confidence_ratio = in_range_count / total_checks
-    
-    if confidence_ratio >= 0.75:
-        return 'high'
-    elif confidence_ratio >= 0.5:
-        return 'medium'
+
+
+def predict_batch(X, loaded=None, explain=False):
+    """
+    Prediz satisfação para várias linhas numa única chamada ao modelo.
+
+    Args:
+        X (array-like): Matriz (n, 6) com as colunas na ordem de FEATURES
+        loaded (LoadedModel): Snapshot a usar (padrão: versão ativa)
+        explain (bool): Inclui 'attributions' em cada linha
+
+    Returns:
+        list[dict]: Um dict por linha, no mesmo formato de predict_satisfaction
+    """
+    loaded = loaded or _active
+    if loaded is None:
+        metrics.MODEL_NOT_LOADED.inc()
+        raise Exception("Modelo não carregado. Execute train_model.py primeiro!")
+
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+    if len(X) == 0:
+        return []
+
+    # Uma única predição para a matriz inteira (score e dispersão das árvores juntos)
+    if explain:
+        scores, bias, contributions, std = loaded.explain(X)
     else:
-        return 'low'
+        scores, std = loaded.predict_with_std(X)
+    confidences, uncertainties = _confidence(loaded, X, scores, std)
+    # Recomendação pelo score sem arredondar, como em _predict_single (59.999 não vira 60)
+    scores = np.clip(scores, 0, 100)
+
+    results = [
+        {
+            'score': round(float(score), 2),
+            'confidence': confidence,
+            'recommendation': _generate_recommendation(
+                score, row[1], row[2], row[3], row[5]
+            )
+        }
+        for score, confidence, row in zip(scores.tolist(), confidences, X)
+    ]
+    if uncertainties is not None:
+        for result, row_uncertainty in zip(results, uncertainties):
+            result['uncertainty'] = row_uncertainty
+    if explain:
+        for result, row_contributions in zip(results, contributions):
+            result['attributions'] = _attributions(bias, row_contributions)
+    return results
+
+
+
+def predict_what_if(base, sweeps, grid=False, loaded=None):
+    """
+    Curvas de sensibilidade do score: varia uma feature por vez a partir de um perfil base.
+
+    Todas as linhas (perfil base, pontos de cada curva e, com grid=True, o
+    produto cartesiano das features varridas) entram numa única avaliação
+    da floresta, que percorre as árvores só uma vez por região de decisão.
+    Nada passa pelo cache nem é gravado.
+
+    Args:
+        base (dict): Perfil base, com as chaves de FEATURES
+        sweeps (dict): Feature -> lista de valores a testar
+        grid (bool): Também avalia todas as combinações das features varridas
+        loaded (LoadedModel): Snapshot a usar (padrão: versão ativa)
+
+    Returns:
+        dict: {
+            'base_score': float,
+            'curves': {feature: {'values': [...], 'scores': [...]}},
+            'grid': {'features': [...], 'scores': lista aninhada} (só com grid=True)
+        }
+    """
+    loaded = loaded or _active
+    if loaded is None:
+        metrics.MODEL_NOT_LOADED.inc()
+        raise Exception("Modelo não carregado. Execute train_model.py primeiro!")
+
+    base_row = np.array([float(base[name]) for name in FEATURES], dtype=np.float64)
+    features = list(sweeps)
+    values = [np.asarray(sweeps[name], dtype=np.float64) for name in features]
+    columns = [FEATURES.index(name) for name in features]
+
+    blocks = [base_row[np.newaxis, :]]
+    for column, points in zip(columns, values):
+        block = np.repeat(base_row[np.newaxis, :], len(points), axis=0)
+        block[:, column] = points
+        blocks.append(block)
+    if grid:
+        mesh = np.meshgrid(*values, indexing='ij')
+        block = np.repeat(base_row[np.newaxis, :], mesh[0].size, axis=0)
+        for column, axis_values in zip(columns, mesh):
+            block[:, column] = axis_values.ravel()
+        blocks.append(block)
+
+    # Uma única predição para todas as curvas; pontos entre os mesmos
+    # thresholds da floresta são avaliados uma vez só
+    scores = np.round(np.clip(loaded.predict_unique(np.concatenate(blocks)), 0, 100), 2)
+
+    result = {'base_score': float(scores[0]), 'curves': {}}
+    offset = 1
+    for name, points in zip(features, values):
+        result['curves'][name] = {
+            'values': points.tolist(),
+            'scores': scores[offset:offset + len(points)].tolist(),
+        }
+        offset += len(points)
+    if grid:
+        result['grid'] = {
+            'features': features,
+            'scores': scores[offset:].reshape([len(points) for points in values]).tolist(),
+        }
+    return result
+
+def _calculate_confidence_batch(X):
+    """
+    Confiança pela razoabilidade dos inputs (faixas típicas), para modelos sem calibração.
+    """
+    salary, commute, gym, health = X[:, 1], X[:, 2], X[:, 3], X[:, 5]
+
+    in_range_count = (
+        ((salary >= 2000) & (salary <= 12000)).astype(int) +
+        ((commute >= 10) & (commute <= 120)).astype(int) +
+        ((gym >= 0) & (gym <= 20)).astype(int) +
+        ((health >= 1) & (health <= 3)).astype(int)
+    )
+    confidence_ratio = in_range_count / 4
+
+    return np.where(
+        confidence_ratio >= 0.75, 'high',
+        np.where(confidence_ratio >= 0.5, 'medium', 'low')
+    ).tolist()
 
 
 def _generate_recommendation(score, salary, commute_time, gym_usage, health_plan_tier):
@@ -152,11 +690,24 @@ def get_model_info():
     """
     Retorna informações sobre o modelo carregado.
     """
-    if not MODEL_LOADED:
+    loaded = _active
+    if loaded is None:
         return {'loaded': False, 'message': 'Modelo não encontrado'}
     
     return {
         'loaded': True,
-        'model_type': type(model).__name__,
-        'features': ['age', 'salary', 'commute_time', 'gym_usage', 'meal_voucher', 'health_plan_tier']
-    }
\ No newline at end of file
+        'version': loaded.version,
+        'model_type': loaded.model_type,
+        'engine': loaded.engine,
+        'metrics': loaded.info.get('metrics', {}),
+        'features': FEATURES,
+        'cache': get_cache_stats(),
+        'microbatching': batcher.stats() if batcher is not None else None
+    }
+
+
+def get_cache_stats():
+    """
+    Retorna contadores do cache de predições (hits, misses, evictions, tamanho).
+    """
+    return cache.stats()
\ No newline at end of file
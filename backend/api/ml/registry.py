@@ -0,0 +1,203 @@
+"""
+Registro versionado de modelos.
+
+Estrutura em disco (MODEL_REGISTRY_DIR, padrão api/ml/registry/):
+
+    registry/
+        ACTIVE              # nome da versão ativa (ex: v0003)
+        v0001/
+            model.bin       # floresta em arrays planos (mmap)
+            model.compact.bin  # opcional: floresta podada/compactada (compact.py)
+            model.pkl       # modelo sklearn (fallback do PREDICTION_ENGINE=sklearn)
+            metrics.json    # métricas de treino e metadados
+        v0002/
+            ...
+
+Todas as escritas são atômicas, então os processos que servem predições
+nunca veem uma versão pela metade: uma versão nova é montada num diretório
+temporário dentro do registro e renomeada para vNNNN só quando completa;
+ACTIVE e metrics.json usam arquivo temporário + os.replace.
+
+Uso:
+    python api/ml/registry.py list
+    python api/ml/registry.py activate v0002
+"""
+
+import errno
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+try:
+    from .forest import FlatForest
+except ImportError:  # executado como script
+    from forest import FlatForest
+
+
+REGISTRY_DIR = os.environ.get(
+    'MODEL_REGISTRY_DIR',
+    os.path.join(os.path.dirname(__file__), 'registry')
+)
+
+ACTIVE_FILE = 'ACTIVE'
+FOREST_FILE = 'model.bin'
+COMPACT_FILE = 'model.compact.bin'
+SKLEARN_FILE = 'model.pkl'
+METRICS_FILE = 'metrics.json'
+
+
+def list_versions(registry_dir=None):
+    """
+    Lista as versões registradas, da mais antiga para a mais nova.
+    """
+    registry_dir = registry_dir or REGISTRY_DIR
+    if not os.path.isdir(registry_dir):
+        return []
+
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if name.startswith('v') and os.path.isfile(os.path.join(registry_dir, name, FOREST_FILE))
+    )
+
+
+def get_active_version(registry_dir=None):
+    """
+    Retorna a versão ativa, ou None se o registro estiver vazio.
+    """
+    registry_dir = registry_dir or REGISTRY_DIR
+    try:
+        with open(os.path.join(registry_dir, ACTIVE_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_version_info(version, registry_dir=None):
+    """
+    Retorna o conteúdo de metrics.json de uma versão.
+    """
+    registry_dir = registry_dir or REGISTRY_DIR
+    with open(os.path.join(registry_dir, version, METRICS_FILE)) as f:
+        return json.load(f)
+
+
+def version_path(version, filename, registry_dir=None):
+    return os.path.join(registry_dir or REGISTRY_DIR, version, filename)
+
+
+def register_model(model, metrics=None, params=None, activate=True, registry_dir=None, compact=None, metadata=None):
+    """
+    Registra um modelo treinado como nova versão.
+
+    Args:
+        model: RandomForestRegressor treinado
+        metrics (dict): Métricas de avaliação (rmse, mae, r2, ...)
+        params (dict): Hiperparâmetros usados no treino
+        activate (bool): Se True, aponta ACTIVE para a nova versão
+        compact (FlatForest): Floresta compactada, gravada antes da ativação
+        metadata (dict): Metadados extras do model.bin (ex: histogramas de referência)
+
+    Returns:
+        str: Nome da versão criada
+    """
+    registry_dir = registry_dir or REGISTRY_DIR
+    os.makedirs(registry_dir, exist_ok=True)
+
+    while True:
+        versions = list_versions(registry_dir)
+        number = int(versions[-1][1:]) + 1 if versions else 1
+        version = f"v{number:04d}"
+
+        # Monta a versão fora de list_versions (nome sem 'v') e publica com um rename
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=registry_dir)
+        try:
+            os.chmod(tmp_path, 0o755)
+            _write_version(tmp_path, version, model, metrics, params, compact, metadata)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        try:
+            os.rename(tmp_path, os.path.join(registry_dir, version))
+            break
+        except OSError as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            # Outro processo registrou o mesmo número primeiro: tenta o próximo
+            if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+
+    if activate:
+        activate_version(version, registry_dir)
+
+    return version
+
+
+def _write_version(path, version, model, metrics, params, compact, metadata):
+    """
+    Grava os arquivos de uma versão em path.
+    """
+    import joblib
+
+    FlatForest.from_sklearn(model, metadata={**(metadata or {}), 'version': version}).save(os.path.join(path, FOREST_FILE))
+    if compact is not None:
+        compact.metadata['version'] = version
+        compact.save(os.path.join(path, COMPACT_FILE))
+    joblib.dump(model, os.path.join(path, SKLEARN_FILE))
+    _write_atomic(os.path.join(path, METRICS_FILE), json.dumps({
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'model_type': type(model).__name__,
+        'params': params or {},
+        'metrics': metrics or {},
+    }, indent=2))
+
+
+def activate_version(version, registry_dir=None):
+    """
+    Troca a versão ativa. Os processos servindo predições detectam a mudança
+    e trocam o modelo em memória sem reiniciar.
+    """
+    registry_dir = registry_dir or REGISTRY_DIR
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Versão não encontrada: {version}")
+
+    _write_atomic(os.path.join(registry_dir, ACTIVE_FILE), version + '\n')
+
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def main(argv):
+    command = argv[0] if argv else 'list'
+
+    if command == 'list':
+        active = get_active_version()
+        versions = list_versions()
+        if not versions:
+            print(f"📭 Nenhuma versão registrada em {REGISTRY_DIR}")
+        for version in versions:
+            info = get_version_info(version)
+            metrics = ', '.join(f"{k}={v:.4f}" for k, v in info.get('metrics', {}).items())
+            marker = '➡️ ' if version == active else '   '
+            print(f"{marker}{version}  {info.get('created_at', '')}  {metrics}")
+
+    elif command == 'activate' and len(argv) == 2:
+        activate_version(argv[1])
+        print(f"✅ Versão ativa: {argv[1]}")
+
+    else:
+        print(__doc__)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
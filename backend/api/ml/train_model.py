@@ -2,21 +2,67 @@
 Script para treinar o modelo de predição de satisfação.
 
 Este script:
-1. Gera dados sintéticos de funcionários
-2. Treina um modelo Random Forest
-3. Avalia a performance
-4. Salva o modelo treinado em model.pkl
+1. Gera dados sintéticos de funcionários (ou carrega um CSV), com cache em disco
+2. Treina um Random Forest por configuração do grid, em paralelo
+3. Avalia cada candidato na validação (RMSE, MAE, R², tempo de treino e
+   latência de inferência) e reporta o escolhido no teste, que não
+   participa de nenhuma escolha
+4. Salva o melhor modelo em model.pkl
+5. Exporta a floresta em arrays planos para model.bin (carregado via mmap),
+   com os histogramas de referência do treino para o monitor de drift (drift.py)
+   e os limites de confiança calibrados na validação (confidence.py)
+6. Opcionalmente, grava uma versão compactada em model.compact.bin (compact.py),
+   com as árvores escolhidas na validação
+7. Registra uma nova versão no registro de modelos e a ativa
+
+Uso:
+    python api/ml/train_model.py
+    python api/ml/train_model.py --grid '{"n_estimators": [100, 200], "max_depth": [8, 10, 12]}'
+    python api/ml/train_model.py --data funcionarios.csv --max-latency-ms 0.5 --results grid.json
+    python api/ml/train_model.py --compact-tolerance 0.005
 """
 
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ParameterGrid, train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
-import os
+from joblib import Parallel, delayed
+
+try:
+    from . import confidence, datagen, drift
+except ImportError:  # executado como script
+    import confidence
+    import datagen
+    import drift
+
+
+# Configuração padrão (cada configuração do grid sobrescreve estes valores)
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_depth': 10, 'random_state': 42}
 
-def generate_synthetic_data(n_samples=2000):
+# Cache de datasets gerados/carregados, indexado pelo hash do conteúdo
+CACHE_DIR = os.environ.get(
+    'TRAINING_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), '.cache')
+)
+
+# Repetições usadas para medir a latência de predição de uma linha
+LATENCY_REPEATS = 200
+
+# Frações do dataset: o teste só é usado nas métricas finais; a validação
+# escolhe os hiperparâmetros, calibra a confiança e guia a compactação
+TEST_SIZE = 0.2
+VALIDATION_SIZE = 0.2
+
+def generate_synthetic_data(n_samples=2000, seed=42):
     """
     Gera dados sintéticos de funcionários e satisfação.
 
@@ -25,100 +71,331 @@ def generate_synthetic_data(n_samples=2000):
     - Simula padrões realistas
     - Permite treinar e testar rapidamente
 
+    A geração é feita em chunks com streams independentes (ver datagen.py),
+    sem alterar o estado global de np.random. Para datasets grandes, use
+    datagen.write_dataset, que grava direto em disco.
+
     Args:
         n_samples: Número de exemplos a gerar
+        seed: Seed raiz (mesmo seed = mesmos dados)
     Returns:
         DataFrame com features e target
     """
-    np.random.seed(42) # Para resultados reproduzíveis
+    return datagen.generate_frame(n_samples, seed=seed)
 
-    # Gera features aleatórias dentro de ranges realistas
-    data = {
-        'age': np.random.randint(18, 55, n_samples),
-        'salary': np.random.uniform(1500, 15000, n_samples),
-        'commute_time': np.random.randint(0, 181, n_samples),
-        'gym_usage': np.random.randint(0, 31, n_samples),
-        'meal_voucher': np.random.uniform(0, 1501, n_samples),
-        'health_plan_tier': np.random.randint(1, 4, n_samples)
-    }
+def export_flat_model(model, path, metadata=None):
+    """
+    Exporta a floresta para o formato binário mapeável usado na inferência.
 
-    df = pd.DataFrame(data)
+    Args:
+        model: RandomForestRegressor treinado
+        path: Caminho do arquivo model.bin
+        metadata: Metadados gravados no header (ex: histogramas de referência)
+    """
+    try:
+        from .forest import FlatForest
+    except ImportError:  # executado como script
+        from forest import FlatForest
 
-    # Cria target baseado em lógica de negócio
-    # Satisfação aumenta com: salário alto, pouco commute, uso de benefícios
+    FlatForest.from_sklearn(model, metadata=metadata).save(path)
 
-    df['satisfaction_score'] = (
-        # Salário contribui 0-30 pontos
-        (df['salary']/1500) * 30 +
 
-        # Commute baixo contribui 0-20 pontos
-        (1 - df['commute_time']/180) * 20 +
+def register_version(model, metrics, params, compact=None, metadata=None):
+    """
+    Registra o modelo como nova versão ativa no registro de modelos.
+    """
+    try:
+        from .registry import register_model
+    except ImportError:  # executado como script
+        from registry import register_model
 
-        # Uso de academia 0-15 pontos
-        (df['gym_usage']/30) * 15 +
+    return register_model(
+        model, metrics=metrics, params=params, activate=True, compact=compact, metadata=metadata
+    )
 
-        # Vale-refeição 0-15 pontos
-        (df['meal_voucher']/1500) * 15 +
 
-        # Plano de saúde 0-20 pontos
-        (df['health_plan_tier']/3) *20
-    )
+def calibrate_confidence(forest, X_val, y_val):
+    """
+    Calibra os níveis de confiança pela dispersão das árvores num conjunto de validação.
+
+    Args:
+        forest: FlatForest ou RandomForestRegressor treinado
+    """
+    try:
+        from .forest import FlatForest
+    except ImportError:  # executado como script
+        from forest import FlatForest
+
+    if not isinstance(forest, FlatForest):
+        forest = FlatForest.from_sklearn(forest)
+    predictions, std = forest.predict_with_std(np.asarray(X_val, dtype=np.float64))
+    return confidence.calibrate(predictions, std, np.asarray(y_val, dtype=np.float64))
 
-    # Adiciona ruído realista (vida não é 100% previsível)
-    noise = np.random.normal(0, 5, n_samples)
-    df['satisfaction_score'] = df['satisfaction_score'] + noise
 
-    # Garante range 0-100
-    df['satisfaction_score'] = df['satisfaction_score'].clip(0, 100)
+def split_dataset(X, y):
+    """
+    Divide em treino, validação e teste (60/20/20, random_state=42).
 
-    return df
+    O teste é o mesmo split 80/20 de antes; a validação sai do lado de treino.
 
-def train_model():
+    Returns:
+        tuple: (X_train, X_val, X_test, y_train, y_val, y_test)
     """
-    Treina o modelo Random Forest e salva em disco
+    X_rest, X_test, y_rest, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=42)
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_rest, y_rest, test_size=VALIDATION_SIZE / (1 - TEST_SIZE), random_state=42
+    )
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+def training_metadata(model, X_train, X_val, y_val):
     """
-    print("🔄 Gerando dados de treinamento...")
-    df = generate_synthetic_data(n_samples=2000)
+    Metadados gravados junto da floresta (model.bin e versões do registro).
 
-    print(f"✅ {len(df)} exemplos gerados")
-    print(f"📊 Estatísticas do dataset:")
-    print(df.describe())
+    Args:
+        model: RandomForestRegressor treinado
+        X_train (pd.DataFrame): Conjunto de treino (colunas na ordem de FEATURES)
+        X_val, y_val: Conjunto de calibração (validação, não o teste final)
 
-    # Separa features (X) e target (y)
-    X = df.drop('satisfaction_score', axis=1)
-    y = df['satisfaction_score']
+    Returns:
+        dict: {'reference': histogramas do treino (drift.py e suporte da confiança),
+               'confidence': calibração da confiança (confidence.py)}
+    """
+    return {
+        'reference': drift.fit_reference(X_train.to_numpy(), list(X_train.columns)),
+        'confidence': calibrate_confidence(model, X_val, y_val),
+    }
 
-    # Divide em treino (80%) e teste (20%)
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
 
-    print(f"\n📚 Treino: {len(X_train)} exemplos")
-    print(f"🧪 Teste: {len(X_test)} exemplos")
-
-    # Treina Random Forest
-    print("\n🌲 Treinando Random Forest Regressor...")
-    model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=10,
-        random_state=42,
-        n_jobs=1
+def compact_model(model, X_val, y_val, tolerance, metadata=None):
+    """
+    Poda e compacta a floresta (ver compact.py), escolhendo as árvores na validação.
+    """
+    try:
+        from .compact import compact_forest
+        from .forest import FlatForest
+    except ImportError:  # executado como script
+        from compact import compact_forest
+        from forest import FlatForest
+
+    return compact_forest(
+        FlatForest.from_sklearn(model, metadata=metadata),
+        np.asarray(X_val, dtype=np.float64),
+        np.asarray(y_val, dtype=np.float64),
+        tolerance
     )
+
+
+def dataset_key(n_samples=2000, data_path=None, seed=42):
+    """
+    Hash do conteúdo que define o dataset.
+
+    Sempre inclui o código de datagen.py inteiro (gerador, colunas e
+    escrita do formato colunar): se ele mudar, o cache antigo deixa de ser
+    usado. Para um CSV, soma os bytes do arquivo; para dados sintéticos,
+    n_samples, seed e o tamanho de chunk.
+    """
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(datagen).encode('utf-8'))
+    if data_path:
+        with open(data_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    else:
+        digest.update(f"{n_samples}:{seed}:{datagen.CHUNK_ROWS}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def load_dataset(n_samples=2000, data_path=None, cache_dir=None, seed=42):
+    """
+    Retorna o dataset de treino, reaproveitando o cache quando o conteúdo não mudou.
+
+    O cache usa o formato colunar de datagen.py. data_path pode ser um CSV
+    ou um diretório colunar gerado por datagen.py (lido direto, sem cache).
+
+    Returns:
+        tuple: (DataFrame, bool indicando se veio do disco sem regerar/reler o CSV)
+    """
+    if data_path and datagen.is_dataset(data_path):
+        return datagen.load_frame(data_path), True
+
+    cache_dir = cache_dir or CACHE_DIR
+    cache_path = os.path.join(cache_dir, f"dataset-{dataset_key(n_samples, data_path, seed)}")
+
+    if datagen.is_dataset(cache_path):
+        return datagen.load_frame(cache_path), True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if data_path:
+        datagen.write_frame(cache_path, pd.read_csv(data_path))
+    else:
+        # Gerado em chunks direto no disco: não precisa caber em memória duas vezes
+        datagen.write_dataset(cache_path, n_samples, seed=seed)
+    return datagen.load_frame(cache_path), False
+
+
+def fit_candidate(params, X_train, y_train, n_jobs):
+    """
+    Treina um candidato e mede o tempo de treino (wall-clock).
+    """
+    model = RandomForestRegressor(**{**params, 'n_jobs': n_jobs})
+    started = time.perf_counter()
     model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - started
+
+    # O modelo servido prediz uma linha por vez: threads só adicionam overhead
+    model.set_params(n_jobs=1)
+    return model, fit_time
+
+
+def evaluate_candidate(model, X_test, y_test):
+    """
+    Métricas de erro e latência de inferência do motor flat (o usado em produção).
+    """
+    try:
+        from .forest import FlatForest
+    except ImportError:  # executado como script
+        from forest import FlatForest
 
-    # Avalia performance
-    print("\n📈 Avaliando modelo...")
     y_pred = model.predict(X_test)
+    forest = FlatForest.from_sklearn(model)
+    X = np.asarray(X_test, dtype=np.float64)
+
+    row = X[:1]
+    forest.predict(row)
+    timings = []
+    for _ in range(LATENCY_REPEATS):
+        started = time.perf_counter()
+        forest.predict(row)
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    forest.predict(X)
+    batch_time = time.perf_counter() - started
+
+    return {
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        'latency_ms': float(np.median(timings) * 1000),
+        'batch_rows_per_s': float(len(X) / batch_time),
+    }
+
+
+def run_grid(param_grid, X_train, y_train, X_val, y_val, n_jobs=-1):
+    """
+    Treina todas as configurações do grid, dividindo os núcleos entre elas.
+
+    Os candidatos são comparados em X_val/y_val (validação): o teste fica
+    fora da escolha, para que as métricas finais não sejam otimistas.
+
+    Os candidatos são treinados em paralelo (cada um com parte dos núcleos).
+    A avaliação roda depois, em sequência, para que a latência medida não
+    seja afetada pelos treinos concorrentes.
+
+    Returns:
+        list[dict]: Um resultado por candidato, ordenado por RMSE
+    """
+    candidates = [{**DEFAULT_PARAMS, **params} for params in ParameterGrid(param_grid)]
+    cores = (os.cpu_count() or 1) if n_jobs == -1 else n_jobs
+    parallel = min(len(candidates), cores)
+    per_model = max(1, cores // parallel)
+
+    fitted = Parallel(n_jobs=parallel)(
+        delayed(fit_candidate)(params, X_train, y_train, per_model)
+        for params in candidates
+    )
+
+    results = [
+        {
+            'params': params,
+            'model': model,
+            'metrics': {**evaluate_candidate(model, X_val, y_val), 'fit_time_s': fit_time},
+        }
+        for params, (model, fit_time) in zip(candidates, fitted)
+    ]
+    return sorted(results, key=lambda result: result['metrics']['rmse'])
 
-    mse = mean_squared_error(y_test, y_pred)
-    rmse = np.sqrt(mse)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
 
-    print("\n✨ RESULTADOS:")
-    print(f"RMSE: {rmse:.2f}")
-    print(f"MAE:  {mae:.2f}")
-    print(f"R² Score: {r2:.4f}")
+def select_candidate(results, max_latency_ms=None):
+    """
+    Menor RMSE entre os candidatos dentro do limite de latência (se houver).
+    """
+    eligible = [
+        result for result in results
+        if max_latency_ms is None or result['metrics']['latency_ms'] <= max_latency_ms
+    ]
+    if not eligible:
+        raise ValueError(f"Nenhum candidato com latência <= {max_latency_ms}ms")
+    return eligible[0]
+
+
+def train_model(n_samples=2000, data_path=None, param_grid=None, n_jobs=-1,
+                max_latency_ms=None, results_path=None, register=True, compact_tolerance=None):
+    """
+    Treina os candidatos do grid e salva/registra o melhor.
+
+    Args:
+        n_samples: Exemplos sintéticos (ignorado com data_path)
+        data_path: CSV ou dataset colunar com as features e satisfaction_score
+        param_grid: Dict (ou lista de dicts) de listas de hiperparâmetros, como no ParameterGrid
+        n_jobs: Núcleos usados no treino (-1 = todos)
+        max_latency_ms: Latência máxima de uma predição para o modelo escolhido
+        results_path: JSON onde gravar os resultados de todos os candidatos
+        register: Se True, registra e ativa a versão no registro de modelos
+        compact_tolerance: Se informado, grava também model.compact.bin com a
+            menor floresta a no máximo essa perda de R² (ver compact.py)
+    """
+    print("🔄 Carregando dados de treinamento...")
+    df, cached = load_dataset(n_samples=n_samples, data_path=data_path)
+
+    print(f"✅ {len(df)} exemplos {'(cache)' if cached else 'gerados'}")
+    print(f"📊 Estatísticas do dataset (amostra):")
+    print(df.sample(min(len(df), 10000), random_state=42).describe())
+
+    # Separa features (X) e target (y)
+    X = df.drop('satisfaction_score', axis=1)
+    y = df['satisfaction_score']
+
+    # Divide em treino (60%), validação (20%) e teste (20%)
+    X_train, X_val, X_test, y_train, y_val, y_test = split_dataset(X, y)
+
+    print(f"\n📚 Treino: {len(X_train)} exemplos")
+    print(f"🔍 Validação: {len(X_val)} exemplos (escolha do modelo, calibração e compactação)")
+    print(f"🧪 Teste: {len(X_test)} exemplos (só métricas finais)")
+
+    # Treina um Random Forest por configuração do grid (avaliados na validação)
+    param_grid = param_grid or {}
+    print(f"\n🌲 Treinando {len(ParameterGrid(param_grid))} configuração(ões) de Random Forest...")
+    results = run_grid(param_grid, X_train, y_train, X_val, y_val, n_jobs=n_jobs)
+
+    print("\n✨ RESULTADOS (validação):")
+    print(f"  {'RMSE':>6} {'MAE':>6} {'R²':>7} {'treino(s)':>9} {'lat(ms)':>8} {'linhas/s':>9}  params")
+    for result in results:
+        m = result['metrics']
+        params = {k: v for k, v in result['params'].items() if k != 'random_state'}
+        print(f"  {m['rmse']:6.2f} {m['mae']:6.2f} {m['r2']:7.4f} {m['fit_time_s']:9.2f} "
+              f"{m['latency_ms']:8.3f} {m['batch_rows_per_s']:9.0f}  {params}")
+
+    if results_path:
+        with open(results_path, 'w') as f:
+            json.dump([{'params': r['params'], 'metrics': r['metrics']} for r in results], f, indent=2)
+        print(f"📄 Resultados do grid salvos em: {results_path}")
+
+    best = select_candidate(results, max_latency_ms)
+    model = best['model']
+    # Métricas registradas: só do teste, que não participou de nenhuma escolha
+    metrics = {
+        **evaluate_candidate(model, X_test, y_test),
+        'fit_time_s': best['metrics']['fit_time_s'],
+        'validation_rmse': best['metrics']['rmse'],
+        'validation_r2': best['metrics']['r2'],
+    }
+    print(f"\n🏆 Modelo escolhido: {best['params']}")
+    print(f"📏 Métricas no teste:")
+    print(f"RMSE: {metrics['rmse']:.2f}")
+    print(f"MAE:  {metrics['mae']:.2f}")
+    print(f"R² Score: {metrics['r2']:.4f}")
 
     # Feature importance
     feature_importance = pd.DataFrame({
@@ -129,12 +406,46 @@ def train_model():
     print("\n🎯 Importância das Features:")
     for idx, row in feature_importance.iterrows():
         print(f"  {row['feature']:20s}: {row['importance']:.4f}")
-    
+
     # Salva modelo
     model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
     joblib.dump(model, model_path)
     print(f"\n💾 Modelo salvo em: {model_path}")
 
+    # Histogramas das features no treino (referência do monitor de drift e
+    # suporte do treino para a confiança) e limites de desvio para high/medium/low
+    metadata = training_metadata(model, X_train, X_val, y_val)
+    reference, calibration = metadata['reference'], metadata['confidence']
+    print(f"📊 Histogramas de referência: {len(reference['features'])} features (id {reference['id']})")
+    print(f"🎚️  Confiança: desvio <= {calibration['std_high']:.2f} high, <= {calibration['std_medium']:.2f} medium "
+          f"(MAE por nível: {calibration['mae']})")
+
+    # Exporta arrays planos (compartilhados entre workers via mmap)
+    forest_path = os.path.join(os.path.dirname(__file__), 'model.bin')
+    export_flat_model(model, forest_path, metadata=metadata)
+    print(f"💾 Floresta exportada em: {forest_path}")
+
+    # Versão compactada (menos árvores, dtypes menores), preferida pelo servidor
+    compact = None
+    compact_path = os.path.join(os.path.dirname(__file__), 'model.compact.bin')
+    if compact_tolerance is not None:
+        compact = compact_model(model, X_val, y_val, compact_tolerance, metadata=metadata)
+        # Menos árvores, outra dispersão: recalibra para a floresta compactada
+        compact.metadata['confidence'] = calibrate_confidence(compact, X_val, y_val)
+        compact.save(compact_path)
+        compact_r2 = r2_score(y_test, compact.predict(np.asarray(X_test, dtype=np.float64)))
+        print(f"💾 Floresta compactada ({compact.n_trees} árvores, R² no teste {compact_r2:.4f}) em: {compact_path}")
+    elif os.path.exists(compact_path):
+        # Compactação de um modelo anterior não vale para o novo
+        os.remove(compact_path)
+
+    # Registra nova versão (servidores em execução trocam o modelo sozinhos)
+    if register:
+        version = register_version(
+            model, metrics=metrics, params=model.get_params(), compact=compact, metadata=metadata
+        )
+        print(f"🏷️  Versão registrada e ativada: {version}")
+
     # Salva amostra dos dados
     sample_data_path = os.path.join(os.path.dirname(__file__), 'sample_data.csv')
     df.head(100).to_csv(sample_data_path, index=False)
@@ -145,5 +456,41 @@ def train_model():
 
     return model
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Treina o modelo de satisfação')
+    parser.add_argument('--samples', type=int, default=2000, help='Exemplos sintéticos a gerar')
+    parser.add_argument('--data', help='CSV ou dataset colunar (datagen.py) de treino, em vez de dados sintéticos')
+    parser.add_argument('--grid', help='Grid de hiperparâmetros: JSON ou caminho de arquivo .json')
+    parser.add_argument('--jobs', type=int, default=-1, help='Núcleos para o treino (-1 = todos)')
+    parser.add_argument('--max-latency-ms', type=float, help='Latência máxima do modelo escolhido')
+    parser.add_argument('--results', help='Arquivo JSON com os resultados de todos os candidatos')
+    parser.add_argument('--no-register', action='store_true', help='Não registra nova versão')
+    parser.add_argument(
+        '--compact-tolerance', type=float,
+        help='Também grava model.compact.bin (perda máxima de R², ex: 0.005)'
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
-    train_model()
\ No newline at end of file
+    args = parse_args()
+
+    grid = None
+    if args.grid:
+        if os.path.isfile(args.grid):
+            with open(args.grid) as f:
+                grid = json.load(f)
+        else:
+            grid = json.loads(args.grid)
+
+    train_model(
+        n_samples=args.samples,
+        data_path=args.data,
+        param_grid=grid,
+        n_jobs=args.jobs,
+        max_latency_ms=args.max_latency_ms,
+        results_path=args.results,
+        register=not args.no_register,
+        compact_tolerance=args.compact_tolerance
+    )
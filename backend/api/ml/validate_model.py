@@ -1,66 +1,133 @@
 """
 Script de validação do modelo ML.
 Verifica overfitting e performance de generalização.
+
+Roda sem interação: o resultado vai para um relatório JSON (com o tempo de
+cada etapa) e o código de saída indica se o modelo passou nos critérios,
+para ser usado como gate de promoção no pipeline.
+
+Uso:
+    python api/ml/validate_model.py --report validation.json
+    python api/ml/validate_model.py --min-r2-cv 0.85 --max-overfitting-gap 0.10
+    python api/ml/validate_model.py --data /data/funcionarios-10m --max-rows 500000
+    python api/ml/validate_model.py --retrain-if-overfit --save
+
+Códigos de saída: 0 = aprovado, 1 = reprovado em algum critério.
 """
 
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
 import numpy as np
 import pandas as pd
 import joblib
-import os
-from sklearn.model_selection import cross_val_score, train_test_split
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.ensemble import RandomForestRegressor
 
+try:
+    from . import datagen
+    from .train_model import load_dataset, split_dataset, training_metadata
+except ImportError:  # executado como script
+    import datagen
+    from train_model import load_dataset, split_dataset, training_metadata
+
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.pkl')
+
+# Critérios padrão de aprovação
+MIN_R2_CV = 0.80
+MAX_OVERFITTING_GAP = 0.10
+
+
+@contextmanager
+def stage(timings, name):
+    """Mede o tempo (s) de uma etapa da validação."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 4)
+
+
+def load_model_and_data(model_path=None, n_samples=2000, data_path=None, max_rows=None):
+    """
+    Carrega o modelo e o dataset de validação.
+
+    Com um dataset colunar (datagen.py), só as primeiras max_rows linhas são
+    lidas do disco.
+    """
+    model = joblib.load(model_path or MODEL_PATH)
+
+    if data_path and datagen.is_dataset(data_path):
+        rows = slice(0, max_rows) if max_rows else None
+        df = datagen.load_frame(data_path, rows=rows)
+    else:
+        df, _ = load_dataset(n_samples=n_samples, data_path=data_path)
+        if max_rows:
+            df = df.head(max_rows)
 
-def load_model_and_data():
-    """Carrega modelo e GERA dados de validação."""
-    from train_model import generate_synthetic_data  # Import da função
-    
-    model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
-    model = joblib.load(model_path)
-    
-    # GERA 2000 amostras para validação (não usa sample_data.csv)
-    print("   Gerando dataset de validação (2000 amostras)...")
-    df = generate_synthetic_data(n_samples=2000)
-    
     return model, df
 
 
-def validate_with_cross_validation(model, X, y, cv=5):
+def _fit_fold(model, X, y, train_idx, test_idx):
+    model = clone(model).fit(X.iloc[train_idx], y.iloc[train_idx])
+    return test_idx, model.predict(X.iloc[test_idx])
+
+
+def _metrics(y_true, y_pred):
+    return {
+        'r2': float(r2_score(y_true, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+    }
+
+
+def validate_with_cross_validation(model, X, y, cv=5, n_jobs=-1):
     """
     Validação cruzada para detectar overfitting.
-    
+
+    Cada fold é treinado uma única vez (em paralelo) e todas as métricas são
+    calculadas sobre as mesmas predições do fold.
+
     Se R² CV for muito menor que R² treino → overfitting!
     """
     print("\n" + "="*60)
     print("🔄 VALIDAÇÃO CRUZADA (Cross-Validation)")
     print("="*60)
-    
-    # Diferentes métricas
-    r2_scores = cross_val_score(model, X, y, cv=cv, scoring='r2')
-    neg_mse_scores = cross_val_score(model, X, y, cv=cv, scoring='neg_mean_squared_error')
-    neg_mae_scores = cross_val_score(model, X, y, cv=cv, scoring='neg_mean_absolute_error')
-    
-    # Converter negativos para positivos
-    mse_scores = -neg_mse_scores
-    mae_scores = -neg_mae_scores
-    rmse_scores = np.sqrt(mse_scores)
-    
-    print(f"\n📊 Resultados ({cv}-fold CV):")
-    print(f"   R² Score:  {r2_scores.mean():.4f} (± {r2_scores.std():.4f})")
-    print(f"   RMSE:      {rmse_scores.mean():.2f} (± {rmse_scores.std():.2f})")
-    print(f"   MAE:       {mae_scores.mean():.2f} (± {mae_scores.std():.2f})")
-    
+
+    folds = KFold(n_splits=cv, shuffle=True, random_state=42).split(X)
+
+    # Paralelismo entre folds; cada floresta usa um núcleo
+    estimator = clone(model).set_params(n_jobs=1)
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(estimator, X, y, train_idx, test_idx)
+        for train_idx, test_idx in folds
+    )
+
+    per_fold = [_metrics(y.iloc[test_idx], y_pred) for test_idx, y_pred in fitted]
+    results = {'folds': per_fold}
+    for name in ('r2', 'rmse', 'mae'):
+        values = np.array([fold[name] for fold in per_fold])
+        results[f'{name}_mean'] = float(values.mean())
+        results[f'{name}_std'] = float(values.std())
+
+    print(f"\n📊 Resultados ({cv}-fold CV, {len(per_fold)} treinos):")
+    print(f"   R² Score:  {results['r2_mean']:.4f} (± {results['r2_std']:.4f})")
+    print(f"   RMSE:      {results['rmse_mean']:.2f} (± {results['rmse_std']:.2f})")
+    print(f"   MAE:       {results['mae_mean']:.2f} (± {results['mae_std']:.2f})")
+
     print(f"\n📈 R² por fold:")
-    for i, score in enumerate(r2_scores, 1):
-        print(f"   Fold {i}: {score:.4f}")
-    
-    return {
-        'r2_mean': r2_scores.mean(),
-        'r2_std': r2_scores.std(),
-        'rmse_mean': rmse_scores.mean(),
-        'mae_mean': mae_scores.mean()
-    }
+    for i, fold in enumerate(per_fold, 1):
+        print(f"   Fold {i}: {fold['r2']:.4f}")
+
+    return results
 
 
 def evaluate_on_holdout(model, X, y, test_size=0.2):
@@ -70,40 +137,29 @@ def evaluate_on_holdout(model, X, y, test_size=0.2):
     print("\n" + "="*60)
     print("🧪 AVALIAÇÃO HOLD-OUT (Test Set)")
     print("="*60)
-    
+
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=42
     )
-    
-    # Predições
-    y_train_pred = model.predict(X_train)
-    y_test_pred = model.predict(X_test)
-    
-    # Métricas treino
-    r2_train = r2_score(y_train, y_train_pred)
-    rmse_train = np.sqrt(mean_squared_error(y_train, y_train_pred))
-    mae_train = mean_absolute_error(y_train, y_train_pred)
-    
-    # Métricas teste
-    r2_test = r2_score(y_test, y_test_pred)
-    rmse_test = np.sqrt(mean_squared_error(y_test, y_test_pred))
-    mae_test = mean_absolute_error(y_test, y_test_pred)
-    
-    print(f"\n📊 TREINO (80% dos dados):")
-    print(f"   R² Score:  {r2_train:.4f}")
-    print(f"   RMSE:      {rmse_train:.2f}")
-    print(f"   MAE:       {mae_train:.2f}")
-    
-    print(f"\n📊 TESTE (20% dos dados):")
-    print(f"   R² Score:  {r2_test:.4f}")
-    print(f"   RMSE:      {rmse_test:.2f}")
-    print(f"   MAE:       {mae_test:.2f}")
-    
+
+    train = _metrics(y_train, model.predict(X_train))
+    test = _metrics(y_test, model.predict(X_test))
+
+    print(f"\n📊 TREINO ({1 - test_size:.0%} dos dados):")
+    print(f"   R² Score:  {train['r2']:.4f}")
+    print(f"   RMSE:      {train['rmse']:.2f}")
+    print(f"   MAE:       {train['mae']:.2f}")
+
+    print(f"\n📊 TESTE ({test_size:.0%} dos dados):")
+    print(f"   R² Score:  {test['r2']:.4f}")
+    print(f"   RMSE:      {test['rmse']:.2f}")
+    print(f"   MAE:       {test['mae']:.2f}")
+
     # Diagnóstico de overfitting
     print(f"\n🔍 DIAGNÓSTICO:")
-    diff = r2_train - r2_test
+    diff = train['r2'] - test['r2']
     print(f"   Diferença R² (treino - teste): {diff:.4f}")
-    
+
     if diff > 0.10:
         print(f"   ⚠️  OVERFITTING DETECTADO!")
         print(f"   → Modelo memoriza treino mas não generaliza bem")
@@ -111,10 +167,12 @@ def evaluate_on_holdout(model, X, y, test_size=0.2):
         print(f"   ⚡ Overfitting leve (aceitável para MVP)")
     else:
         print(f"   ✅ Boa generalização!")
-    
+
     return {
-        'r2_train': r2_train,
-        'r2_test': r2_test,
+        'train': train,
+        'test': test,
+        'r2_train': train['r2'],
+        'r2_test': test['r2'],
         'overfitting_gap': diff
     }
 
@@ -124,17 +182,17 @@ def check_feature_importance(model, feature_names):
     print("\n" + "="*60)
     print("🎯 IMPORTÂNCIA DAS FEATURES")
     print("="*60)
-    
+
     importance_df = pd.DataFrame({
         'feature': feature_names,
         'importance': model.feature_importances_
     }).sort_values('importance', ascending=False)
-    
+
     print("\n")
     for _, row in importance_df.iterrows():
         bar = '█' * int(row['importance'] * 50)
         print(f"   {row['feature']:20s} {bar} {row['importance']:.4f}")
-    
+
     return importance_df
 
 
@@ -143,12 +201,12 @@ def suggest_improvements(cv_results, holdout_results):
     print("\n" + "="*60)
     print("💡 SUGESTÕES DE MELHORIA")
     print("="*60)
-    
+
     r2_cv = cv_results['r2_mean']
     overfitting_gap = holdout_results['overfitting_gap']
-    
+
     suggestions = []
-    
+
     # Verifica performance
     if r2_cv < 0.80:
         suggestions.append("⚠️  R² CV baixo - considere:")
@@ -157,7 +215,7 @@ def suggest_improvements(cv_results, holdout_results):
         suggestions.append("   • Testar outros algoritmos (XGBoost)")
     elif r2_cv >= 0.85:
         suggestions.append("✅ R² CV excelente!")
-    
+
     # Verifica overfitting
     if overfitting_gap > 0.10:
         suggestions.append("⚠️  Overfitting significativo - ajustar:")
@@ -169,29 +227,34 @@ def suggest_improvements(cv_results, holdout_results):
         suggestions.append("⚡ Overfitting leve - monitorar mas aceitável")
     else:
         suggestions.append("✅ Sem overfitting detectado!")
-    
+
     # Sugestões gerais
     suggestions.append("\n📋 Para produção, considere:")
     suggestions.append("   • Implementar monitoramento de data drift")
     suggestions.append("   • A/B testing com modelos alternativos")
     suggestions.append("   • Retreinamento periódico (ex: mensal)")
     suggestions.append("   • Validação com dados reais (não sintéticos)")
-    
+
     for suggestion in suggestions:
         print(suggestion)
 
+    return suggestions
+
 
-def retrain_if_needed(X, y, current_model):
+def retrain_if_needed(X, y, current_model, cv=5):
     """
     Se overfitting for detectado, retreina com regularização.
+
+    Returns:
+        tuple: (modelo, métricas, metadados do model.bin como em train_model)
     """
     print("\n" + "="*60)
     print("🔧 RETREINAMENTO COM REGULARIZAÇÃO")
     print("="*60)
-    
+
     print("\nTreinando modelo regularizado...")
     print("   Parâmetros: max_depth=8, min_samples_split=10")
-    
+
     regularized_model = RandomForestRegressor(
         n_estimators=100,
         max_depth=8,           # Reduzido de 10
@@ -199,79 +262,155 @@ def retrain_if_needed(X, y, current_model):
         random_state=42,
         n_jobs=-1
     )
-    
-    # Treina
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+
+    # Treina (validação só para a calibração, teste só para as métricas, como em train_model)
+    X_train, X_val, X_test, y_train, y_val, y_test = split_dataset(X, y)
     regularized_model.fit(X_train, y_train)
-    
+    regularized_model.set_params(n_jobs=1)
+
     # Avalia
-    y_train_pred = regularized_model.predict(X_train)
-    y_test_pred = regularized_model.predict(X_test)
-    
-    r2_train = r2_score(y_train, y_train_pred)
-    r2_test = r2_score(y_test, y_test_pred)
-    
+    r2_train = r2_score(y_train, regularized_model.predict(X_train))
+    r2_test = r2_score(y_test, regularized_model.predict(X_test))
+
     print(f"\n📊 Resultados do modelo regularizado:")
     print(f"   R² Treino: {r2_train:.4f}")
     print(f"   R² Teste:  {r2_test:.4f}")
     print(f"   Gap:       {r2_train - r2_test:.4f}")
-    
+
     # Cross-validation
-    cv_scores = cross_val_score(regularized_model, X, y, cv=5, scoring='r2')
-    print(f"   R² CV:     {cv_scores.mean():.4f} (± {cv_scores.std():.4f})")
-    
-    return regularized_model
+    cv_results = validate_with_cross_validation(regularized_model, X, y, cv=cv)
 
+    # Histogramas de referência (drift) e calibração da confiança, como no treino
+    metadata = training_metadata(regularized_model, X_train, X_val, y_val)
 
-def main():
+    return regularized_model, {
+        'r2_train': r2_train,
+        'r2_test': r2_test,
+        'overfitting_gap': r2_train - r2_test,
+        'r2_cv': cv_results['r2_mean'],
+    }, metadata
+
+
+def check_gates(cv_results, holdout_results, min_r2_cv=MIN_R2_CV, max_overfitting_gap=MAX_OVERFITTING_GAP):
+    """
+    Compara os resultados com os critérios de aprovação.
+    """
+    gates = {
+        'min_r2_cv': {
+            'threshold': min_r2_cv,
+            'value': cv_results['r2_mean'],
+            'passed': cv_results['r2_mean'] >= min_r2_cv,
+        },
+        'max_overfitting_gap': {
+            'threshold': max_overfitting_gap,
+            'value': holdout_results['overfitting_gap'],
+            'passed': holdout_results['overfitting_gap'] <= max_overfitting_gap,
+        },
+    }
+    return gates, all(gate['passed'] for gate in gates.values())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Valida o modelo de satisfação (sem interação)')
+    parser.add_argument('--model', default=MODEL_PATH, help='Modelo sklearn a validar (model.pkl)')
+    parser.add_argument('--samples', type=int, default=2000, help='Exemplos sintéticos de validação')
+    parser.add_argument('--data', help='CSV ou dataset colunar (datagen.py) de validação')
+    parser.add_argument('--max-rows', type=int, help='Usa só as primeiras N linhas do dataset')
+    parser.add_argument('--cv', type=int, default=5, help='Número de folds')
+    parser.add_argument('--jobs', type=int, default=-1, help='Folds treinados em paralelo (-1 = todos os núcleos)')
+    parser.add_argument('--report', help='Arquivo JSON do relatório')
+    parser.add_argument('--min-r2-cv', type=float, default=MIN_R2_CV, help='R² CV mínimo para aprovar')
+    parser.add_argument(
+        '--max-overfitting-gap', type=float, default=MAX_OVERFITTING_GAP,
+        help='Diferença máxima de R² treino - teste para aprovar'
+    )
+    parser.add_argument('--retrain-if-overfit', action='store_true', help='Treina modelo regularizado se houver overfitting')
+    parser.add_argument('--save', action='store_true', help='Registra o modelo regularizado como nova versão (não ativa)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Executa validação completa."""
+    args = parse_args(argv)
+    timings = {}
+    report = {'model': args.model, 'timings_s': timings}
+
     print("\n" + "="*60)
     print("🎯 VALIDAÇÃO DO MODELO - BENEFIT PREDICTOR")
     print("="*60)
-    
-    # 1. Carrega modelo e dados
-    print("\n📂 Carregando modelo e dados...")
-    model, df = load_model_and_data()
-    
-    X = df.drop('satisfaction_score', axis=1)
-    y = df['satisfaction_score']
-    feature_names = X.columns.tolist()
-    
-    print(f"   ✅ Modelo carregado: {type(model).__name__}")
-    print(f"   ✅ Dados carregados: {len(df)} amostras, {len(feature_names)} features")
-    
-    # 2. Cross-validation
-    cv_results = validate_with_cross_validation(model, X, y, cv=5)
-    
-    # 3. Hold-out test
-    holdout_results = evaluate_on_holdout(model, X, y, test_size=0.2)
-    
-    # 4. Feature importance
-    check_feature_importance(model, feature_names)
-    
-    # 5. Sugestões
-    suggest_improvements(cv_results, holdout_results)
-    
-    # 6. Retreinamento se necessário
-    if holdout_results['overfitting_gap'] > 0.10:
-        print("\n⚠️  Overfitting detectado!")
-        response = input("\n   Retreinar com regularização? (s/n): ")
-        
-        if response.lower() == 's':
-            new_model = retrain_if_needed(X, y, model)
-            
-            save = input("\n   Salvar modelo regularizado? (s/n): ")
-            if save.lower() == 's':
-                model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
-                joblib.dump(new_model, model_path)
-                print(f"\n   ✅ Modelo salvo em: {model_path}")
-    
+
+    with stage(timings, 'total'):
+        # 1. Carrega modelo e dados
+        print("\n📂 Carregando modelo e dados...")
+        with stage(timings, 'load'):
+            model, df = load_model_and_data(args.model, args.samples, args.data, args.max_rows)
+
+        X = df.drop('satisfaction_score', axis=1)
+        y = df['satisfaction_score']
+        feature_names = X.columns.tolist()
+        report['dataset'] = {'rows': len(df), 'features': feature_names}
+
+        print(f"   ✅ Modelo carregado: {type(model).__name__}")
+        print(f"   ✅ Dados carregados: {len(df)} amostras, {len(feature_names)} features")
+
+        # 2. Cross-validation
+        with stage(timings, 'cross_validation'):
+            cv_results = validate_with_cross_validation(model, X, y, cv=args.cv, n_jobs=args.jobs)
+        report['cross_validation'] = cv_results
+
+        # 3. Hold-out test
+        with stage(timings, 'holdout'):
+            holdout_results = evaluate_on_holdout(model, X, y, test_size=0.2)
+        report['holdout'] = holdout_results
+
+        # 4. Feature importance
+        with stage(timings, 'feature_importance'):
+            importance_df = check_feature_importance(model, feature_names)
+        report['feature_importance'] = dict(zip(importance_df['feature'], importance_df['importance'].astype(float)))
+
+        # 5. Sugestões
+        report['suggestions'] = [s.strip() for s in suggest_improvements(cv_results, holdout_results)]
+
+        # 6. Retreinamento se necessário
+        if args.retrain_if_overfit and holdout_results['overfitting_gap'] > args.max_overfitting_gap:
+            print("\n⚠️  Overfitting detectado!")
+            with stage(timings, 'retrain'):
+                new_model, retrain_results, metadata = retrain_if_needed(X, y, model, cv=args.cv)
+            report['retrain'] = retrain_results
+
+            if args.save:
+                try:
+                    from .registry import register_model
+                except ImportError:  # executado como script
+                    from registry import register_model
+
+                version = register_model(
+                    new_model, metrics=retrain_results, params=new_model.get_params(), activate=False,
+                    metadata=metadata
+                )
+                report['retrain']['version'] = version
+                print(f"\n   ✅ Modelo regularizado registrado como {version} (ative com registry.py activate)")
+
+        # 7. Critérios de aprovação
+        gates, passed = check_gates(cv_results, holdout_results, args.min_r2_cv, args.max_overfitting_gap)
+        report['gates'] = gates
+        report['passed'] = passed
+
     print("\n" + "="*60)
-    print("✅ VALIDAÇÃO COMPLETA!")
+    for name, gate in gates.items():
+        mark = '✅' if gate['passed'] else '❌'
+        print(f"{mark} {name}: {gate['value']:.4f} (limite {gate['threshold']})")
+    print(f"⏱️  Tempo total: {timings['total']:.2f}s")
+    print(("✅ VALIDAÇÃO APROVADA" if passed else "❌ VALIDAÇÃO REPROVADA"))
     print("="*60)
 
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Relatório salvo em: {args.report}")
+
+    return 0 if passed else 1
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,10 +1,25 @@
 """
 Models for the Benefit Predictor API.
 """
-from django.db import models
+import random
+
+from django.db import models, router, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class PredictionQuerySet(models.QuerySet):
+    """QuerySet que mantém o rollup de estatísticas em inserts em lote."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            PredictionStats.record([obj.satisfaction_score for obj in created], using=self.db)
+        return created
+
+
 class Prediction(models.Model):
     """
     Armazena previsões de satisfação de funcionários.
@@ -51,13 +66,189 @@ class Prediction(models.Model):
     # Metadados
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = PredictionQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Previsão'
         verbose_name_plural = 'Previsões'
+        indexes = [
+            # Listagem/paginação keyset: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='prediction_created_id_idx'),
+            # Filtro por plano mantendo a mesma ordenação
+            models.Index(fields=['health_plan_tier', '-created_at', '-id'], name='prediction_tier_created_idx'),
+            # Filtro por faixa de score
+            models.Index(fields=['satisfaction_score'], name='prediction_score_idx'),
+        ]
     
     def __str__(self):
         return f"Previsão {self.id} - Score: {self.satisfaction_score:.2f}"
+    
+    def save(self, *args, **kwargs):
+        """Salva e, se for um novo registro, atualiza o rollup na mesma transação."""
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            created = self._state.adding
+            super().save(*args, **kwargs)
+            if created:
+                PredictionStats.record([self.satisfaction_score], using=using)
+
+
+class PredictionStats(models.Model):
+    """
+    Rollup incremental das estatísticas de Prediction.
+    
+    Mantido a cada insert/delete de Prediction, para /api/predictions/stats/
+    não precisar escanear a tabela. Os contadores são divididos em SHARDS
+    linhas (escolhidas aleatoriamente a cada escrita) para que inserts
+    concorrentes não disputem o lock de uma única linha; a leitura soma
+    no máximo SHARDS linhas.
+    
+    Reconstrução/verificação: python manage.py rebuild_prediction_stats
+    """
+    SHARDS = 8
+    
+    # Limites dos buckets da distribuição (mesmos do dashboard)
+    LOW_THRESHOLD = 50
+    HIGH_THRESHOLD = 75
+    
+    shard = models.PositiveSmallIntegerField(unique=True)
+    total = models.BigIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    low = models.BigIntegerField(default=0)
+    medium = models.BigIntegerField(default=0)
+    high = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Estatística de Previsões'
+        verbose_name_plural = 'Estatísticas de Previsões'
+    
+    def __str__(self):
+        return f"Shard {self.shard} - {self.total} previsões"
+    
+    @classmethod
+    def bucket_counts(cls, scores):
+        """Conta quantos scores caem em cada bucket (low, medium, high)."""
+        low = sum(1 for score in scores if score < cls.LOW_THRESHOLD)
+        high = sum(1 for score in scores if score >= cls.HIGH_THRESHOLD)
+        return low, len(scores) - low - high, high
+    
+    @classmethod
+    def record(cls, scores, sign=1, using='default'):
+        """
+        Soma (sign=1) ou subtrai (sign=-1) scores do rollup com um único UPDATE.
+        """
+        if not scores:
+            return
+        
+        low, medium, high = cls.bucket_counts(scores)
+        shard = random.randrange(cls.SHARDS)
+        changes = {
+            'total': F('total') + sign * len(scores),
+            'score_sum': F('score_sum') + sign * float(sum(scores)),
+            'low': F('low') + sign * low,
+            'medium': F('medium') + sign * medium,
+            'high': F('high') + sign * high,
+        }
+        
+        with transaction.atomic(using=using, savepoint=False):
+            if not cls.objects.using(using).filter(shard=shard).update(**changes):
+                cls.objects.using(using).get_or_create(shard=shard)
+                cls.objects.using(using).filter(shard=shard).update(**changes)
+    
+    @classmethod
+    def snapshot(cls, using='default'):
+        """Totais agregados de todos os shards (uma query)."""
+        totals = cls.objects.using(using).aggregate(
+            total=Sum('total'),
+            score_sum=Sum('score_sum'),
+            low=Sum('low'),
+            medium=Sum('medium'),
+            high=Sum('high'),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+
+class FeatureHistogram(models.Model):
+    """
+    Contagens das entradas de produção por bin, para o monitor de drift.
+    
+    Uma linha por (referência, dia, feature, bin). Os bins são os dos
+    histogramas de referência gravados no treino (ver api/ml/drift.py),
+    identificados pelo id da referência, e as contagens chegam somadas de
+    cada processo em flushes periódicos (ver api/monitoring.py), sem reler
+    a tabela de Prediction.
+    """
+    reference_id = models.CharField(max_length=16, help_text="Id dos histogramas de referência do treino")
+    model_version = models.CharField(max_length=32)
+    period = models.DateField(help_text="Dia (UTC) das entradas")
+    feature = models.CharField(max_length=32)
+    bin = models.PositiveSmallIntegerField()
+    count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Histograma de Feature'
+        verbose_name_plural = 'Histogramas de Features'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['reference_id', 'period', 'feature', 'bin'], name='feature_histogram_bin_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.model_version} ({self.reference_id}) {self.period} {self.feature}[{self.bin}] = {self.count}"
+    
+    @classmethod
+    def record(cls, reference_id, model_version, period, counts, using='default'):
+        """
+        Soma contagens aos bins (um UPDATE por bin com contagem nova).
+        
+        Args:
+            counts (dict): Feature -> lista de contagens por bin
+        """
+        changes = [
+            (feature, index, count)
+            for feature, bins in counts.items()
+            for index, count in enumerate(bins) if count
+        ]
+        if not changes:
+            return
+        
+        with transaction.atomic(using=using):
+            # Cria as linhas que faltam; o incremento é sempre um UPDATE atômico
+            cls.objects.using(using).bulk_create([
+                cls(reference_id=reference_id, model_version=model_version, period=period, feature=feature, bin=index)
+                for feature, index, _ in changes
+            ], ignore_conflicts=True)
+            for feature, index, count in changes:
+                cls.objects.using(using).filter(
+                    reference_id=reference_id, period=period, feature=feature, bin=index
+                ).update(count=F('count') + count)
+    
+    @classmethod
+    def totals(cls, reference_id, since=None, using='default'):
+        """
+        Contagens somadas por feature/bin (uma query).
+        
+        Returns:
+            dict: Feature -> {bin: contagem}
+        """
+        rows = cls.objects.using(using).filter(reference_id=reference_id)
+        if since is not None:
+            rows = rows.filter(period__gte=since)
+        
+        totals = {}
+        for row in rows.values('feature', 'bin').annotate(total=Sum('count')):
+            totals.setdefault(row['feature'], {})[row['bin']] = row['total']
+        return totals
+
+
+@receiver(post_delete, sender=Prediction)
+def _remove_from_stats(sender, instance, using, **kwargs):
+    """Mantém o rollup consistente quando predições são apagadas (ex: admin)."""
+    PredictionStats.record([instance.satisfaction_score], sign=-1, using=using)
 
 
 class EmployeeProfile(models.Model):
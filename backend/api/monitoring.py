@@ -0,0 +1,224 @@
+"""
+Monitor de drift das entradas de produção.
+
+Cada predição servida é contada em memória nos bins dos histogramas de
+referência do modelo ativo (O(1) por linha, ver api/ml/drift.py). Uma
+thread em background soma as contagens no banco (FeatureHistogram) a cada
+PREDICTION_DRIFT_FLUSH_INTERVAL segundos, por referência e dia, então
+as estatísticas de /api/drift/ juntam todos os processos sem reler a tabela
+de Prediction. O relatório soma as contagens ainda em memória do próprio
+processo sem gravá-las: um GET não escreve no banco.
+
+As contagens ainda não gravadas se perdem se o processo morrer: o monitor
+é uma amostra da distribuição, não um registro das predições.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .ml import drift, predict
+from .models import FeatureHistogram
+
+
+class DriftMonitor:
+    """
+    Histogramas em memória por referência do modelo, com flusher em background.
+
+    Args:
+        flush_interval (float): Intervalo (s) entre flushes
+    """
+
+    def __init__(self, flush_interval=60.0):
+        self.flush_interval = flush_interval
+        self._histograms = {}
+        self._retry = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def observe(self, X, loaded=None):
+        """
+        Conta as linhas de X (n, 6), na ordem de FEATURES.
+
+        Modelos sem histogramas de referência não são monitorados.
+        """
+        loaded = loaded or predict.get_active_model()
+        if loaded is None or loaded.reference is None:
+            return
+
+        # Chave: id da referência (mesmos bins), não a versão ('legacy' pode mudar de bins)
+        reference = loaded.reference
+        entry = self._histograms.get(reference['id'])
+        if entry is None:
+            with self._lock:
+                entry = self._histograms.setdefault(
+                    reference['id'], (loaded.version, drift.StreamingHistograms(reference))
+                )
+        entry[1].add(X)
+
+    def flush(self):
+        """
+        Soma as contagens pendentes no banco.
+
+        Returns:
+            int: Referências gravadas
+        """
+        period = datetime.now(timezone.utc).date()
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._histograms.items())
+                # Referências de versões antigas saem depois deste último flush
+                active = predict.get_active_model()
+                active_id = active.reference['id'] if active is not None and active.reference else None
+                for reference_id, _ in entries:
+                    if reference_id != active_id:
+                        del self._histograms[reference_id]
+
+            # Contagens de um flush que falhou são tentadas de novo primeiro
+            pending, self._retry = self._retry, []
+            pending += [
+                (reference_id, version, period, histograms.drain())
+                for reference_id, (version, histograms) in entries
+            ]
+
+            written = 0
+            for index, (reference_id, version, day, counts) in enumerate(pending):
+                try:
+                    FeatureHistogram.record(reference_id, version, day, counts)
+                except Exception:
+                    self._retry = pending[index:]
+                    raise
+                written += 1
+        return written
+
+    def pending(self, reference_id, since=None):
+        """
+        Contagens ainda não gravadas de uma referência (leitura, não zera nada).
+
+        Args:
+            since (date): Ignora as pendências de flushes que falharam antes deste dia
+
+        Returns:
+            dict: Feature -> {bin: contagem}
+        """
+        with self._lock:
+            entry = self._histograms.get(reference_id)
+            retry = list(self._retry)
+
+        snapshots = [entry[1].snapshot()] if entry is not None else []
+        snapshots += [
+            counts for pending_id, _, day, counts in retry
+            if pending_id == reference_id and (since is None or day >= since)
+        ]
+
+        totals = {}
+        for counts in snapshots:
+            for name, feature_counts in counts.items():
+                bins = totals.setdefault(name, {})
+                for index, count in enumerate(feature_counts):
+                    if count:
+                        bins[index] = bins.get(index, 0) + count
+        return totals
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._retry = []
+
+    def start(self):
+        """
+        Inicia o flusher em background.
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='drift-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar histogramas de drift: {e}")
+        connection.close()
+
+
+_monitor = None
+_init_lock = threading.Lock()
+
+
+def get_drift_monitor():
+    """
+    Retorna o monitor de drift do processo (criado sob demanda).
+    """
+    global _monitor
+    if _monitor is None:
+        with _init_lock:
+            if _monitor is None:
+                _monitor = DriftMonitor(flush_interval=settings.PREDICTION_DRIFT_FLUSH_INTERVAL)
+    return _monitor
+
+
+def observe_inputs(X):
+    """
+    Conta entradas servidas no monitor (se PREDICTION_DRIFT_MONITOR estiver ativo).
+    """
+    if settings.PREDICTION_DRIFT_MONITOR:
+        get_drift_monitor().observe(X)
+
+
+def drift_report(days=None, loaded=None):
+    """
+    Drift das entradas de produção em relação ao treino do modelo ativo.
+
+    Soma às contagens de FeatureHistogram as que este processo ainda tem em
+    memória, sem gravá-las; as dos demais processos entram no próximo flush
+    de cada um.
+
+    Args:
+        days (int): Só os últimos `days` dias (padrão: todas as contagens da
+            referência do modelo ativo, em qualquer versão que a use)
+
+    Returns:
+        dict: {'model_version', 'reference_id', 'since', 'reference_samples', 'observations',
+               'drift_detected', 'features'}, ou None se o modelo não tem referência
+    """
+    loaded = loaded or predict.get_active_model()
+    if loaded is None or loaded.reference is None:
+        return None
+
+    since = None
+    if days is not None:
+        since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+    reference = loaded.reference
+    totals = FeatureHistogram.totals(reference['id'], since=since)
+    pending = get_drift_monitor().pending(reference['id'], since=since) if settings.PREDICTION_DRIFT_MONITOR else {}
+    current = {
+        name: [
+            totals.get(name, {}).get(index, 0) + pending.get(name, {}).get(index, 0)
+            for index in range(len(ref['edges']) + 1)
+        ]
+        for name, ref in reference['features'].items()
+    }
+    features = drift.compare(reference, current)
+
+    return {
+        'model_version': loaded.version,
+        'reference_id': reference['id'],
+        'since': since,
+        'reference_samples': reference['n_samples'],
+        'observations': max((item['observations'] for item in features.values()), default=0),
+        'drift_detected': any(item['status'] == 'significant' for item in features.values()),
+        'features': features,
+    }
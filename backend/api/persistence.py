@@ -0,0 +1,256 @@
+"""
+Persistência write-behind de predições.
+
+Com PREDICTION_WRITE_BEHIND=1, o endpoint de predição não faz o INSERT
+durante a requisição: a linha vai para um buffer em memória que uma thread
+em background grava com bulk_create quando junta flush_size linhas ou a
+cada flush_interval segundos.
+
+O prediction_id devolvido ao cliente é reservado antes, direto da sequence
+do PostgreSQL (em blocos, para não custar uma query por predição), então é
+estável e aponta para a linha que será gravada.
+
+Um lote que falha é tentado de novo até max_attempts flushes; depois disso
+as linhas são gravadas uma a uma e as que ainda falham vão para o logger
+api.persistence.dead_letter (JSON com os campos da linha), para não travar o
+buffer. O mesmo vale para o que não puder ser gravado no shutdown.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import Prediction
+
+
+logger = logging.getLogger(__name__)
+dead_letter = logging.getLogger(__name__ + '.dead_letter')
+
+
+class BufferFull(Exception):
+    """Buffer cheio: o cliente deve tentar de novo mais tarde (backpressure)."""
+
+
+class IdAllocator:
+    """
+    Reserva IDs de Prediction da sequence do PostgreSQL em blocos.
+    """
+
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._ids = deque()
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            if not self._ids:
+                self._ids.extend(_reserve_ids(self.block_size))
+            return self._ids.popleft()
+
+
+def _reserve_ids(n):
+    table = Prediction._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [table, n]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def supports_write_behind():
+    """
+    Write-behind depende da sequence do PostgreSQL para reservar IDs.
+    Em outros bancos (ex: SQLite local) o INSERT continua síncrono.
+    """
+    return settings.PREDICTION_WRITE_BEHIND and connection.vendor == 'postgresql'
+
+
+class PredictionWriteBuffer:
+    """
+    Buffer limitado de Predictions pendentes com flusher em background.
+
+    Args:
+        max_size (int): Máximo de linhas pendentes; acima disso enqueue bloqueia
+        flush_size (int): Quantidade de linhas que dispara um flush imediato
+        flush_interval (float): Intervalo máximo (s) entre flushes
+        max_attempts (int): Flushes de um lote que falha antes de gravá-lo linha a linha
+    """
+
+    def __init__(self, max_size=10000, flush_size=500, flush_interval=1.0, max_attempts=5):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.flushed = 0
+        self.dead_lettered = 0
+        self._retry = []
+        self._attempts = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def __len__(self):
+        return self._queue.qsize() + len(self._retry)
+
+    def enqueue(self, prediction, timeout=0.5):
+        """
+        Adiciona uma Prediction (com id já reservado) ao buffer.
+
+        Se o buffer estiver cheio, espera até `timeout` segundos por espaço
+        e então levanta BufferFull, em vez de descartar a linha.
+        """
+        try:
+            self._queue.put(prediction, timeout=timeout)
+        except queue.Full:
+            self._wakeup.set()
+            raise BufferFull(f"Buffer de predições cheio ({self._queue.maxsize} linhas pendentes)")
+
+        if self._queue.qsize() >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Grava todas as linhas pendentes (um bulk_create por flush_size linhas).
+
+        Returns:
+            int: Linhas gravadas
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                # Linhas de um flush que falhou são tentadas de novo primeiro
+                rows, self._retry = self._retry, []
+                while len(rows) < self.flush_size:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    break
+
+                try:
+                    with transaction.atomic():
+                        Prediction.objects.bulk_create(rows)
+                except Exception:
+                    self._attempts += 1
+                    if self._attempts < self.max_attempts:
+                        self._retry = rows
+                        raise
+                    # Lote que sempre falha (ex: id duplicado): isola as linhas ruins
+                    written += self._write_rows(rows)
+                else:
+                    written += len(rows)
+                self._attempts = 0
+
+            self.flushed += written
+        return written
+
+    def _write_rows(self, rows):
+        """
+        Grava linha a linha; as que falham vão para o dead-letter.
+
+        Returns:
+            int: Linhas gravadas
+        """
+        written = 0
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    Prediction.objects.bulk_create([row])
+            except Exception as e:
+                self._dead_letter([row], e)
+            else:
+                written += 1
+        return written
+
+    def _dead_letter(self, rows, error):
+        for row in rows:
+            fields = {field.attname: getattr(row, field.attname) for field in Prediction._meta.concrete_fields}
+            dead_letter.error(json.dumps({'prediction': fields, 'error': str(error)}, default=str))
+        self.dead_lettered += len(rows)
+        logger.error("%d predição(ões) enviadas ao dead-letter: %s", len(rows), error)
+
+    def start(self):
+        """
+        Inicia o flusher em background e garante o flush no shutdown.
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Para o flusher e grava o que estiver pendente.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            # Último flush (ex: banco fora no shutdown): registra as linhas em vez de perdê-las
+            with self._flush_lock:
+                rows, self._retry = self._retry, []
+                while True:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._dead_letter(rows, e)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Falha ao gravar predições pendentes (tentativa %d de %d): %s",
+                               self._attempts, self.max_attempts, e)
+        connection.close()
+
+
+_buffer = None
+_allocator = None
+_init_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """
+    Retorna o buffer write-behind do processo (criado sob demanda).
+    """
+    global _buffer
+    if _buffer is None:
+        with _init_lock:
+            if _buffer is None:
+                _buffer = PredictionWriteBuffer(
+                    max_size=settings.PREDICTION_WRITE_BEHIND_MAX_SIZE,
+                    flush_size=settings.PREDICTION_WRITE_BEHIND_FLUSH_SIZE,
+                    flush_interval=settings.PREDICTION_WRITE_BEHIND_FLUSH_INTERVAL,
+                    max_attempts=settings.PREDICTION_WRITE_BEHIND_MAX_ATTEMPTS
+                )
+    return _buffer
+
+
+def get_id_allocator():
+    """
+    Retorna o alocador de IDs do processo (criado sob demanda).
+    """
+    global _allocator
+    if _allocator is None:
+        with _init_lock:
+            if _allocator is None:
+                _allocator = IdAllocator()
+    return _allocator
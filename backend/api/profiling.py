@@ -0,0 +1,149 @@
+"""
+Profiling sob demanda de requisições reais.
+
+Com API_PROFILING=1, ProfilingMiddleware executa sob o cProfile as
+requisições que:
+
+- trazem o header X-Profile (com o valor de API_PROFILING_TOKEN, se definido), ou
+- caem na amostragem aleatória (API_PROFILING_SAMPLE_RATE, 0 a 1)
+
+Cada profile vai para API_PROFILING_DIR com o instante, método, endpoint,
+status e duração no nome do arquivo, e o nome volta no header X-Profile-File.
+Os arquivos mais antigos são apagados acima de API_PROFILING_MAX_FILES.
+
+Com API_PROFILING=0 (padrão) o middleware se remove da cadeia na
+inicialização (MiddlewareNotUsed): as requisições não pagam nada.
+
+Os profiles são listados/resumidos com `python manage.py profiles`, ou
+abertos com pstats/snakeviz.
+"""
+
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+PROFILE_SUFFIX = '.prof'
+
+# 20261017T120301.123456Z__POST__api.predict__201__12.3ms__4242.prof
+_NAME_RE = re.compile(
+    r'^(?P<timestamp>\d{8}T\d{6}\.\d{6}Z)__(?P<method>[A-Z]+)__(?P<endpoint>[A-Za-z0-9.-]+)'
+    r'__(?P<status>\d{3})__(?P<duration_ms>[\d.]+)ms__(?P<pid>\d+)\.prof$'
+)
+
+
+class ProfilingMiddleware:
+    """
+    Executa requisições selecionadas sob o cProfile e grava o profile em disco.
+    """
+
+    def __init__(self, get_response):
+        if not settings.API_PROFILING:
+            raise MiddlewareNotUsed('API_PROFILING desativado')
+        self.get_response = get_response
+        self.directory = settings.API_PROFILING_DIR
+        self.header = 'HTTP_' + settings.API_PROFILING_HEADER.upper().replace('-', '_')
+        self.token = settings.API_PROFILING_TOKEN
+        self.sample_rate = settings.API_PROFILING_SAMPLE_RATE
+        self.max_files = settings.API_PROFILING_MAX_FILES
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outro profiler já ativo nesta thread: atende sem profile
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        path = save_profile(profiler, self.directory, request, response.status_code, duration)
+        response['X-Profile-File'] = os.path.basename(path)
+        prune_profiles(self.directory, self.max_files)
+        return response
+
+    def _should_profile(self, request):
+        value = request.META.get(self.header)
+        if value is not None:
+            return not self.token or hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+def endpoint_slug(path):
+    """'/api/predictions/42/' -> 'api.predictions.42'"""
+    return re.sub(r'[^A-Za-z0-9-]+', '.', path.strip('/')).strip('.') or 'root'
+
+
+def save_profile(profiler, directory, request, status, duration):
+    """
+    Grava o profile com os metadados da requisição no nome do arquivo.
+
+    Returns:
+        str: Caminho do arquivo
+    """
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')
+    name = (
+        f"{timestamp}__{request.method}__{endpoint_slug(request.path)}"
+        f"__{status}__{duration * 1000:.1f}ms__{os.getpid()}{PROFILE_SUFFIX}"
+    )
+    path = os.path.join(directory, name)
+    profiler.dump_stats(path)
+    return path
+
+
+def list_profiles(directory):
+    """
+    Profiles do diretório, do mais recente para o mais antigo.
+
+    Returns:
+        list[dict]: name, path, timestamp, method, endpoint, status, duration_ms, bytes
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in os.listdir(directory):
+        match = _NAME_RE.match(name)
+        if match is None:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            continue  # apagado por outro worker
+        profiles.append({
+            'name': name,
+            'path': path,
+            'timestamp': datetime.strptime(match['timestamp'], '%Y%m%dT%H%M%S.%fZ').replace(tzinfo=timezone.utc),
+            'method': match['method'],
+            'endpoint': match['endpoint'],
+            'status': int(match['status']),
+            'duration_ms': float(match['duration_ms']),
+            'bytes': size,
+        })
+    return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+
+def prune_profiles(directory, max_files):
+    """Apaga os profiles mais antigos além de max_files."""
+    for profile in list_profiles(directory)[max_files:]:
+        try:
+            os.remove(profile['path'])
+        except FileNotFoundError:
+            pass  # outro worker já apagou
@@ -1,5 +1,10 @@
 """Serializers for the Benefit Predictor API."""
+import math
+
+import numpy as np
+from django.conf import settings
 from rest_framework import serializers
+from .ml.packages import DEFAULT_OPTIONS, PACKAGE_FEATURES
 from .models import Prediction, EmployeeProfile
 
 
@@ -27,7 +32,176 @@ class PredictionResponseSerializer(serializers.Serializer):
     confidence_level = serializers.CharField()
     recommendation = serializers.CharField()
     prediction_id = serializers.IntegerField(required=False)
+    uncertainty = serializers.DictField(required=False)
+    attributions = serializers.DictField(required=False)
+
+
+class PredictionBatchItemSerializer(PredictionResponseSerializer):
+    """Item da response da API de predição em lote."""
+    index = serializers.IntegerField()
+
+
+
+class WhatIfSweepSerializer(serializers.Serializer):
+    """Valores de uma feature numa varredura: lista explícita ou min/max/step."""
+    values = serializers.ListField(
+        child=serializers.FloatField(), required=False, allow_empty=False,
+        max_length=settings.PREDICTION_WHAT_IF_MAX_POINTS
+    )
+    min = serializers.FloatField(required=False)
+    max = serializers.FloatField(required=False)
+    step = serializers.FloatField(required=False)
+
+    def validate(self, attrs):
+        # FloatField aceita "nan" e "inf", que quebram a varredura e o JSON da resposta
+        if 'values' in attrs:
+            if {'min', 'max', 'step'} & set(attrs):
+                raise serializers.ValidationError('Use values ou min/max/step, não ambos')
+            values = np.asarray(attrs['values'], dtype=np.float64)
+            if not np.isfinite(values).all():
+                raise serializers.ValidationError('Valores devem ser finitos')
+            return values
+
+        if not {'min', 'max', 'step'} <= set(attrs):
+            raise serializers.ValidationError('Informe values ou min, max e step')
+        if not all(math.isfinite(attrs[key]) for key in ('min', 'max', 'step')):
+            raise serializers.ValidationError('min, max e step devem ser finitos')
+        if attrs['step'] <= 0 or attrs['max'] < attrs['min']:
+            raise serializers.ValidationError('step deve ser positivo e max >= min')
+
+        # Limita antes de alocar: min/max/step arbitrários poderiam gerar milhões de pontos.
+        # Compara em float: a razão pode ser inf (ex.: max=1e308, step=1e-308) e int() estouraria
+        intervals = (attrs['max'] - attrs['min']) / attrs['step'] + 1e-9
+        if intervals >= settings.PREDICTION_WHAT_IF_MAX_POINTS:
+            raise serializers.ValidationError(
+                f'Varredura excede o limite de {settings.PREDICTION_WHAT_IF_MAX_POINTS} pontos'
+            )
+        return attrs['min'] + attrs['step'] * np.arange(int(intervals) + 1)
+
+
+def validate_feature_values(sweeps, allowed=None):
+    """
+    Checa valores de features (arrays) contra os limites de PredictionInputSerializer.
+
+    Vetorizado: não valida ponto a ponto. Features decimais são arredondadas
+    para 2 casas, como no endpoint de predição; as inteiras precisam ser inteiras.
+    """
+    fields = PredictionInputSerializer().fields
+    allowed = allowed or list(fields)
+    errors = {}
+    for name, values in sweeps.items():
+        if name not in allowed:
+            errors[name] = f'Feature desconhecida. Use: {", ".join(allowed)}'
+            continue
+
+        field = fields[name]
+        if isinstance(field, serializers.DecimalField):
+            values = sweeps[name] = np.round(values, field.decimal_places)
+        elif np.any(values != np.round(values)):
+            errors[name] = 'Valores devem ser inteiros'
+            continue
+
+        low = float(field.min_value) if field.min_value is not None else -np.inf
+        high = float(field.max_value) if field.max_value is not None else np.inf
+        if np.any((values < low) | (values > high)):
+            errors[name] = f'Valores devem estar entre {field.min_value} e {field.max_value}'
+    if errors:
+        raise serializers.ValidationError(errors)
+    return sweeps
+
+
+def valid_feature_rows(X, features):
+    """
+    Máscara (n,) das linhas de X que passariam por PredictionInputSerializer.
+
+    Mesmos limites (min/max, inteiros, dígitos dos decimais) aplicados como
+    máscaras vetorizadas, para arquivos grandes (ver score_employees).
+
+    Args:
+        X (np.ndarray): Matriz (n, len(features))
+        features (list): Nomes das colunas de X
+    """
+    fields = PredictionInputSerializer().fields
+    valid = np.isfinite(X).all(axis=1)
+    for j, name in enumerate(features):
+        field, values = fields[name], X[:, j]
+        if isinstance(field, serializers.DecimalField):
+            values = np.round(values, field.decimal_places)
+            integer_digits = field.max_digits - field.decimal_places
+            valid &= np.abs(values) < 10 ** integer_digits
+        else:
+            valid &= values == np.round(values)
+        if field.min_value is not None:
+            valid &= values >= float(field.min_value)
+        if field.max_value is not None:
+            valid &= values <= float(field.max_value)
+    return valid
+
+
+class WhatIfInputSerializer(serializers.Serializer):
+    """
+    Perfil base e features a variar em /api/predict/what-if/.
+
+    Os valores varridos passam pelos mesmos limites de PredictionInputSerializer
+    (ver validate_feature_values).
+    """
+    profile = PredictionInputSerializer()
+    sweeps = serializers.DictField(child=WhatIfSweepSerializer(), allow_empty=False)
+    grid = serializers.BooleanField(default=False)
+
+    def validate_sweeps(self, sweeps):
+        return validate_feature_values(sweeps)
+
+    def validate(self, attrs):
+        sizes = [len(values) for values in attrs['sweeps'].values()]
+        points = sum(sizes) + (math.prod(sizes) if attrs['grid'] else 0)
+        if points > settings.PREDICTION_WHAT_IF_MAX_POINTS:
+            raise serializers.ValidationError(
+                f'Varredura com {points} pontos excede o limite de {settings.PREDICTION_WHAT_IF_MAX_POINTS}'
+            )
+        return attrs
+
+
+def validate_finite(value):
+    """FloatField aceita "nan" e "inf", que não são custos válidos nem serializam em JSON."""
+    if not math.isfinite(value):
+        raise serializers.ValidationError('Valor deve ser finito')
+
+
+class PackageCostsSerializer(serializers.Serializer):
+    """Custos mensais usados pelo otimizador (os omitidos usam os padrões)."""
+    meal_voucher = serializers.FloatField(min_value=0, required=False, validators=[validate_finite])
+    gym_usage = serializers.FloatField(min_value=0, required=False, validators=[validate_finite])
+    health_plan_tier = serializers.DictField(
+        child=serializers.FloatField(min_value=0, validators=[validate_finite]), required=False
+    )
+
+    def validate_health_plan_tier(self, value):
+        if not set(value) <= {'1', '2', '3'}:
+            raise serializers.ValidationError('Níveis válidos: 1, 2 e 3')
+        return {int(tier): cost for tier, cost in value.items()}
+
+
+class PackageOptimizerInputSerializer(serializers.Serializer):
+    """Funcionários, orçamento e espaço de busca de /api/predict/optimize/."""
+    employees = PredictionInputSerializer(
+        many=True, allow_empty=False, max_length=settings.PREDICTION_OPTIMIZER_MAX_EMPLOYEES
+    )
+    budget = serializers.FloatField(min_value=0, required=False)
+    options = serializers.DictField(child=WhatIfSweepSerializer(), required=False)
+    costs = PackageCostsSerializer(required=False)
+
+    def validate_options(self, options):
+        return validate_feature_values(options, allowed=PACKAGE_FEATURES)
 
+    def validate(self, attrs):
+        sizes = [len(values) for values in attrs.get('options', {}).values()]
+        sizes += [len(DEFAULT_OPTIONS[name]) for name in PACKAGE_FEATURES if name not in attrs.get('options', {})]
+        if math.prod(sizes) > settings.PREDICTION_OPTIMIZER_MAX_PACKAGES:
+            raise serializers.ValidationError(
+                f'{math.prod(sizes)} pacotes excedem o limite de {settings.PREDICTION_OPTIMIZER_MAX_PACKAGES}'
+            )
+        return attrs
 
 class EmployeeProfileSerializer(serializers.ModelSerializer):
     """Serializer para EmployeeProfile."""
@@ -20,6 +20,30 @@ class TestHealthCheck(APITestCase):
         assert response.status_code == status.HTTP_200_OK
         assert response.data['status'] == 'healthy'
         assert 'version' in response.data
+        assert response.data['model']['loaded'] is True
+        assert 'cache' in response.data['model']
+
+
+@pytest.mark.django_db
+class TestBackgroundWorkers(APITestCase):
+    """Test that background threads only start in serving processes."""
+    
+    def test_started_by_first_served_request_only(self):
+        """Test that test-client requests don't start threads and a WSGI request starts them once."""
+        from unittest import mock
+        from django.core.handlers.wsgi import WSGIHandler
+        from django.core.signals import request_started
+        from api import apps
+        
+        with mock.patch.object(apps, '_started', False), \
+                mock.patch('api.ml.predict.start_model_watcher') as watcher, \
+                mock.patch('api.monitoring.DriftMonitor.start') as drift:
+            self.client.get(reverse('health-check'))
+            assert not watcher.called and not drift.called
+            
+            request_started.send(sender=WSGIHandler)
+            request_started.send(sender=WSGIHandler)
+            assert watcher.call_count == 1 and drift.call_count == 1
 
 
 @pytest.mark.django_db
@@ -154,6 +178,1020 @@ class TestPredictionAPI(APITestCase):
         assert response.status_code == status.HTTP_201_CREATED
 
 
+@pytest.mark.django_db
+class TestPredictionBatchAPI(APITestCase):
+    """Test batch prediction endpoint."""
+    
+    def setUp(self):
+        """Set up test client."""
+        self.client = APIClient()
+        self.batch_url = reverse('predict-batch')
+        
+        self.valid_payload = {
+            'age': 30,
+            'salary': 5000.00,
+            'commute_time': 45,
+            'gym_usage': 12,
+            'meal_voucher': 800.00,
+            'health_plan_tier': 2
+        }
+    
+    def test_batch_matches_single_prediction(self):
+        """Test that batch scores match the single prediction endpoint."""
+        single = self.client.post(reverse('predict'), self.valid_payload, format='json')
+        response = self.client.post(
+            self.batch_url,
+            [self.valid_payload, self.valid_payload],
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data['results']) == 2
+        assert response.data['errors'] == []
+        for item in response.data['results']:
+            assert item['satisfaction_score'] == single.data['satisfaction_score']
+            assert item['confidence_level'] == single.data['confidence_level']
+            assert item['recommendation'] == single.data['recommendation']
+    
+    def test_batch_reports_invalid_items_by_index(self):
+        """Test that invalid items don't fail the whole batch."""
+        invalid = self.valid_payload.copy()
+        invalid['age'] = 15
+        initial_count = Prediction.objects.count()
+        
+        response = self.client.post(
+            self.batch_url,
+            [self.valid_payload, invalid, self.valid_payload],
+            format='json'
+        )
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [item['index'] for item in response.data['results']] == [0, 2]
+        assert response.data['errors'][0]['index'] == 1
+        assert 'age' in response.data['errors'][0]['errors']
+        assert Prediction.objects.count() == initial_count + 2
+        
+        ids = [item['prediction_id'] for item in response.data['results']]
+        assert Prediction.objects.filter(id__in=ids).count() == 2
+    
+    def test_recommendation_parity_at_thresholds(self):
+        """Test that single and batch paths pick the recommendation from the unrounded score."""
+        from unittest import mock
+        import numpy as np
+        from api.ml import predict
+        
+        class FixedModel:
+            calibration = support = None
+            
+            def predict_with_std(self, X):
+                # Score bruto = primeira coluna
+                return np.asarray(X)[:, 0], None
+        
+        model = FixedModel()
+        rows = [[raw, 5000.0, 45, 12, 800.0, 2] for raw in (59.9999, 60.0, 79.9997, 80.0)]
+        with mock.patch.object(predict, 'batcher', None):
+            single = [predict._predict_single(model, *row) for row in rows]
+        batch = predict.predict_batch(rows, loaded=model)
+        
+        assert batch == single
+        assert [item['score'] for item in batch] == [60.0, 60.0, 80.0, 80.0]
+        assert batch[0]['recommendation'] != batch[1]['recommendation']
+        assert batch[2]['recommendation'] != batch[3]['recommendation']
+    
+    def test_batch_rejects_non_list_body(self):
+        """Test that the body must be a list."""
+        response = self.client.post(self.batch_url, self.valid_payload, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_confidence_from_tree_spread_and_training_support(self):
+        """Test that confidence uses the calibrated tree spread and drops outside the training range."""
+        from api.ml.predict import get_active_model
+        
+        calibration = get_active_model().calibration
+        far = {**self.valid_payload, 'salary': 90000.00}
+        mixed = {**self.valid_payload, 'salary': 2500.00, 'gym_usage': 4, 'health_plan_tier': 1}
+        
+        response = self.client.post(self.batch_url, [self.valid_payload, mixed, far], format='json')
+        single = self.client.post(reverse('predict'), mixed, format='json')
+        
+        results = response.data['results']
+        assert results[1]['uncertainty'] == single.data['uncertainty']
+        assert results[1]['confidence_level'] == single.data['confidence_level']
+        for item in results[:2]:
+            std = item['uncertainty']['std']
+            expected = 'high' if std <= calibration['std_high'] else 'medium' if std <= calibration['std_medium'] else 'low'
+            assert item['uncertainty']['support_distance'] == 0
+            assert item['confidence_level'] == expected
+            low, high = item['uncertainty']['interval']
+            assert low <= item['satisfaction_score'] <= high
+        assert results[2]['uncertainty']['support_distance'] > 1
+        assert results[2]['confidence_level'] == 'low'
+    
+    def test_explain_attributions_add_up_to_score(self):
+        """Test that ?explain=1 returns feature contributions summing to the score."""
+        from api.ml.predict import FEATURES
+        
+        single = self.client.post(reverse('predict') + '?explain=1', self.valid_payload, format='json')
+        batch = self.client.post(self.batch_url + '?explain=1', [self.valid_payload], format='json')
+        plain = self.client.post(self.batch_url, [self.valid_payload], format='json')
+        
+        assert single.status_code == status.HTTP_201_CREATED
+        attributions = single.data['attributions']
+        assert list(attributions['contributions']) == FEATURES
+        total = attributions['bias'] + sum(attributions['contributions'].values())
+        assert abs(total - single.data['satisfaction_score']) < 0.01
+        
+        assert batch.data['results'][0]['attributions'] == attributions
+        assert batch.data['results'][0]['satisfaction_score'] == single.data['satisfaction_score']
+        assert 'attributions' not in plain.data['results'][0]
+
+
+
+@pytest.mark.django_db
+class TestPredictionMetrics(APITestCase):
+    """Test per-stage latency metrics and the Prometheus endpoint."""
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that bucket counts are cumulative and values on a bound count as <= bound."""
+        from api.metrics import Registry
+        
+        registry = Registry(namespace='test')
+        latency = registry.histogram('latency_seconds', 'Latency.', ('stage',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.labels('model').observe(value)
+        
+        lines = registry.render().splitlines()
+        
+        assert '# TYPE test_latency_seconds histogram' in lines
+        assert 'test_latency_seconds_bucket{stage="model",le="0.1"} 2' in lines
+        assert 'test_latency_seconds_bucket{stage="model",le="1.0"} 3' in lines
+        assert 'test_latency_seconds_bucket{stage="model",le="+Inf"} 4' in lines
+        assert 'test_latency_seconds_count{stage="model"} 4' in lines
+        assert 'test_latency_seconds_sum{stage="model"} 2.65' in lines
+    
+    def test_predict_updates_stage_metrics(self):
+        """Test that /api/predict/ records its stages and /api/metrics/ exposes them."""
+        from api import metrics
+        
+        def count(stage):
+            return sum(metrics.PREDICT_STAGE_SECONDS.labels(stage).snapshot()[0])
+        
+        before = {stage: count(stage) for stage in ('validate', 'predict', 'persist', 'serialize', 'total')}
+        created = metrics.PREDICT_REQUESTS.labels(201).value
+        invalid = metrics.PREDICT_ERRORS.labels('validation').value
+        
+        payload = {
+            'age': 30, 'salary': 5000.00, 'commute_time': 45,
+            'gym_usage': 12, 'meal_voucher': 800.00, 'health_plan_tier': 2
+        }
+        self.client.post(reverse('predict'), payload, format='json')
+        self.client.post(reverse('predict'), {**payload, 'age': 15}, format='json')
+        
+        for stage, value in before.items():
+            expected = value + (2 if stage in ('validate', 'total') else 1)
+            assert count(stage) == expected, stage
+        assert metrics.PREDICT_REQUESTS.labels(201).value == created + 1
+        assert metrics.PREDICT_ERRORS.labels('validation').value == invalid + 1
+        
+        response = self.client.get(reverse('metrics'))
+        body = response.content.decode()
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert f'benefit_predict_requests_total{{status="201"}} {created + 1}' in body
+        assert 'benefit_predict_stage_seconds_bucket{stage="model",le="+Inf"}' in body
+        assert '# TYPE benefit_model_not_loaded_total counter' in body
+
+
+@pytest.mark.django_db
+class TestWhatIfAPI(APITestCase):
+    """Test the what-if sensitivity endpoint."""
+    
+    def setUp(self):
+        """Set up test client."""
+        self.client = APIClient()
+        self.url = reverse('predict-what-if')
+        
+        self.profile = {
+            'age': 30,
+            'salary': 3000.00,
+            'commute_time': 45,
+            'gym_usage': 12,
+            'meal_voucher': 800.00,
+            'health_plan_tier': 2
+        }
+    
+    def test_curves_match_batch_predictions(self):
+        """Test that each curve equals scoring the swept profiles one by one, without saving."""
+        from api.ml.predict import FEATURES, predict_batch
+        
+        initial_count = Prediction.objects.count()
+        response = self.client.post(self.url, {
+            'profile': self.profile,
+            'sweeps': {
+                'gym_usage': {'min': 0, 'max': 30, 'step': 1},
+                'health_plan_tier': {'values': [1, 2, 3]}
+            },
+            'grid': True
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        gym = response.data['curves']['gym_usage']
+        assert gym['values'] == list(range(31))
+        rows = [[{**self.profile, 'gym_usage': v}[f] for f in FEATURES] for v in gym['values']]
+        assert gym['scores'] == [r['score'] for r in predict_batch(rows)]
+        assert response.data['base_score'] == predict_batch([[self.profile[f] for f in FEATURES]])[0]['score']
+        
+        grid = response.data['grid']
+        assert grid['features'] == ['gym_usage', 'health_plan_tier']
+        assert [row[1] for row in grid['scores']] == gym['scores']
+        assert Prediction.objects.count() == initial_count
+    
+    def test_invalid_sweeps(self):
+        """Test unknown features, out-of-range values and oversized sweeps."""
+        response = self.client.post(self.url, {
+            'profile': self.profile,
+            'sweeps': {
+                'bonus': {'values': [1]},
+                'gym_usage': {'values': [10, 45]},
+                'age': {'values': [30.5]}
+            }
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data['sweeps']) == {'bonus', 'gym_usage', 'age'}
+        
+        response = self.client.post(self.url, {
+            'profile': self.profile,
+            'sweeps': {'salary': {'min': 1320, 'max': 1e9, 'step': 0.01}}
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_non_finite_and_huge_sweeps(self):
+        """Test that inf/nan values and ranges too large for int() are client errors."""
+        sweeps = [
+            {'min': 0, 'max': 1e308, 'step': 1e-308},
+            {'min': 0, 'max': 'inf', 'step': 1},
+            {'min': 'nan', 'max': 30, 'step': 1},
+            {'min': 0, 'max': 30, 'step': 'nan'},
+            {'values': [1, 'nan']},
+            {'values': ['-inf']},
+        ]
+        for sweep in sweeps:
+            response = self.client.post(self.url, {
+                'profile': self.profile,
+                'sweeps': {'gym_usage': sweep}
+            }, format='json')
+            
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, sweep
+            assert 'gym_usage' in response.data['sweeps']
+
+
+@pytest.mark.django_db
+class TestPackageOptimizerAPI(APITestCase):
+    """Test the budget-constrained package optimizer endpoint."""
+    
+    def setUp(self):
+        """Set up test client."""
+        self.client = APIClient()
+        self.url = reverse('predict-optimize')
+        
+        self.employees = [
+            {'age': 30, 'salary': 3000.00, 'commute_time': 45, 'gym_usage': 2,
+             'meal_voucher': 300.00, 'health_plan_tier': 1},
+            {'age': 45, 'salary': 2200.00, 'commute_time': 120, 'gym_usage': 0,
+             'meal_voucher': 0.00, 'health_plan_tier': 1},
+        ]
+    
+    def test_frontier_is_pareto_optimal_within_budget(self):
+        """Test that the frontier only keeps non-dominated packages and the best one is the true optimum."""
+        from api.ml.optimizer import candidate_packages, package_costs
+        from api.ml.predict import FEATURES, predict_batch
+        
+        initial_count = Prediction.objects.count()
+        response = self.client.post(self.url, {'employees': self.employees, 'budget': 900}, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['employees']) == 2
+        
+        packages = candidate_packages()
+        costs = package_costs(packages)
+        packages = packages[costs <= 900]
+        for employee, result in zip(self.employees, response.data['employees']):
+            frontier = result['frontier']
+            assert all(a['cost'] < b['cost'] and a['score'] < b['score'] for a, b in zip(frontier, frontier[1:]))
+            assert result['best'] == frontier[-1] and result['best']['cost'] <= 900
+            
+            rows = [[{**employee, **dict(zip(('meal_voucher', 'gym_usage', 'health_plan_tier'), p))}[f]
+                     for f in FEATURES] for p in packages]
+            assert result['best']['score'] == max(r['score'] for r in predict_batch(rows))
+        assert response.data['cohort']['frontier']
+        assert Prediction.objects.count() == initial_count
+    
+    def test_cohort_split_across_workers(self):
+        """Test that splitting a cohort across processes gives the same result."""
+        from api.ml.optimizer import optimize_packages
+        from api.ml.predict import FEATURES
+        
+        X = [[employee[f] for f in FEATURES] for employee in self.employees * 2]
+        
+        assert optimize_packages(X, budget=900, workers=2, chunk_rows=2) == optimize_packages(X, budget=900)
+    
+    def test_budget_below_cheapest_package(self):
+        """Test that an unreachable budget is a client error."""
+        response = self.client.post(self.url, {'employees': self.employees, 'budget': 10}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.data
+    
+    def test_costs_validation_and_partial_tier_override(self):
+        """Test that non-finite or negative costs are rejected and omitted plan tiers keep the defaults."""
+        import numpy as np
+        from api.ml.optimizer import DEFAULT_COSTS, candidate_packages, package_costs
+        
+        for costs in [{'meal_voucher': 'nan'}, {'gym_usage': 'inf'}, {'health_plan_tier': {'2': 'nan'}},
+                      {'meal_voucher': -1}, {'health_plan_tier': {'3': -5}}]:
+            response = self.client.post(self.url, {'employees': self.employees, 'costs': costs}, format='json')
+            
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, costs
+            assert 'costs' in response.data
+        
+        packages = candidate_packages()
+        default = package_costs(packages)
+        overridden = package_costs(packages, {'health_plan_tier': {'1': 100}})
+        tier = packages[:, 2]
+        assert np.array_equal(overridden[tier != 1], default[tier != 1])
+        assert np.allclose(overridden[tier == 1], default[tier == 1] - DEFAULT_COSTS['health_plan_tier'][1] + 100)
+        
+        response = self.client.post(self.url, {
+            'employees': self.employees, 'costs': {'health_plan_tier': {'1': 100}}
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+    
+    def test_serializers_do_not_load_the_model(self):
+        """Test that importing the serializers does not import the predictor (and load model.bin)."""
+        import os
+        import subprocess
+        import sys
+        
+        code = (
+            "import sys, django; django.setup(); import api.serializers; "
+            "print('api.ml.predict' in sys.modules)"
+        )
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=backend_dir, capture_output=True, text=True, check=True
+        ).stdout.split()
+        
+        assert output[-1:] == ['False']
+
+
+class TestDriftMonitor(APITestCase):
+    """Test the streaming input-drift monitor and its endpoint."""
+    
+    def setUp(self):
+        """Set up test client and an empty in-memory monitor."""
+        from api.monitoring import get_drift_monitor
+        
+        self.client = APIClient()
+        self.url = reverse('drift')
+        get_drift_monitor().clear()
+        
+        self.valid_payload = {
+            'age': 30,
+            'salary': 5000.00,
+            'commute_time': 45,
+            'gym_usage': 12,
+            'meal_voucher': 800.00,
+            'health_plan_tier': 2
+        }
+    
+    def test_psi_flags_shifted_distribution(self):
+        """Test that training-like inputs are stable and shifted ones are flagged."""
+        import numpy as np
+        from api.ml import drift
+        
+        rng = np.random.default_rng(0)
+        reference = drift.fit_reference(rng.uniform(0, 100, (5000, 2)), ['a', 'b'])
+        same, shifted = drift.StreamingHistograms(reference), drift.StreamingHistograms(reference)
+        same.add(rng.uniform(0, 100, (2000, 2)))
+        sample = np.column_stack([rng.uniform(0, 100, 500), rng.uniform(60, 160, 500)])
+        for row in sample:
+            shifted.add(row)
+        
+        report = drift.compare(reference, same.drain())
+        assert report['a']['status'] == report['b']['status'] == 'stable'
+        
+        report = drift.compare(reference, shifted.drain())
+        assert report['a']['status'] == 'stable'
+        assert report['b']['status'] == 'significant' and report['b']['ks'] > 0.5
+        assert report['b']['out_of_range'] == int((sample[:, 1] >= reference['features']['b']['edges'][-1]).sum())
+    
+    def test_endpoint_counts_served_inputs_without_reading_predictions(self):
+        """Test that served inputs reach the drift report without reading predictions or writing on GET."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from api.models import FeatureHistogram
+        from api.monitoring import get_drift_monitor
+        
+        rich = {**self.valid_payload, 'salary': 90000.00}
+        self.client.post(reverse('predict'), self.valid_payload, format='json')
+        self.client.post(reverse('predict-batch'), [rich] * 20, format='json')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert not any(Prediction._meta.db_table in query['sql'] for query in queries.captured_queries)
+        assert all(query['sql'].startswith('SELECT') for query in queries.captured_queries)
+        assert response.data['observations'] == 21
+        salary = response.data['features']['salary']
+        assert salary['status'] == 'significant' and salary['out_of_range'] == 20
+        assert response.data['drift_detected']
+        
+        # O GET lê as contagens em memória sem gravá-las; após o flush não há dupla contagem
+        assert not FeatureHistogram.objects.exists()
+        get_drift_monitor().flush()
+        assert FeatureHistogram.objects.exists()
+        assert self.client.get(self.url).data['observations'] == 21
+        assert self.client.get(self.url, {'days': 1}).data['observations'] == 21
+        assert self.client.get(self.url, {'days': 0}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestFlatForest:
+    """Test the flat-array inference engine."""
+    
+    def test_matches_sklearn_predictions(self):
+        """Test that the flat engine is numerically identical to sklearn."""
+        import joblib
+        import numpy as np
+        import pandas as pd
+        from api.ml import predict
+        from api.ml.forest import FlatForest
+        
+        # n_jobs=1 garante a mesma ordem de acumulação das árvores
+        reference = joblib.load(predict.MODEL_PATH).set_params(n_jobs=1)
+        forest = FlatForest.from_sklearn(reference)
+        saved = FlatForest.load(predict.FOREST_PATH, mmap=True)
+        
+        rng = np.random.default_rng(0)
+        X = np.column_stack([
+            rng.integers(18, 101, 500),
+            rng.uniform(1320, 20000, 500),
+            rng.integers(0, 301, 500),
+            rng.integers(0, 31, 500),
+            rng.uniform(0, 2000, 500),
+            rng.integers(1, 4, 500),
+        ]).astype(np.float64)
+        
+        expected = reference.predict(pd.DataFrame(X, columns=predict.FEATURES))
+        np.testing.assert_array_equal(forest.predict(X), expected)
+        np.testing.assert_array_equal(forest.predict(X[:1]), expected[:1])
+        np.testing.assert_array_equal(saved.predict(X), expected)
+    
+    def test_predict_unique_matches_predict(self):
+        """Test that scoring one row per decision region gives identical predictions."""
+        import numpy as np
+        from api.ml.forest import FlatForest
+        from api.ml.predict import FOREST_PATH
+        
+        forest = FlatForest.load(FOREST_PATH, mmap=False)
+        X = np.tile([30, 3000, 45, 12, 800, 2], (3000, 1)).astype(np.float64)
+        X[:1000, 3] = np.arange(1000) % 31
+        X[1000:2000, 4] = np.linspace(0, 1500, 1000)
+        X[2000:, 1] = np.linspace(1320, 20000, 1000)
+        
+        np.testing.assert_array_equal(forest.predict_unique(X), forest.predict(X))
+        assert len(np.unique(forest.regions(X[:1000]), axis=0)) <= 31
+    
+    def test_predict_grid_matches_predict(self):
+        """Test that row x candidate scoring equals predicting the assembled rows."""
+        import numpy as np
+        from api.ml.forest import FlatForest
+        from api.ml.predict import FOREST_PATH
+        
+        forest = FlatForest.load(FOREST_PATH, mmap=False)
+        rng = np.random.default_rng(1)
+        X = np.column_stack([
+            rng.integers(18, 66, 200), rng.uniform(1320, 15000, 200), rng.integers(0, 181, 200),
+            rng.integers(0, 31, 200), rng.uniform(0, 1500, 200), rng.integers(1, 4, 200),
+        ]).astype(np.float64)
+        candidates = np.array([[0, 0, 1], [500, 10, 2], [1500, 30, 3], [750.5, 3, 1]], dtype=np.float64)
+        columns = [4, 3, 5]
+        
+        rows = np.repeat(X, len(candidates), axis=0)
+        rows[:, columns] = np.tile(candidates, (len(X), 1))
+        expected = forest.predict(rows).reshape(len(X), len(candidates))
+        
+        np.testing.assert_array_equal(forest.predict_grid(X, candidates, columns), expected)
+    
+    def test_predict_with_std_matches_tree_spread(self):
+        """Test that the spread comes with the same mean as predict and equals sklearn's per-tree std."""
+        import joblib
+        import numpy as np
+        from api.ml import predict
+        from api.ml.forest import FlatForest
+        
+        model = joblib.load(predict.MODEL_PATH)
+        forest = FlatForest.load(predict.FOREST_PATH, mmap=False)
+        rng = np.random.default_rng(2)
+        X = np.column_stack([
+            rng.integers(18, 66, 300), rng.uniform(1320, 15000, 300), rng.integers(0, 181, 300),
+            rng.integers(0, 31, 300), rng.uniform(0, 1500, 300), rng.integers(1, 4, 300),
+        ]).astype(np.float64)
+        
+        predictions, std = forest.predict_with_std(X)
+        per_tree = np.stack([tree.predict(X.astype(np.float32)) for tree in model.estimators_])
+        
+        np.testing.assert_array_equal(predictions, forest.predict(X))
+        np.testing.assert_allclose(std, per_tree.std(axis=0), atol=1e-6)
+        np.testing.assert_array_equal(forest.explain(X, return_std=True)[3], std)
+    
+    def test_explain_matches_decision_paths(self):
+        """Test that contributions equal the value changes along each row's path in every tree."""
+        import numpy as np
+        from api.ml.forest import FlatForest
+        from api.ml.predict import FOREST_PATH
+        
+        forest = FlatForest.load(FOREST_PATH, mmap=False)
+        X = np.array([[30, 5000, 45, 12, 800, 2], [58, 1320, 170, 0, 0, 1]], dtype=np.float64)
+        predictions, bias, contributions = forest.explain(X)
+        
+        np.testing.assert_array_equal(predictions, forest.predict(X))
+        np.testing.assert_allclose(bias + contributions.sum(axis=1), predictions, atol=1e-9)
+        
+        expected = np.zeros_like(contributions)
+        for i, row in enumerate(X.astype(np.float32)):
+            for node in forest.roots:
+                while np.isfinite(forest.threshold[node]):
+                    feature = forest.feature[node]
+                    child = forest.children[node, int(row[feature] > forest.threshold[node])]
+                    expected[i, feature] += float(forest.value[child]) - float(forest.value[node])
+                    node = child
+        np.testing.assert_allclose(contributions, expected / forest.n_trees, atol=1e-9)
+    
+    def test_save_and_load_memory_mapped(self, tmp_path):
+        """Test that a saved forest loads back as read-only memory maps."""
+        import mmap
+        import numpy as np
+        from api.ml import predict
+        from api.ml.forest import FlatForest
+        
+        forest = FlatForest.load(predict.FOREST_PATH, mmap=False)
+        path = tmp_path / 'model.bin'
+        forest.save(path)
+        loaded = FlatForest.load(path, mmap=True)
+        
+        base = loaded.threshold
+        while base is not None and not isinstance(base, mmap.mmap):
+            base = getattr(base, 'base', None)
+        assert isinstance(base, mmap.mmap)
+        assert not loaded.threshold.flags.writeable
+        np.testing.assert_array_equal(loaded.children, forest.children)
+        assert loaded.metadata == forest.metadata
+    
+    def test_compacted_forest_reaches_same_leaves(self, tmp_path):
+        """Test that float32 thresholds rounded down keep every comparison exact."""
+        import numpy as np
+        from api.ml.forest import FlatForest
+        from api.ml.predict import FOREST_PATH
+        
+        forest = FlatForest.load(FOREST_PATH, mmap=False)
+        compact = forest.compacted()
+        
+        # Inputs exatamente nos thresholds são o caso crítico do arredondamento
+        rng = np.random.default_rng(0)
+        X = rng.uniform(0, 1, (500, 6)) * [60, 15000, 180, 30, 1500, 3]
+        node = forest.roots[0]
+        X[:, forest.feature[node]] = forest.threshold[node].astype(np.float32)
+        
+        assert compact.threshold.dtype == np.float32
+        assert np.array_equal(forest.apply(X), compact.apply(X))
+        assert np.allclose(forest.predict(X), compact.predict(X), atol=1e-4)
+        
+        path = str(tmp_path / 'model.compact.bin')
+        compact.save(path)
+        loaded = FlatForest.load(path)
+        assert loaded.compact_indices
+        assert loaded.nbytes < forest.nbytes
+        assert np.array_equal(loaded.predict(X), compact.predict(X))
+    
+    def test_compact_file_arrays_stay_memory_mapped(self, tmp_path):
+        """Test that every array of model.bin and model.compact.bin is a read-only view of the shared mapping."""
+        import mmap
+        from api.ml.forest import _ARRAYS, FlatForest
+        from api.ml.predict import FOREST_PATH
+        
+        forest = FlatForest.load(FOREST_PATH, mmap=False)
+        path = str(tmp_path / 'model.compact.bin')
+        forest.compacted().save(path)
+        
+        for loaded in (FlatForest.load(FOREST_PATH), FlatForest.load(path)):
+            for name in _ARRAYS:
+                base = getattr(loaded, name)
+                assert not base.flags.writeable, name
+                while base is not None and not isinstance(base, mmap.mmap):
+                    base = getattr(base, 'base', None)
+                # Sem cópia privada por processo (ex: conversão de dtype dos índices)
+                assert isinstance(base, mmap.mmap), name
+        assert loaded.children.dtype.itemsize < 8
+    
+    def test_corrupted_file_is_rejected(self, tmp_path):
+        """Test that checksum and header validation catch damaged artifacts."""
+        import json
+        from api.ml import predict
+        from api.ml.forest import FlatForest, MAGIC
+        
+        data = bytearray(open(predict.FOREST_PATH, 'rb').read())
+        header_end = len(MAGIC) + 8 + int.from_bytes(data[len(MAGIC):len(MAGIC) + 8], 'little')
+        header = json.loads(data[len(MAGIC) + 8:header_end])
+        
+        corrupted = bytearray(data)
+        corrupted[header['arrays']['threshold']['offset'] + 3] ^= 0xFF
+        path = tmp_path / 'corrupted.bin'
+        path.write_bytes(corrupted)
+        with pytest.raises(ValueError, match='Checksum'):
+            FlatForest.load(path)
+        
+        path.write_bytes(data[:header_end + 100])
+        with pytest.raises(ValueError):
+            FlatForest.load(path)
+    
+    def test_serving_does_not_import_sklearn(self):
+        """Test that loading and scoring model.bin never imports sklearn or unpickles."""
+        import os
+        import subprocess
+        import sys
+        
+        code = (
+            "import sys; from api.ml import predict; "
+            "predict.predict_batch([[30, 5000, 45, 12, 800, 2]]); "
+            "print(predict.get_active_model().engine, "
+            "any(m in sys.modules for m in ('sklearn', 'joblib', 'pandas')))"
+        )
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=backend_dir, capture_output=True, text=True, check=True
+        ).stdout.split()
+        
+        assert output[-2:] == ['flat', 'False']
+
+
+class TestPredictionCache:
+    """Test the LRU cache in front of predict_satisfaction."""
+    
+    def test_repeated_input_hits_cache(self):
+        """Test that equivalent inputs share one cache entry."""
+        from api.ml import predict
+        
+        predict.cache.clear()
+        before = predict.get_cache_stats()
+        
+        first = predict.predict_satisfaction(30, 5000.0, 45, 12, 800.0, 2)
+        second = predict.predict_satisfaction(30, '5000.001', 45, 12, 800, 2)
+        
+        stats = predict.get_cache_stats()
+        assert first == second
+        assert stats['misses'] == before['misses'] + 1
+        assert stats['hits'] == before['hits'] + 1
+    
+    def test_cached_results_are_isolated_from_callers(self):
+        """Test that mutating nested values of a returned result does not change later hits."""
+        from api.ml.predict import PredictionCache
+        
+        model = object()
+        lru = PredictionCache(maxsize=2)
+        lru.get('a', model)
+        stored = {'score': 1, 'uncertainty': {'interval': [0, 2]}, 'attributions': {'contributions': {'age': 1}}}
+        lru.put('a', stored, model)
+        stored['uncertainty']['interval'][0] = -1
+        
+        first = lru.get('a', model)
+        first['uncertainty']['interval'][1] = 99
+        first['attributions']['contributions']['age'] = 99
+        
+        assert lru.get('a', model) == {
+            'score': 1, 'uncertainty': {'interval': [0, 2]}, 'attributions': {'contributions': {'age': 1}}
+        }
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        from api.ml.predict import PredictionCache
+        
+        model = object()
+        lru = PredictionCache(maxsize=2)
+        lru.get('a', model)
+        lru.put('a', {'score': 1}, model)
+        lru.put('b', {'score': 2}, model)
+        lru.get('a', model)
+        lru.put('c', {'score': 3}, model)
+        
+        assert lru.get('b', model) is None
+        assert lru.get('a', model) == {'score': 1}
+        assert lru.stats()['evictions'] == 1
+    
+    def test_model_change_invalidates_cache(self):
+        """Test that entries from a previous model are discarded."""
+        from api.ml.predict import PredictionCache
+        
+        lru = PredictionCache(maxsize=10)
+        old_model, new_model = object(), object()
+        lru.get('a', old_model)
+        lru.put('a', {'score': 1}, old_model)
+        
+        assert lru.get('a', new_model) is None
+        assert lru.stats()['size'] == 0
+
+
+class TestModelRegistry:
+    """Test versioned model registry and hot-swap."""
+    
+    @pytest.fixture
+    def registry_dir(self, tmp_path, monkeypatch):
+        """Use an empty temporary registry and restore the served model afterwards."""
+        from api.ml import predict, registry
+        
+        monkeypatch.setattr(registry, 'REGISTRY_DIR', str(tmp_path))
+        monkeypatch.setattr(predict, '_active', predict.get_active_model())
+        return tmp_path
+    
+    def test_register_and_activate_versions(self, registry_dir):
+        """Test that versions are numbered and ACTIVE follows activation."""
+        import joblib
+        from api.ml import predict, registry
+        
+        model = joblib.load(predict.MODEL_PATH)
+        v1 = registry.register_model(model, metrics={'r2': 0.87})
+        v2 = registry.register_model(model, metrics={'r2': 0.88}, activate=False)
+        
+        assert registry.list_versions() == ['v0001', 'v0002']
+        assert registry.get_active_version() == v1
+        assert registry.get_version_info(v2)['metrics'] == {'r2': 0.88}
+        
+        registry.activate_version(v2)
+        assert registry.get_active_version() == v2
+        
+        with pytest.raises(ValueError):
+            registry.activate_version('v9999')
+    
+    def test_failed_registration_leaves_no_version(self, registry_dir):
+        """Test that a version only appears once all of its files are written."""
+        import os
+        from unittest import mock
+        import joblib
+        from api.ml import predict, registry
+        
+        model = joblib.load(predict.MODEL_PATH)
+        seen = []
+        
+        def failing_dump(value, path):
+            # model.bin já existe no diretório temporário, mas a versão não está listada
+            seen.append(registry.list_versions())
+            raise OSError('disco cheio')
+        
+        with mock.patch.object(joblib, 'dump', failing_dump), pytest.raises(OSError):
+            registry.register_model(model)
+        
+        assert seen == [[]]
+        assert os.listdir(registry_dir) == []
+        
+        assert registry.register_model(model, activate=False) == 'v0001'
+        assert sorted(os.listdir(registry_dir / 'v0001')) == ['metrics.json', 'model.bin', 'model.pkl']
+    
+    def test_hot_swap_keeps_in_flight_snapshot(self, registry_dir):
+        """Test that reload swaps the model without touching in-flight snapshots."""
+        import joblib
+        from api.ml import predict, registry
+        
+        in_flight = predict.get_active_model()
+        registry.register_model(joblib.load(predict.MODEL_PATH), metrics={'r2': 0.87})
+        
+        assert predict.reload_model() is True
+        assert predict.reload_model() is False
+        assert predict.get_model_info()['version'] == 'v0001'
+        assert predict.get_model_info()['metrics'] == {'r2': 0.87}
+        assert in_flight is not predict.get_active_model()
+        assert in_flight.predict([[30, 5000, 45, 12, 800, 2]])[0] == \
+            predict.get_active_model().predict([[30, 5000, 45, 12, 800, 2]])[0]
+
+
+class TestMicroBatcher:
+    """Test micro-batching of concurrent single-row predictions."""
+    
+    def test_concurrent_rows_share_batches(self):
+        """Test that concurrent callers are batched and get their own results."""
+        import threading
+        import time
+        import numpy as np
+        from api.ml.batching import MicroBatcher
+        
+        class SlowModel:
+            calls = []
+            
+            def predict_with_std(self, X):
+                self.calls.append(len(X))
+                time.sleep(0.05)
+                return np.asarray(X)[:, 0] * 2, np.asarray(X)[:, 5]
+        
+        model = SlowModel()
+        batcher = MicroBatcher(max_batch_size=64, max_wait_ms=5)
+        results = {}
+        
+        def call(i):
+            results[i] = batcher.submit(model, [i, 0, 0, 0, 0, 1])
+        
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results == {i: (i * 2, 1) for i in range(20)}
+        stats = batcher.stats()
+        assert stats['rows'] == 20
+        assert stats['batches'] == len(model.calls) < 20
+        assert sum(stats['batch_size_histogram'].values()) == stats['batches']
+        assert sum(stats['queue_delay_ms']['histogram'].values()) == 20
+
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+    """Test on-demand request profiling."""
+    
+    @pytest.fixture
+    def profiling(self, settings, tmp_path):
+        settings.API_PROFILING = True
+        settings.API_PROFILING_DIR = str(tmp_path)
+        settings.API_PROFILING_TOKEN = 'secret'
+        settings.API_PROFILING_SAMPLE_RATE = 0
+        return tmp_path
+    
+    def test_header_triggers_profile(self, client, profiling):
+        """Test that only requests with the right header value are profiled."""
+        from api.profiling import list_profiles
+        
+        payload = {
+            'age': 30, 'salary': 5000.00, 'commute_time': 45,
+            'gym_usage': 12, 'meal_voucher': 800.00, 'health_plan_tier': 2
+        }
+        plain = client.post(reverse('predict'), payload, content_type='application/json')
+        wrong = client.post(reverse('predict'), payload, content_type='application/json', HTTP_X_PROFILE='nope')
+        profiled = client.post(reverse('predict'), payload, content_type='application/json', HTTP_X_PROFILE='secret')
+        
+        assert 'X-Profile-File' not in plain and 'X-Profile-File' not in wrong
+        profiles = list_profiles(str(profiling))
+        assert [p['name'] for p in profiles] == [profiled['X-Profile-File']]
+        assert profiles[0]['method'] == 'POST'
+        assert profiles[0]['endpoint'] == 'api.predict'
+        assert profiles[0]['status'] == 201
+    
+    def test_profiles_command_lists_and_summarizes(self, client, profiling):
+        """Test that the profiles command lists captures and prints the hot functions."""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        client.get(reverse('health-check'), HTTP_X_PROFILE='secret')
+        
+        listing = StringIO()
+        call_command('profiles', stdout=listing)
+        summary = StringIO()
+        call_command('profiles', 'latest', '--limit', '50', stdout=summary)
+        
+        assert 'api.health' in listing.getvalue()
+        assert 'health_check' in summary.getvalue()
+    
+    def test_disabled_middleware_is_removed(self, settings):
+        """Test that the middleware drops out of the chain when profiling is off."""
+        from django.core.exceptions import MiddlewareNotUsed
+        from api.profiling import ProfilingMiddleware
+        
+        settings.API_PROFILING = False
+        
+        with pytest.raises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
+
+@pytest.mark.django_db
+class TestPredictionAsyncAPI(APITestCase):
+    """Test async prediction endpoint."""
+    
+    def setUp(self):
+        """Set up test client."""
+        self.client = APIClient()
+        self.async_url = reverse('predict-async')
+        
+        self.valid_payload = {
+            'age': 30,
+            'salary': 5000.00,
+            'commute_time': 45,
+            'gym_usage': 12,
+            'meal_voucher': 800.00,
+            'health_plan_tier': 2
+        }
+    
+    def test_async_matches_sync_contract(self):
+        """Test that the async endpoint returns the same response as /predict/."""
+        sync_response = self.client.post(reverse('predict'), self.valid_payload, format='json')
+        response = self.client.post(self.async_url, self.valid_payload, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert set(data) == set(sync_response.data)
+        assert data['satisfaction_score'] == sync_response.data['satisfaction_score']
+        assert Prediction.objects.filter(id=data['prediction_id']).exists()
+    
+    def test_async_invalid_input(self):
+        """Test that validation errors are returned as 400."""
+        payload = self.valid_payload.copy()
+        payload['age'] = 15
+        
+        response = self.client.post(self.async_url, payload, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'age' in response.json()
+
+
+@pytest.mark.django_db
+class TestWriteBehind(APITestCase):
+    """Test write-behind persistence of predictions."""
+    
+    def make_prediction(self, prediction_id):
+        return Prediction(
+            id=prediction_id, age=30, salary=5000, commute_time=45, gym_usage=12,
+            meal_voucher=800, health_plan_tier=2, satisfaction_score=70
+        )
+    
+    def test_flush_writes_rows_with_reserved_ids(self):
+        """Test that buffered rows are written with their pre-allocated ids."""
+        from api.persistence import PredictionWriteBuffer
+        
+        buffer = PredictionWriteBuffer(max_size=10, flush_size=2)
+        for prediction_id in (900001, 900002, 900003):
+            buffer.enqueue(self.make_prediction(prediction_id))
+        
+        assert len(buffer) == 3
+        assert buffer.flush() == 3
+        assert len(buffer) == 0
+        assert Prediction.objects.filter(id__in=[900001, 900002, 900003]).count() == 3
+    
+    def test_full_buffer_applies_backpressure(self):
+        """Test that a full buffer rejects new rows instead of dropping them."""
+        from api.persistence import BufferFull, PredictionWriteBuffer
+        
+        buffer = PredictionWriteBuffer(max_size=1)
+        buffer.enqueue(self.make_prediction(900001))
+        
+        with pytest.raises(BufferFull):
+            buffer.enqueue(self.make_prediction(900002), timeout=0.01)
+        
+        buffer.stop()
+        assert Prediction.objects.filter(id=900001).exists()
+    
+    def test_failing_row_goes_to_dead_letter(self):
+        """Test that a row that always fails stops being retried and doesn't block the others."""
+        import json
+        from api.persistence import PredictionWriteBuffer
+        
+        self.make_prediction(900002).save()
+        buffer = PredictionWriteBuffer(max_size=10, flush_size=10, max_attempts=2)
+        for prediction_id in (900001, 900002, 900003):
+            buffer.enqueue(self.make_prediction(prediction_id))
+        
+        # id 900002 já existe: o lote inteiro falha até o limite de tentativas
+        with pytest.raises(Exception):
+            buffer.flush()
+        assert len(buffer) == 3
+        
+        with self.assertLogs('api.persistence.dead_letter', level='ERROR') as logs:
+            assert buffer.flush() == 2
+        
+        assert len(buffer) == 0 and buffer.dead_lettered == 1
+        assert json.loads(logs.records[0].getMessage())['prediction']['id'] == 900002
+        assert Prediction.objects.filter(id__in=[900001, 900003]).count() == 2
+        
+        buffer.enqueue(self.make_prediction(900004))
+        assert buffer.flush() == 1
+    
+    def test_predict_view_in_write_behind_mode(self):
+        """Test that the returned prediction_id is persisted after a flush."""
+        from django.test import override_settings
+        from api.persistence import get_write_buffer
+        
+        payload = {
+            'age': 30, 'salary': 5000.00, 'commute_time': 45,
+            'gym_usage': 12, 'meal_voucher': 800.00, 'health_plan_tier': 2
+        }
+        with override_settings(PREDICTION_WRITE_BEHIND=True):
+            response = self.client.post(reverse('predict'), payload, format='json')
+        get_write_buffer().flush()
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Prediction.objects.filter(id=response.data['prediction_id']).exists()
+
+
 @pytest.mark.django_db
 class TestPredictionViewSet(APITestCase):
     """Test prediction history endpoints."""
@@ -217,6 +1255,151 @@ class TestPredictionViewSet(APITestCase):
         assert 'low' in response.data['distribution']
         assert 'medium' in response.data['distribution']
         assert 'high' in response.data['distribution']
+    
+    def test_stats_reads_rollup_in_one_query(self):
+        """Test that stats doesn't scan the Prediction table."""
+        url = reverse('prediction-stats')
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        
+        assert response.data['total_predictions'] == 2
+        assert response.data['average_score'] == round((75.5 + 85.2) / 2, 2)
+        assert response.data['distribution'] == {'low': 0, 'medium': 0, 'high': 2}
+    
+    def test_rollup_tracks_bulk_create_and_delete(self):
+        """Test that bulk inserts and deletes keep the rollup in sync."""
+        from api.models import PredictionStats
+        
+        Prediction.objects.bulk_create([
+            Prediction(age=30, salary=5000, commute_time=45, gym_usage=12,
+                       meal_voucher=800, health_plan_tier=2, satisfaction_score=score)
+            for score in (10, 60, 90)
+        ])
+        Prediction.objects.filter(satisfaction_score=85.2).delete()
+        
+        totals = PredictionStats.snapshot()
+        assert totals['total'] == 4
+        assert totals['low'] == 1
+        assert totals['medium'] == 1
+        assert totals['high'] == 2
+        assert totals['score_sum'] == pytest.approx(75.5 + 10 + 60 + 90)
+    
+    def test_rebuild_stats_command(self):
+        """Test that the rebuild command detects and fixes a drifted rollup."""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from api.models import PredictionStats
+        
+        call_command('rebuild_prediction_stats', '--check')
+        
+        PredictionStats.objects.update(total=999)
+        with pytest.raises(CommandError):
+            call_command('rebuild_prediction_stats', '--check')
+        
+        call_command('rebuild_prediction_stats')
+        call_command('rebuild_prediction_stats', '--check')
+        assert PredictionStats.snapshot()['total'] == 2
+    
+    def test_cursor_pagination_walks_all_rows(self):
+        """Test keyset pagination returns every row once, newest first."""
+        from django.utils import timezone
+        
+        # Mesmo created_at em várias linhas: o desempate é pelo id
+        created_at = timezone.now()
+        Prediction.objects.bulk_create([
+            Prediction(age=30, salary=5000, commute_time=45, gym_usage=12, meal_voucher=800,
+                       health_plan_tier=1, satisfaction_score=50, created_at=created_at)
+            for _ in range(5)
+        ])
+        Prediction.objects.update(created_at=created_at)
+        
+        url = reverse('prediction-list') + '?pagination=cursor&page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert 'count' not in response.data
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        
+        assert seen == sorted(Prediction.objects.values_list('id', flat=True), reverse=True)
+    
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor returns 404."""
+        url = reverse('prediction-list')
+        response = self.client.get(url, {'pagination': 'cursor', 'cursor': 'nao-e-cursor'})
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_list_filters(self):
+        """Test score range and health plan filters."""
+        url = reverse('prediction-list')
+        
+        response = self.client.get(url, {'min_score': 80})
+        assert [float(p['satisfaction_score']) for p in response.data['results']] == [85.2]
+        
+        response = self.client.get(url, {'max_score': 80, 'health_plan_tier': 2})
+        assert [p['health_plan_tier'] for p in response.data['results']] == [2]
+        
+        response = self.client.get(url, {'min_score': 'abc'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestPredictionExport(APITestCase):
+    """Test streaming export of prediction history."""
+    
+    def setUp(self):
+        """Create test predictions."""
+        self.predictions = [
+            Prediction.objects.create(
+                age=30 + i, salary=5000, commute_time=45, gym_usage=12,
+                meal_voucher=800, health_plan_tier=2, satisfaction_score=70 + i
+            )
+            for i in range(3)
+        ]
+        self.url = reverse('prediction-export')
+    
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+    
+    def test_export_csv(self):
+        """Test CSV export of the whole table ordered by id."""
+        import csv
+        
+        response = self.client.get(self.url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'text/csv'
+        rows = list(csv.DictReader(self.read(response).splitlines()))
+        assert [int(row['id']) for row in rows] == [p.id for p in self.predictions]
+        assert rows[0]['salary'] == '5000.00'
+    
+    def test_export_ndjson_resumes_after_id(self):
+        """Test NDJSON export resuming from the last exported id."""
+        import json
+        
+        response = self.client.get(self.url, {'output': 'ndjson', 'after_id': self.predictions[0].id})
+        
+        lines = [json.loads(line) for line in self.read(response).splitlines()]
+        assert [line['id'] for line in lines] == [p.id for p in self.predictions[1:]]
+        assert lines[0]['satisfaction_score'] == 71
+    
+    def test_export_created_at_range(self):
+        """Test filtering the export by created_at range."""
+        first = self.predictions[0]
+        Prediction.objects.filter(id=first.id).update(created_at='2020-01-01T00:00:00Z')
+        
+        response = self.client.get(self.url, {'output': 'ndjson', 'until': '2021-01-01T00:00:00Z'})
+        
+        assert self.read(response).count('\n') == 1
+    
+    def test_export_invalid_params(self):
+        """Test that invalid parameters return 400."""
+        assert self.client.get(self.url, {'output': 'xml'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert self.client.get(self.url, {'since': 'ontem'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert self.client.get(self.url, {'after_id': 'x'}).status_code == status.HTTP_400_BAD_REQUEST
 
 
 @pytest.mark.django_db
@@ -314,4 +1497,280 @@ class TestEmployeeProfileViewSet(APITestCase):
             format='json'
         )
         
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
\ No newline at end of file
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestScoreEmployeesCommand:
+    """Test offline scoring of employee files."""
+    
+    def write_input(self, path):
+        rows = [
+            [1, 30, 5000, 45, 12, 800, 2],
+            [2, 25, 2500, 100, 0, 200, 1],
+            [3, 40, 'n/a', 30, 5, 500, 3],
+            [4, 55, 9000, 20, 18, 1100, 3],
+        ]
+        import pandas as pd
+        from api.ml.predict import FEATURES
+        pd.DataFrame(rows, columns=['employee_id'] + FEATURES).to_csv(path, index=False)
+    
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_scores_match_predict_batch(self, tmp_path, workers):
+        """Test that chunked scoring matches predict_batch row by row."""
+        import io
+        import pandas as pd
+        from django.core.management import call_command
+        from api.ml.predict import FEATURES, predict_batch
+        
+        source, output = tmp_path / 'in.csv', tmp_path / 'out.csv'
+        self.write_input(source)
+        
+        call_command(
+            'score_employees', str(source), output=str(output), workers=workers,
+            chunk_size=2, id_column='employee_id', stdout=io.StringIO()
+        )
+        
+        scored = pd.read_csv(output)
+        # Linha com salary inválido é ignorada
+        assert scored['employee_id'].tolist() == [1, 2, 4]
+        expected = predict_batch(scored[FEATURES].to_numpy(dtype=float))
+        assert scored['satisfaction_score'].tolist() == [r['score'] for r in expected]
+        assert scored['recommendation'].tolist() == [r['recommendation'] for r in expected]
+    
+    def test_save_creates_predictions(self, tmp_path):
+        """Test that --save persists one Prediction per scored row."""
+        import io
+        from django.core.management import call_command
+        
+        source = tmp_path / 'in.csv'
+        self.write_input(source)
+        
+        call_command(
+            'score_employees', str(source), output=str(tmp_path / 'out.csv'),
+            workers=1, save=True, stdout=io.StringIO()
+        )
+        
+        assert Prediction.objects.count() == 3
+    
+    def test_out_of_range_rows_are_skipped(self, tmp_path):
+        """Test that rows outside the API input bounds are neither scored nor saved."""
+        import io
+        import pandas as pd
+        from django.core.management import call_command
+        from api.ml.predict import FEATURES
+        
+        rows = [
+            [1, 30, 5000, 45, 12, 800, 2],
+            [2, 30, -5000, 45, 12, 800, 2],
+            [3, 30, 5000, 45, 12, 800, 7],
+            [4, 200, 5000, 45, 12, 800, 2],
+            [5, 30.5, 5000, 45, 12, 800, 2],
+            [6, 30, 5000, 45, 12, 1e7, 2],
+            [7, 30, 5000, 45, 12, 'inf', 2],
+            [8, 100, 1320, 0, 30, 0, 3],
+        ]
+        source, output = tmp_path / 'in.csv', tmp_path / 'out.csv'
+        pd.DataFrame(rows, columns=['employee_id'] + FEATURES).to_csv(source, index=False)
+        stdout = io.StringIO()
+        
+        call_command(
+            'score_employees', str(source), output=str(output), workers=1,
+            id_column='employee_id', save=True, stdout=stdout
+        )
+        
+        assert pd.read_csv(output)['employee_id'].tolist() == [1, 8]
+        assert Prediction.objects.count() == 2
+        assert '6 linhas ignoradas' in stdout.getvalue()
+
+
+class TestSyntheticDataGenerator:
+    """Test chunked, reproducible synthetic data generation."""
+    
+    def test_dataset_is_independent_of_worker_count(self, tmp_path):
+        """Test that chunk streams give the same data serially and in parallel."""
+        import numpy as np
+        from api.ml import datagen
+        
+        serial = datagen.write_dataset(str(tmp_path / 'serial'), 10000, chunk_size=3000, workers=1)
+        parallel = datagen.write_dataset(str(tmp_path / 'parallel'), 10000, chunk_size=3000, workers=2)
+        
+        a, b = datagen.open_dataset(serial), datagen.open_dataset(parallel)
+        assert set(a) == set(datagen.COLUMNS)
+        for name in a:
+            assert np.array_equal(a[name], b[name])
+        
+        # Mesmo conteúdo gerado em memória, e chunks diferentes não se repetem
+        frame = datagen.generate_frame(10000, chunk_size=3000)
+        assert np.array_equal(frame['salary'].to_numpy(), a['salary'])
+        assert not np.array_equal(a['salary'][:3000], a['salary'][3000:6000])
+    
+    def test_columns_are_read_lazily(self, tmp_path):
+        """Test that columns are memory-mapped and can be streamed in chunks."""
+        import numpy as np
+        from api.ml import datagen
+        
+        path = datagen.write_dataset(str(tmp_path / 'ds'), 2500, chunk_size=1000, workers=1)
+        
+        assert isinstance(datagen.open_dataset(path)['age'], np.memmap)
+        sizes = [len(frame) for frame in datagen.iter_frames(path, chunk_size=1000)]
+        assert sizes == [1000, 1000, 500]
+        assert datagen.read_meta(path)['n_rows'] == 2500
+
+
+class TestTrainingPipeline:
+    """Test dataset caching and grid training."""
+    
+    def test_dataset_cache_hit(self, tmp_path):
+        """Test that the second load of the same dataset comes from the cache."""
+        from api.ml.train_model import load_dataset
+        
+        first, cached_first = load_dataset(n_samples=200, cache_dir=str(tmp_path))
+        second, cached_second = load_dataset(n_samples=200, cache_dir=str(tmp_path))
+        
+        assert (cached_first, cached_second) == (False, True)
+        assert first.equals(second)
+        # Outro tamanho = outro conteúdo = outra chave
+        _, cached_other = load_dataset(n_samples=300, cache_dir=str(tmp_path))
+        assert cached_other is False
+        
+        other_seed, cached_seed = load_dataset(n_samples=200, cache_dir=str(tmp_path), seed=7)
+        assert cached_seed is False and not other_seed.equals(first)
+    
+    def test_dataset_key_tracks_inputs(self, tmp_path, monkeypatch):
+        """Test that the cache key changes with the CSV contents and the datagen code."""
+        import inspect
+        from api.ml import datagen
+        from api.ml.train_model import dataset_key
+        
+        csv = tmp_path / 'data.csv'
+        csv.write_text('age\n30\n')
+        key = dataset_key(data_path=str(csv))
+        csv.write_text('age\n31\n')
+        assert dataset_key(data_path=str(csv)) != key
+        
+        synthetic = dataset_key(200)
+        source = inspect.getsource(datagen)
+        monkeypatch.setattr(inspect, 'getsource', lambda module: source + '# alterado\n')
+        assert dataset_key(200) != synthetic
+    
+    def test_split_keeps_test_rows_out_of_selection(self, tmp_path):
+        """Test that train, validation and test splits are disjoint and the test split is the usual 80/20 one."""
+        from sklearn.model_selection import train_test_split
+        from api.ml.train_model import load_dataset, split_dataset
+        
+        df, _ = load_dataset(n_samples=500, cache_dir=str(tmp_path))
+        X, y = df.drop('satisfaction_score', axis=1), df['satisfaction_score']
+        
+        X_train, X_val, X_test, y_train, y_val, y_test = split_dataset(X, y)
+        
+        assert (len(X_train), len(X_val), len(X_test)) == (300, 100, 100)
+        assert not (set(X_train.index) | set(X_val.index)) & set(X_test.index)
+        assert not set(X_train.index) & set(X_val.index)
+        assert X_test.index.equals(train_test_split(X, y, test_size=0.2, random_state=42)[1].index)
+    
+    def test_run_grid_reports_speed_and_accuracy(self, tmp_path):
+        """Test that every grid candidate is fitted and measured."""
+        from sklearn.model_selection import train_test_split
+        from api.ml.train_model import load_dataset, run_grid, select_candidate
+        
+        df, _ = load_dataset(n_samples=300, cache_dir=str(tmp_path))
+        X_train, X_test, y_train, y_test = train_test_split(
+            df.drop('satisfaction_score', axis=1), df['satisfaction_score'], random_state=42
+        )
+        
+        results = run_grid({'n_estimators': [5, 10], 'max_depth': [4]}, X_train, y_train, X_test, y_test)
+        
+        assert len(results) == 2
+        rmses = [r['metrics']['rmse'] for r in results]
+        assert rmses == sorted(rmses)
+        for result in results:
+            assert set(result['metrics']) == {'rmse', 'mae', 'r2', 'latency_ms', 'batch_rows_per_s', 'fit_time_s'}
+            assert result['model'].n_jobs == 1
+        
+        assert select_candidate(results) is results[0]
+        with pytest.raises(ValueError):
+            select_candidate(results, max_latency_ms=0)
+
+    
+    def test_compact_forest_within_tolerance(self, tmp_path):
+        """Test that tree pruning keeps R2 within tolerance with fewer trees."""
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.metrics import r2_score
+        from sklearn.model_selection import train_test_split
+        from api.ml.compact import compact_forest
+        from api.ml.forest import FlatForest
+        from api.ml.train_model import load_dataset
+        
+        df, _ = load_dataset(n_samples=1000, cache_dir=str(tmp_path))
+        X_train, X_test, y_train, y_test = train_test_split(
+            df.drop('satisfaction_score', axis=1).to_numpy(float), df['satisfaction_score'].to_numpy(),
+            random_state=42
+        )
+        forest = FlatForest.from_sklearn(RandomForestRegressor(n_estimators=30, random_state=42).fit(X_train, y_train))
+        
+        compact = compact_forest(forest, X_test, y_test, tolerance=0.01)
+        
+        assert compact.n_trees < forest.n_trees
+        assert compact.metadata['compacted_from_trees'] == 30
+        # Linhas de verificação (ímpares) não participaram da escolha das árvores
+        full = r2_score(y_test[1::2], forest.predict(X_test[1::2]))
+        assert r2_score(y_test[1::2], compact.predict(X_test[1::2])) >= full - 0.01
+
+
+class TestValidationRunner:
+    """Test the non-interactive validation runner."""
+    
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        from api.ml import train_model
+        monkeypatch.setattr(train_model, 'CACHE_DIR', str(tmp_path / 'cache'))
+    
+    def test_cross_validation_fits_each_fold_once(self):
+        """Test that all metrics come from a single fit per fold."""
+        from sklearn.ensemble import RandomForestRegressor
+        from api.ml.train_model import load_dataset
+        from api.ml.validate_model import validate_with_cross_validation
+        
+        df, _ = load_dataset(n_samples=300)
+        X, y = df.drop('satisfaction_score', axis=1), df['satisfaction_score']
+        
+        results = validate_with_cross_validation(RandomForestRegressor(n_estimators=5, random_state=42), X, y, cv=3)
+        
+        assert len(results['folds']) == 3
+        assert set(results['folds'][0]) == {'r2', 'rmse', 'mae'}
+        assert results['rmse_mean'] == pytest.approx(sum(f['rmse'] for f in results['folds']) / 3)
+    
+    def test_report_and_gate_exit_code(self, tmp_path):
+        """Test that the runner writes a JSON report and fails on unmet gates."""
+        import json
+        from api.ml.validate_model import main
+        
+        report_path = tmp_path / 'report.json'
+        args = ['--samples', '300', '--cv', '2', '--report', str(report_path), '--max-overfitting-gap', '1']
+        
+        assert main(args + ['--min-r2-cv', '0']) == 0
+        report = json.loads(report_path.read_text())
+        assert report['passed'] is True
+        assert {'load', 'cross_validation', 'holdout', 'total'} <= set(report['timings_s'])
+        
+        assert main(args + ['--min-r2-cv', '1.0']) == 1
+        assert json.loads(report_path.read_text())['gates']['min_r2_cv']['passed'] is False
+    
+    def test_saved_retrain_has_drift_reference_and_calibration(self, tmp_path, monkeypatch):
+        """Test that --save registers the regularized model with drift histograms and confidence calibration."""
+        import json
+        from api.ml import registry
+        from api.ml.forest import FlatForest
+        from api.ml.validate_model import main
+        
+        monkeypatch.setattr(registry, 'REGISTRY_DIR', str(tmp_path / 'registry'))
+        report_path = tmp_path / 'report.json'
+        
+        main(['--samples', '300', '--cv', '2', '--report', str(report_path),
+              '--max-overfitting-gap', '-1', '--retrain-if-overfit', '--save'])
+        
+        report = json.loads(report_path.read_text())
+        metadata = FlatForest.load(registry.version_path(report['retrain']['version'], registry.FOREST_FILE)).metadata
+        assert list(metadata['reference']['features']) == report['dataset']['features']
+        assert {'std_high', 'std_medium', 'interval_scale'} <= set(metadata['confidence'])
@@ -1,7 +1,19 @@
 """URL configuration for API endpoints."""
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import health_check, predict_view, PredictionViewSet, EmployeeProfileViewSet
+from .views import (
+    health_check,
+    predict_view,
+    predict_batch_view,
+    predict_async_view,
+    predict_what_if_view,
+    optimize_packages_view,
+    export_predictions,
+    metrics_view,
+    drift_view,
+    PredictionViewSet,
+    EmployeeProfileViewSet
+)
 
 # Router para ViewSets
 router = DefaultRouter()
@@ -11,5 +23,12 @@ router.register(r'employees', EmployeeProfileViewSet, basename='employee')
 urlpatterns = [
     path('health/', health_check, name='health-check'),
     path('predict/', predict_view, name='predict'),
+    path('predict/batch/', predict_batch_view, name='predict-batch'),
+    path('predict/async/', predict_async_view, name='predict-async'),
+    path('predict/what-if/', predict_what_if_view, name='predict-what-if'),
+    path('predict/optimize/', optimize_packages_view, name='predict-optimize'),
+    path('predictions/export/', export_predictions, name='prediction-export'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('drift/', drift_view, name='drift'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
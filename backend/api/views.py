@@ -1,16 +1,36 @@
 """API Views for Benefit Predictor."""
+import asyncio
+import csv
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Avg
-from .models import Prediction, EmployeeProfile
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from . import metrics, monitoring
+from .models import Prediction, PredictionStats, EmployeeProfile
 from .serializers import (
     PredictionInputSerializer,
     PredictionSerializer,
     PredictionResponseSerializer,
+    PredictionBatchItemSerializer,
+    WhatIfInputSerializer,
+    PackageOptimizerInputSerializer,
     EmployeeProfileSerializer
 )
-from .ml.predict import predict_satisfaction
+from .pagination import KeysetPagination
+from .persistence import BufferFull, get_id_allocator, get_write_buffer, supports_write_behind
+from .ml.optimizer import optimize_packages
+from .ml.predict import predict_satisfaction, predict_batch, predict_what_if, get_model_info, FEATURES
 
 @api_view(['GET'])
 def health_check(request):
@@ -18,8 +38,13 @@ def health_check(request):
     return Response({
         'status': 'healthy',
         'message': 'Benefit Predictor API is running',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'model': get_model_info()
     })
+# Histogramas das etapas de /api/predict/ (ver api/metrics.py)
+_STAGE_SECONDS = {stage: metrics.PREDICT_STAGE_SECONDS.labels(stage) for stage in metrics.PREDICT_STAGES}
+
+
 @api_view(['POST'])
 def predict_view(request):
     """
@@ -34,38 +59,353 @@ def predict_view(request):
         "meal_voucher": 800.00,
         "health_plan_tier": 2
     }
+
+    Com ?explain=1 a response traz "attributions": o bias do modelo e a
+    contribuição de cada feature para o score (ver FlatForest.explain).
+
+    A latência de cada etapa e os contadores de requisições/erros ficam
+    em /api/metrics/.
     """
+    started = time.perf_counter()
+    try:
+        response = _predict(request)
+    except Exception:
+        metrics.PREDICT_ERRORS.labels('exception').inc()
+        metrics.PREDICT_REQUESTS.labels(status.HTTP_500_INTERNAL_SERVER_ERROR).inc()
+        raise
+    _STAGE_SECONDS['total'].observe(time.perf_counter() - started)
+    metrics.PREDICT_REQUESTS.labels(response.status_code).inc()
+    return response
+
+
+def _predict(request):
     # Valida input
-    input_serializer = PredictionInputSerializer(data=request.data)
-    if not input_serializer.is_valid():
+    with _STAGE_SECONDS['validate'].time():
+        input_serializer = PredictionInputSerializer(data=request.data)
+        valid = input_serializer.is_valid()
+    if not valid:
+        metrics.PREDICT_ERRORS.labels('validation').inc()
         return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     data = input_serializer.validated_data
 
     # Faz predição com ML
     try:
-        prediction_result = predict_satisfaction(
+        with _STAGE_SECONDS['predict'].time():
+            prediction_result = predict_satisfaction(
+                age=int(data['age']),
+                salary=float(data['salary']),
+                commute_time=int(data['commute_time']),
+                gym_usage=int(data['gym_usage']),
+                meal_voucher=float(data['meal_voucher']),
+                health_plan_tier=int(data['health_plan_tier']),
+                explain=_wants_explain(request)
+            )
+    except Exception as e:
+        metrics.PREDICT_ERRORS.labels('prediction').inc()
+        return Response(
+            {'error': f'Prediction failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    # Histogramas do monitor de drift (em memória, ver api/monitoring.py)
+    monitoring.observe_inputs([float(data[feature]) for feature in FEATURES])
+    
+    # Salva no banco
+    fields = {
+        'age': data['age'],
+        'salary': data['salary'],
+        'commute_time': data['commute_time'],
+        'gym_usage': data['gym_usage'],
+        'meal_voucher': data['meal_voucher'],
+        'health_plan_tier': data['health_plan_tier'],
+        'satisfaction_score': prediction_result['score']
+    }
+    with _STAGE_SECONDS['persist'].time():
+        if supports_write_behind():
+            # Write-behind: id reservado agora, INSERT em background
+            prediction = Prediction(id=get_id_allocator().allocate(), **fields)
+            try:
+                get_write_buffer().enqueue(prediction, timeout=settings.PREDICTION_WRITE_BEHIND_ENQUEUE_TIMEOUT)
+            except BufferFull as e:
+                metrics.PREDICT_ERRORS.labels('buffer_full').inc()
+                return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        else:
+            prediction = Prediction.objects.create(**fields)
+
+    # Prepara resposta
+    response_data = {
+        'satisfaction_score': prediction_result['score'],
+        'confidence_level': prediction_result['confidence'],
+        'recommendation': prediction_result['recommendation'],
+        'prediction_id': prediction.id,
+        **_optional_fields(prediction_result)
+    }
+
+    with _STAGE_SECONDS['serialize'].time():
+        response_serializer = PredictionResponseSerializer(data=response_data)
+        response_serializer.is_valid(raise_exception=True)
+        body = response_serializer.data
+
+    return Response(body, status=status.HTTP_201_CREATED)
+
+
+def _wants_explain(request):
+    """?explain=1|true pede as contribuições das features na response."""
+    return request.GET.get('explain', '').lower() in ('1', 'true')
+
+
+def _optional_fields(result):
+    """Campos da predição que só existem às vezes (incerteza calibrada, contribuições)."""
+    return {key: result[key] for key in ('uncertainty', 'attributions') if key in result}
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Métricas do processo no formato texto do Prometheus.
+
+    GET /api/metrics/
+    """
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+def drift_view(request):
+    """
+    Drift das entradas de produção em relação aos dados de treino do modelo ativo.
+
+    GET /api/drift/?days=7
+
+    Para cada feature: PSI, KS e os histogramas (treino x produção) nos bins
+    gravados pelo train_model.py. As contagens vêm de FeatureHistogram,
+    atualizadas pelos processos a cada PREDICTION_DRIFT_FLUSH_INTERVAL segundos,
+    mais as ainda em memória deste processo (o GET não grava nada).
+    """
+    days = request.query_params.get('days')
+    if days is not None:
+        try:
+            days = int(days)
+        except ValueError:
+            days = 0
+        if days < 1:
+            return Response({'error': 'days deve ser um inteiro >= 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = monitoring.drift_report(days=days)
+    if report is None:
+        return Response(
+            {'error': 'Modelo sem histogramas de referência. Retreine com train_model.py'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return Response(report)
+
+@api_view(['POST'])
+def predict_batch_view(request):
+    """
+    Predição em lote.
+
+    POST /api/predict/batch/
+    Body: [ {<mesmo payload de /api/predict/>}, ... ]
+
+    Itens inválidos são reportados por índice em "errors" e não impedem
+    a predição dos demais. Com ?explain=1 cada resultado traz "attributions".
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response(
+            {'error': 'Body deve ser uma lista de payloads de predição'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(items) > settings.PREDICTION_BATCH_MAX_SIZE:
+        return Response(
+            {'error': f'Lote excede o limite de {settings.PREDICTION_BATCH_MAX_SIZE} itens'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Valida cada item separadamente para reportar erros por índice
+    valid_indexes = []
+    valid_data = []
+    errors = []
+    for index, item in enumerate(items):
+        input_serializer = PredictionInputSerializer(data=item)
+        if input_serializer.is_valid():
+            valid_indexes.append(index)
+            valid_data.append(input_serializer.validated_data)
+        else:
+            errors.append({'index': index, 'errors': input_serializer.errors})
+
+    if not valid_data:
+        return Response({'results': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Faz predição com ML numa única chamada
+    try:
+        prediction_results = predict_batch(
+            [[float(data[feature]) for feature in FEATURES] for data in valid_data],
+            explain=_wants_explain(request)
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Prediction failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    monitoring.observe_inputs([[float(data[feature]) for feature in FEATURES] for data in valid_data])
+
+    # Salva no banco com um único INSERT
+    predictions = Prediction.objects.bulk_create([
+        Prediction(**data, satisfaction_score=result['score'])
+        for data, result in zip(valid_data, prediction_results)
+    ])
+
+    results = [
+        {
+            'index': index,
+            'satisfaction_score': result['score'],
+            'confidence_level': result['confidence'],
+            'recommendation': result['recommendation'],
+            'prediction_id': prediction.id,
+            **_optional_fields(result)
+        }
+        for index, result, prediction in zip(valid_indexes, prediction_results, predictions)
+    ]
+
+    return Response({
+        'results': PredictionBatchItemSerializer(results, many=True).data,
+        'errors': errors
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+def predict_what_if_view(request):
+    """
+    Sensibilidade do score a mudanças em features de um perfil.
+
+    POST /api/predict/what-if/
+    Body: {
+        "profile": {<mesmo payload de /api/predict/>},
+        "sweeps": {
+            "gym_usage": {"min": 0, "max": 30, "step": 1},
+            "health_plan_tier": {"values": [1, 2, 3]}
+        },
+        "grid": false
+    }
+
+    Retorna o score do perfil base e uma curva por feature varrida (as
+    outras features ficam no valor do perfil). Com "grid": true, também
+    retorna o score de todas as combinações das features varridas.
+    Tudo é avaliado numa única chamada ao modelo e nada é gravado no banco.
+    """
+    input_serializer = WhatIfInputSerializer(data=request.data)
+    if not input_serializer.is_valid():
+        return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = input_serializer.validated_data
+    try:
+        result = predict_what_if(data['profile'], data['sweeps'], grid=data['grid'])
+    except Exception as e:
+        return Response(
+            {'error': f'Prediction failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return Response(result)
+
+@api_view(['POST'])
+def optimize_packages_view(request):
+    """
+    Melhores pacotes de benefícios sob orçamento.
+
+    POST /api/predict/optimize/
+    Body: {
+        "employees": [{<mesmo payload de /api/predict/>}, ...],
+        "budget": 1200.00,
+        "options": {"meal_voucher": {"min": 0, "max": 1500, "step": 100}},
+        "costs": {"gym_usage": 12.0, "health_plan_tier": {"1": 250, "2": 450, "3": 800}}
+    }
+
+    budget é o custo mensal máximo por funcionário. options e costs são
+    opcionais (padrões em api/ml/packages.py). Para cada funcionário,
+    retorna o pacote atual, a fronteira de Pareto custo x score e o melhor
+    pacote dentro do orçamento; "cohort" traz a fronteira de um mesmo
+    pacote para todos (score médio). Nada é gravado no banco.
+    """
+    input_serializer = PackageOptimizerInputSerializer(data=request.data)
+    if not input_serializer.is_valid():
+        return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = input_serializer.validated_data
+    X = [[float(employee[feature]) for feature in FEATURES] for employee in data['employees']]
+    try:
+        result = optimize_packages(
+            X,
+            budget=data.get('budget'),
+            options=data.get('options'),
+            costs=data.get('costs'),
+            workers=settings.PREDICTION_OPTIMIZER_WORKERS
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': f'Optimization failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return Response(result)
+
+# Threads limitadas para a avaliação do modelo (CPU) nas views async
+_model_executor = ThreadPoolExecutor(
+    max_workers=settings.PREDICTION_ASYNC_WORKERS,
+    thread_name_prefix='predict'
+)
+
+
+@csrf_exempt
+@require_POST
+async def predict_async_view(request):
+    """
+    Versão async de /api/predict/ para deploys ASGI.
+
+    POST /api/predict/async/
+    Body e response iguais aos de /api/predict/.
+
+    A avaliação do modelo roda num executor limitado e o INSERT usa o ORM
+    async, então o event loop continua atendendo outras requisições.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Valida input
+    input_serializer = PredictionInputSerializer(data=payload)
+    if not input_serializer.is_valid():
+        return JsonResponse(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = input_serializer.validated_data
+
+    # Faz predição com ML fora do event loop
+    loop = asyncio.get_running_loop()
+    try:
+        prediction_result = await loop.run_in_executor(_model_executor, partial(
+            predict_satisfaction,
             age=int(data['age']),
             salary=float(data['salary']),
             commute_time=int(data['commute_time']),
             gym_usage=int(data['gym_usage']),
             meal_voucher=float(data['meal_voucher']),
             health_plan_tier=int(data['health_plan_tier'])
-        )
+        ))
     except Exception as e:
-        return Response(
+        return JsonResponse(
             {'error': f'Prediction failed: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-    
+
+    monitoring.observe_inputs([float(data[feature]) for feature in FEATURES])
+
     # Salva no banco
-    prediction = Prediction.objects.create(
-        age=data['age'],
-        salary=data['salary'],
-        commute_time=data['commute_time'],
-        gym_usage=data['gym_usage'],
-        meal_voucher=data['meal_voucher'],
-        health_plan_tier=data['health_plan_tier'],
+    prediction = await Prediction.objects.acreate(
+        **data,
         satisfaction_score=prediction_result['score']
     )
 
@@ -74,38 +414,150 @@ def predict_view(request):
         'satisfaction_score': prediction_result['score'],
         'confidence_level': prediction_result['confidence'],
         'recommendation': prediction_result['recommendation'],
-        'prediction_id': prediction.id
+        'prediction_id': prediction.id,
+        **_optional_fields(prediction_result)
     }
 
     response_serializer = PredictionResponseSerializer(data=response_data)
     response_serializer.is_valid(raise_exception=True)
 
-    return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    return JsonResponse(response_serializer.data, status=status.HTTP_201_CREATED)
+
+# Colunas exportadas por /api/predictions/export/
+EXPORT_FIELDS = ['id', *FEATURES, 'satisfaction_score', 'created_at']
+
+# Linhas lidas do cursor (e enviadas ao cliente) por vez
+EXPORT_CHUNK_SIZE = 2000
+
+
+@require_GET
+def export_predictions(request):
+    """
+    Exporta o histórico de predições em streaming.
+
+    GET /api/predictions/export/?output=csv|ndjson&since=...&until=...&after_id=...
+
+    - output: csv (padrão) ou ndjson
+    - since/until: intervalo de created_at (ISO 8601, until exclusivo)
+    - after_id: retoma a exportação depois do último id recebido
+
+    As linhas saem ordenadas por id e são lidas de um cursor do servidor
+    em blocos de EXPORT_CHUNK_SIZE, então a memória não cresce com a tabela.
+    """
+    output = request.GET.get('output', 'csv')
+    if output not in ('csv', 'ndjson'):
+        return JsonResponse({'error': 'output deve ser csv ou ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = Prediction.objects.order_by('id')
+    for param, lookup in (('since', 'created_at__gte'), ('until', 'created_at__lt')):
+        if param in request.GET:
+            value = parse_datetime(request.GET[param])
+            if value is None:
+                return JsonResponse({'error': f'{param} inválido (use ISO 8601)'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(**{lookup: value})
+    if 'after_id' in request.GET:
+        try:
+            queryset = queryset.filter(id__gt=int(request.GET['after_id']))
+        except ValueError:
+            return JsonResponse({'error': 'after_id deve ser inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if output == 'csv':
+        response = StreamingHttpResponse(_stream_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="predictions.csv"'
+    else:
+        response = StreamingHttpResponse(_stream_ndjson(rows), content_type='application/x-ndjson')
+    return response
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for chunk in _chunks(rows):
+        writer.writerows(row[:-1] + (row[-1].isoformat(),) for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _stream_ndjson(rows):
+    for chunk in _chunks(rows):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row[:-1] + (row[-1].isoformat(),))), default=str) + '\n'
+            for row in chunk
+        )
+
 
 class PredictionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para histórico de predições.
     
-    GET /api/predictions/ - Lista todas
+    GET /api/predictions/ - Lista todas (filtros: min_score, max_score, health_plan_tier)
+    GET /api/predictions/?pagination=cursor - Lista com paginação keyset
     GET /api/predictions/{id}/ - Detalhes
     GET /api/predictions/stats/ - Estatísticas
+    GET /api/predictions/export/ - Exportação em streaming (ver export_predictions)
     """
     queryset = Prediction.objects.all()
     serializer_class = PredictionSerializer
 
+    @property
+    def paginator(self):
+        """
+        ?pagination=cursor usa paginação keyset em (created_at, id) sem COUNT(*).
+        Sem o parâmetro, mantém a paginação por número de página.
+        """
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def get_queryset(self):
+        """Filtros opcionais: min_score, max_score e health_plan_tier."""
+        queryset = super().get_queryset()
+        params = self.request.query_params
+
+        try:
+            if 'min_score' in params:
+                queryset = queryset.filter(satisfaction_score__gte=float(params['min_score']))
+            if 'max_score' in params:
+                queryset = queryset.filter(satisfaction_score__lte=float(params['max_score']))
+            if 'health_plan_tier' in params:
+                queryset = queryset.filter(health_plan_tier=int(params['health_plan_tier']))
+        except ValueError:
+            raise ValidationError({'error': 'min_score, max_score e health_plan_tier devem ser numéricos'})
+
+        return queryset
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Estatísticas gerais."""
-        total = Prediction.objects.count()
-        avg_score = Prediction.objects.aggregate(Avg('satisfaction_score'))['satisfaction_score__avg']
+        """Estatísticas gerais (lidas do rollup PredictionStats, sem escanear a tabela)."""
+        totals = PredictionStats.snapshot()
+        avg_score = totals['score_sum'] / totals['total'] if totals['total'] else 0
 
         return Response({
-            'total_predictions': total,
+            'total_predictions': totals['total'],
             'average_score': round(avg_score, 2) if avg_score else 0,
             'distribution': {
-                'low': Prediction.objects.filter(satisfaction_score__lt=50).count(),
-                'medium': Prediction.objects.filter(satisfaction_score__gte=50, satisfaction_score__lt=75).count(),
-                'high': Prediction.objects.filter(satisfaction_score__gte=75).count()
+                'low': totals['low'],
+                'medium': totals['medium'],
+                'high': totals['high']
             }
         })
 
@@ -0,0 +1,138 @@
+"""
+Benchmark de carregamento do modelo por worker.
+
+Sobe N processos (como os workers do servidor), cada um carregando o modelo
+no formato indicado, e reporta o tempo de carga a frio (incluindo os imports
+que cada formato exige) e a memória de cada worker enquanto todos estão
+vivos ao mesmo tempo:
+
+- RSS: memória residente (conta páginas compartilhadas em todos os workers)
+- PSS: páginas compartilhadas divididas entre os processos que as usam
+- Private: páginas exclusivas do worker
+
+Também indica se o formato fez o worker importar o scikit-learn.
+
+Uso:
+    python benchmarks/bench_model_load.py --workers 4
+    python benchmarks/bench_model_load.py --formats pickle mmap compact --json out.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(BACKEND_DIR, 'api', 'ml')
+
+FORMATS = {
+    'pickle': os.path.join(ML_DIR, 'model.pkl'),
+    'mmap': os.path.join(ML_DIR, 'model.bin'),
+    'compact': os.path.join(ML_DIR, 'model.compact.bin'),
+}
+
+
+def _memory_kb():
+    """Lê Rss/Pss/Private de /proc/self/smaps_rollup (Linux)."""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss_kb': fields.get('Rss', 0),
+        'pss_kb': fields.get('Pss', 0),
+        'private_kb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def _worker(fmt, barrier, results):
+    sys.path.insert(0, BACKEND_DIR)
+    import numpy as np
+
+    baseline = _memory_kb()
+    start = time.perf_counter()
+
+    if fmt == 'pickle':
+        import joblib
+        import pandas as pd
+        model = joblib.load(FORMATS[fmt])
+        predict = lambda X: model.predict(pd.DataFrame(X, columns=model.feature_names_in_))
+    else:
+        from api.ml.forest import FlatForest
+        forest = FlatForest.load(FORMATS[fmt], mmap=True)
+        predict = forest.predict
+
+    load_seconds = time.perf_counter() - start
+
+    # Uma predição em lote toca todas as páginas do modelo
+    rng = np.random.default_rng(0)
+    predict(rng.uniform([18, 1320, 0, 0, 0, 1], [100, 20000, 300, 30, 2000, 3], (2000, 6)))
+
+    # Mede com todos os workers vivos, para o PSS refletir o compartilhamento
+    barrier.wait()
+    memory = _memory_kb()
+    results.put({
+        'format': fmt,
+        'pid': os.getpid(),
+        'load_ms': load_seconds * 1000,
+        'rss_kb': memory['rss_kb'],
+        'pss_kb': memory['pss_kb'],
+        'private_kb': memory['private_kb'],
+        'model_rss_kb': memory['rss_kb'] - baseline['rss_kb'],
+        'sklearn_imported': 'sklearn' in sys.modules,
+    })
+    barrier.wait()
+
+
+def run(fmt, n_workers):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(n_workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(fmt, barrier, results)) for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--formats', nargs='+', choices=list(FORMATS), default=list(FORMATS))
+    parser.add_argument('--json', help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for fmt in args.formats:
+        if not os.path.exists(FORMATS[fmt]):
+            print(f"⚠️  {FORMATS[fmt]} não encontrado, pulando '{fmt}'")
+            continue
+
+        rows = run(fmt, args.workers)
+        report[fmt] = rows
+
+        print(f"\n📦 {fmt} ({os.path.getsize(FORMATS[fmt]) / 1024:.0f} KB em disco, {args.workers} workers)")
+        print(f"   {'pid':>8} {'load ms':>9} {'RSS MB':>8} {'PSS MB':>8} {'Private MB':>11} {'Δ RSS MB':>9} {'sklearn':>8}")
+        for row in rows:
+            print(
+                f"   {row['pid']:>8} {row['load_ms']:>9.1f} {row['rss_kb'] / 1024:>8.1f} "
+                f"{row['pss_kb'] / 1024:>8.1f} {row['private_kb'] / 1024:>11.1f} {row['model_rss_kb'] / 1024:>9.1f} "
+                f"{'sim' if row['sklearn_imported'] else 'não':>8}"
+            )
+        total_pss = sum(row['pss_kb'] for row in rows) / 1024
+        print(f"   PSS total: {total_pss:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados salvos em: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
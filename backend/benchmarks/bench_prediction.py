@@ -0,0 +1,346 @@
+"""
+Benchmark da stack de predição, camada por camada.
+
+Mede separadamente:
+
+- predict_single_miss:  predict_satisfaction, uma linha, inputs nunca vistos (miss no cache)
+- predict_single_hit:   predict_satisfaction com inputs já no cache (hit)
+- predict_batch_N:      predict_batch com N linhas (latência por chamada e linhas/s)
+- serializer:           PredictionInputSerializer.is_valid()
+- predict_view:         POST /api/predict/ completo, incluindo o INSERT (miss no cache)
+- stats_N:              GET /api/predictions/stats/ com N predições na tabela
+
+O aquecimento usa inputs diferentes dos medidos e o cache de predições é
+esvaziado antes, para que medidas de miss não sejam hits; predict_single_*
+registram hits e misses do cache durante a medição (cache_hits/cache_misses).
+
+Os benchmarks de banco rodam num banco de teste criado e destruído pelo
+próprio script (como o test runner do Django), nunca no banco de dados real.
+
+Resultados com p50/p95/p99 em ms, salvos em JSON. Com --compare, compara com
+um baseline salvo e sai com código 1 se algum p50/p95 piorar além de
+--threshold.
+
+Uso:
+    python benchmarks/bench_prediction.py --json baseline.json
+    python benchmarks/bench_prediction.py --compare baseline.json --threshold 0.15
+    python benchmarks/bench_prediction.py --only predict_single predict_batch --iterations 2000
+    python benchmarks/bench_prediction.py --stats-rows 10000 1000000
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+
+
+GROUPS = ('predict_single', 'predict_batch', 'serializer', 'predict_view', 'stats')
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+# Métricas comparadas no modo --compare
+COMPARED = ('p50_ms', 'p95_ms')
+
+
+def summarize(timings, rows_per_call=1):
+    """
+    Estatísticas de uma lista de tempos (segundos).
+    """
+    ms = np.asarray(timings) * 1000
+    return {
+        'iterations': len(ms),
+        'mean_ms': float(ms.mean()),
+        'min_ms': float(ms.min()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'rows_per_s': float(rows_per_call * len(ms) / (ms.sum() / 1000)),
+    }
+
+
+def measure(fn, args_list, warmup=20, warmup_args=None):
+    """
+    Executa fn(*args) para cada item de args_list e devolve os tempos.
+
+    O aquecimento executa warmup_args (padrão: os `warmup` primeiros de
+    args_list) sem medir. O GC fica desligado durante a medição para não misturar pausas de coleta
+    com o custo medido.
+    """
+    for args in (args_list[:warmup] if warmup_args is None else warmup_args):
+        fn(*args)
+
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for args in args_list:
+            started = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return timings
+
+
+def random_inputs(n, seed=0):
+    """
+    Inputs válidos e reprodutíveis (mesma seed = mesmos inputs).
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'age': int(rng.integers(18, 66)),
+            'salary': round(float(rng.uniform(1500, 15000)), 2),
+            'commute_time': int(rng.integers(0, 181)),
+            'gym_usage': int(rng.integers(0, 31)),
+            'meal_voucher': round(float(rng.uniform(0, 1500)), 2),
+            'health_plan_tier': int(rng.integers(1, 4)),
+        }
+        for _ in range(n)
+    ]
+
+
+def bench_predict_single(iterations):
+    from api.ml.predict import cache, predict_satisfaction
+
+    def predict(row):
+        return predict_satisfaction(**row)
+
+    def measure_cache(args_list, warmup_args):
+        # Conta hits/misses só das chamadas medidas (o aquecimento vem antes)
+        for args in warmup_args:
+            predict(*args)
+        before = cache.stats()
+        stats = summarize(measure(predict, args_list, warmup_args=[]))
+        after = cache.stats()
+        stats['cache_hits'] = after['hits'] - before['hits']
+        stats['cache_misses'] = after['misses'] - before['misses']
+        return stats
+
+    # Miss: cache vazio, aquecimento com inputs de outra seed
+    cache.clear()
+    inputs = [(row,) for row in random_inputs(iterations, seed=1)]
+    results = {'predict_single_miss': measure_cache(inputs, [(row,) for row in random_inputs(20, seed=11)])}
+
+    # Hit: os inputs mais recentes ainda estão no cache (LRU), repetidos até `iterations`
+    cached = inputs[-cache.maxsize:] if cache.maxsize > 0 else inputs[:1]
+    hits = [cached[i % len(cached)] for i in range(iterations)]
+    results['predict_single_hit'] = measure_cache(hits, cached[:20])
+    return results
+
+
+def bench_predict_batch(iterations):
+    from api.ml.predict import FEATURES, predict_batch
+
+    results = {}
+    for size in BATCH_SIZES:
+        rows = random_inputs(size, seed=2)
+        X = np.array([[row[name] for name in FEATURES] for row in rows], dtype=np.float64)
+        # Lotes grandes: menos repetições, mesmo tempo total aproximado
+        repeats = max(5, min(iterations, 20000 // size))
+        results[f'predict_batch_{size}'] = summarize(
+            measure(predict_batch, [(X,)] * repeats, warmup=2), rows_per_call=size
+        )
+    return results
+
+
+def bench_serializer(iterations):
+    from api.serializers import PredictionInputSerializer
+
+    def validate(row):
+        serializer = PredictionInputSerializer(data=row)
+        assert serializer.is_valid(), serializer.errors
+
+    rows = [(row,) for row in random_inputs(iterations, seed=3)]
+    warmup = [(row,) for row in random_inputs(20, seed=13)]
+    return {'serializer': summarize(measure(validate, rows, warmup_args=warmup))}
+
+
+def bench_predict_view(iterations):
+    from django.test import Client
+
+    client = Client()
+
+    def post(body):
+        response = client.post('/api/predict/', body, content_type='application/json')
+        assert response.status_code == 201, response.content
+
+    from api.ml.predict import cache
+
+    cache.clear()
+    bodies = [(json.dumps(row),) for row in random_inputs(iterations, seed=4)]
+    warmup = [(json.dumps(row),) for row in random_inputs(20, seed=14)]
+    return {'predict_view': summarize(measure(post, bodies, warmup_args=warmup))}
+
+
+def bench_stats(iterations, stats_rows):
+    from django.test import Client
+    from api.models import Prediction, PredictionStats
+
+    client = Client()
+
+    def get():
+        response = client.get('/api/predictions/stats/')
+        assert response.status_code == 200, response.content
+
+    results = {}
+    for target in sorted(stats_rows):
+        _fill_predictions(Prediction, target)
+        assert PredictionStats.snapshot()['total'] == Prediction.objects.count()
+        results[f'stats_{target}'] = summarize(measure(get, [()] * iterations))
+    return results
+
+
+def _fill_predictions(Prediction, target, batch_size=10000):
+    """Completa a tabela até `target` linhas (bulk_create em lotes)."""
+    rng = np.random.default_rng(5)
+    missing = target - Prediction.objects.count()
+    while missing > 0:
+        n = min(batch_size, missing)
+        Prediction.objects.bulk_create([
+            Prediction(
+                age=30, salary=5000, commute_time=45, gym_usage=12, meal_voucher=800,
+                health_plan_tier=2, satisfaction_score=float(score)
+            )
+            for score in np.round(rng.uniform(0, 100, n), 2)
+        ], batch_size=batch_size)
+        missing -= n
+
+
+def environment():
+    """Contexto da execução, para saber se dois resultados são comparáveis."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    from django.db import connection
+    from api.ml.predict import get_active_model
+
+    loaded = get_active_model()
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'database': connection.vendor,
+        'model_version': loaded.version if loaded else None,
+        'engine': loaded.engine if loaded else None,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Compara resultados com um baseline.
+
+    Returns:
+        list[dict]: Uma linha por benchmark/métrica, com a variação relativa
+    """
+    rows = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        for metric in COMPARED:
+            before, after = baseline[name][metric], stats[metric]
+            change = (after - before) / before if before else 0.0
+            rows.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change': change,
+                'regression': change > threshold,
+            })
+    return rows
+
+
+def print_results(results):
+    print(f"\n  {'benchmark':28s} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'linhas/s':>12}")
+    for name, stats in results.items():
+        print(f"  {name:28s} {stats['iterations']:>6} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+              f"{stats['p99_ms']:>9.3f} {stats['rows_per_s']:>12,.0f}")
+        if 'cache_hits' in stats:
+            print(f"  {'':28s} cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n📊 Comparação com o baseline (regressão = piora > {threshold:.0%})")
+    for row in rows:
+        mark = '❌' if row['regression'] else ('✅' if row['change'] < -threshold else '  ')
+        print(f"  {mark} {row['benchmark']:28s} {row['metric']:7s} {row['baseline']:>9.3f} → "
+              f"{row['current']:>9.3f} ms ({row['change']:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS), help='Grupos a executar')
+    parser.add_argument('--iterations', type=int, default=1000, help='Repetições por benchmark')
+    parser.add_argument('--stats-rows', type=int, nargs='+', default=[10000], help='Tamanhos da tabela para stats')
+    parser.add_argument('--json', help='Salva os resultados em JSON')
+    parser.add_argument('--compare', help='Baseline JSON para detectar regressões')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Piora relativa tolerada no --compare')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benefit_ai.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        results = {}
+        if 'predict_single' in args.only:
+            results.update(bench_predict_single(args.iterations))
+        if 'predict_batch' in args.only:
+            results.update(bench_predict_batch(args.iterations))
+        if 'serializer' in args.only:
+            results.update(bench_serializer(args.iterations))
+        if 'predict_view' in args.only:
+            results.update(bench_predict_view(args.iterations))
+        if 'stats' in args.only:
+            results.update(bench_stats(args.iterations, args.stats_rows))
+        report = {'environment': environment(), 'results': results}
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados salvos em: {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline['results'], args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row['regression'] for row in rows):
+            print("\n❌ Regressão de performance detectada")
+            return 1
+        print("\n✅ Sem regressões")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
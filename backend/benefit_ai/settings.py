@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -149,4 +150,44 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# Prediction API
+# Número máximo de itens aceitos por /api/predict/batch/
+PREDICTION_BATCH_MAX_SIZE = int(os.environ.get('PREDICTION_BATCH_MAX_SIZE', '10000'))
+
+# Máximo de pontos (linhas avaliadas) por requisição a /api/predict/what-if/
+PREDICTION_WHAT_IF_MAX_POINTS = int(os.environ.get('PREDICTION_WHAT_IF_MAX_POINTS', '10000'))
+
+# Limites de /api/predict/optimize/ e processos usados por requisição
+# (1 = no próprio processo; coortes grandes são divididas entre os workers)
+PREDICTION_OPTIMIZER_MAX_EMPLOYEES = int(os.environ.get('PREDICTION_OPTIMIZER_MAX_EMPLOYEES', '10000'))
+PREDICTION_OPTIMIZER_MAX_PACKAGES = int(os.environ.get('PREDICTION_OPTIMIZER_MAX_PACKAGES', '2000'))
+PREDICTION_OPTIMIZER_WORKERS = int(os.environ.get('PREDICTION_OPTIMIZER_WORKERS', '1'))
+
+# Threads para avaliação do modelo em /api/predict/async/ (ASGI)
+PREDICTION_ASYNC_WORKERS = int(os.environ.get('PREDICTION_ASYNC_WORKERS', '4'))
+
+# Write-behind: INSERTs de /api/predict/ gravados em lote em background
+# (requer PostgreSQL; ver api/persistence.py)
+PREDICTION_WRITE_BEHIND = os.environ.get('PREDICTION_WRITE_BEHIND', '0') == '1'
+PREDICTION_WRITE_BEHIND_MAX_SIZE = int(os.environ.get('PREDICTION_WRITE_BEHIND_MAX_SIZE', '10000'))
+PREDICTION_WRITE_BEHIND_FLUSH_SIZE = int(os.environ.get('PREDICTION_WRITE_BEHIND_FLUSH_SIZE', '500'))
+PREDICTION_WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_WRITE_BEHIND_FLUSH_INTERVAL', '1.0'))
+PREDICTION_WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.environ.get('PREDICTION_WRITE_BEHIND_ENQUEUE_TIMEOUT', '0.5'))
+# Flushes de um lote que falha antes de gravá-lo linha a linha (as que falham vão ao dead-letter)
+PREDICTION_WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('PREDICTION_WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+
+# Monitor de drift: histogramas das entradas em memória, somados no banco
+# a cada PREDICTION_DRIFT_FLUSH_INTERVAL segundos (ver api/monitoring.py)
+PREDICTION_DRIFT_MONITOR = os.environ.get('PREDICTION_DRIFT_MONITOR', '1') == '1'
+PREDICTION_DRIFT_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_DRIFT_FLUSH_INTERVAL', '60'))
+
+# Profiling sob demanda (ver api/profiling.py). Desativado, o middleware
+# sai da cadeia na inicialização e não custa nada.
+API_PROFILING = os.environ.get('API_PROFILING', '0') == '1'
+API_PROFILING_DIR = os.environ.get('API_PROFILING_DIR', str(BASE_DIR / 'profiles'))
+API_PROFILING_HEADER = os.environ.get('API_PROFILING_HEADER', 'X-Profile')
+API_PROFILING_TOKEN = os.environ.get('API_PROFILING_TOKEN', '')
+API_PROFILING_SAMPLE_RATE = float(os.environ.get('API_PROFILING_SAMPLE_RATE', '0'))
+API_PROFILING_MAX_FILES = int(os.environ.get('API_PROFILING_MAX_FILES', '500'))